@@ -0,0 +1,235 @@
+"""
+Benchmark and profiling harness for Kivg.
+Generates SVGs of 1k, 10k and 100k segments, line-heavy (like the sketch
+SVG export) and Bezier-heavy filled outlines (like text output), and times
+parse_svg, DrawingManager.process_path_data, DrawingManager.calculate_paths,
+MeshHandler.generate_meshes and a simulated sequential animation, reporting
+per-frame SvgRenderer.update_canvas and get_current_pen_position costs. Meshes are
+only generated for the filled (font) SVGs, sketch strokes are never filled.
+Runs headless (no Kivy window); --profile writes a cProfile dump per stage.
+
+Usage (from the kivy directory):
+    python benchmarks/bench_kivg.py --output kivg.json
+    python benchmarks/bench_kivg.py --sizes 1000 10000 --profile profiles/
+"""
+import os
+import sys
+import json
+import time
+import math
+import random
+import argparse
+import platform
+import cProfile
+import statistics
+
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+os.environ.setdefault("KIVY_NO_FILELOG", "1")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kivy.uix.widget import Widget
+from kivg.svg_parser import parse_svg
+from kivg.drawing.manager import DrawingManager
+from kivg.svg_renderer import SvgRenderer
+from kivg.mesh_handler import MeshHandler
+
+SIZES = (1000, 10000, 100000)
+KINDS = ("sketch", "font")
+SVG_SIZE = 1000
+SEGMENTS_PER_PATH = {"sketch": 50, "font": 12}
+FRAMES = 60
+LINE_COLOR = [0, 0, 0, 1]
+
+
+def sketch_svg(n_segments, seed=0):
+    """Line-heavy SVG: open polyline strokes, as the sketch SVG export writes them."""
+    rng = random.Random(seed)
+    per_path = SEGMENTS_PER_PATH["sketch"]
+    paths = []
+    for i in range(math.ceil(n_segments / per_path)):
+        x, y = rng.uniform(0, SVG_SIZE), rng.uniform(0, SVG_SIZE)
+        d = [f"M {x:.1f} {y:.1f}"]
+        for _ in range(min(per_path, n_segments - i * per_path)):
+            x = min(max(x + rng.uniform(-15, 15), 0), SVG_SIZE)
+            y = min(max(y + rng.uniform(-15, 15), 0), SVG_SIZE)
+            d.append(f"L {x:.1f} {y:.1f}")
+        paths.append(f'<path id="stroke_{i}" d="{" ".join(d)}" fill="none"/>')
+    return _svg_document(paths)
+
+
+def font_svg(n_segments, seed=0):
+    """Bezier-heavy SVG: closed, filled curve outlines, like glyphs from text_to_svg."""
+    rng = random.Random(seed)
+    per_path = SEGMENTS_PER_PATH["font"]
+    paths = []
+    for i in range(math.ceil(n_segments / per_path)):
+        cx, cy = rng.uniform(50, SVG_SIZE - 50), rng.uniform(50, SVG_SIZE - 50)
+        radius = rng.uniform(10, 40)
+        count = min(per_path, n_segments - i * per_path)
+
+        def point(k):
+            angle = 2 * math.pi * k / count
+            r = radius * (1 + 0.2 * math.sin(3 * angle))
+            return cx + r * math.cos(angle), cy + r * math.sin(angle)
+
+        x, y = point(0)
+        d = [f"M {x:.2f} {y:.2f}"]
+        for k in range(count):
+            (x0, y0), (x1, y1) = point(k), point(k + 1)
+            c1 = (x0 + (x1 - x0) / 3 - (y1 - y0) / 6, y0 + (y1 - y0) / 3 + (x1 - x0) / 6)
+            c2 = (x0 + 2 * (x1 - x0) / 3 - (y1 - y0) / 6, y0 + 2 * (y1 - y0) / 3 + (x1 - x0) / 6)
+            d.append(f"C {c1[0]:.2f} {c1[1]:.2f} {c2[0]:.2f} {c2[1]:.2f} {x1:.2f} {y1:.2f}")
+        d.append("Z")
+        paths.append(f'<path id="glyph_{i}" d="{" ".join(d)}" fill="#202020"/>')
+    return _svg_document(paths)
+
+
+def _svg_document(paths):
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {SVG_SIZE} {SVG_SIZE}">'
+        + "".join(paths) + "</svg>"
+    )
+
+
+class StageTimer:
+    """Times named stages, optionally under cProfile with one dump per stage."""
+    def __init__(self, profile_dir=None, prefix=""):
+        self.profile_dir = profile_dir
+        self.prefix = prefix
+        self.results = {}
+
+    def run(self, name, func, *args):
+        profiler = cProfile.Profile() if self.profile_dir else None
+        start = time.perf_counter()
+        if profiler:
+            result = profiler.runcall(func, *args)
+        else:
+            result = func(*args)
+        self.results[name] = round(time.perf_counter() - start, 6)
+        if profiler:
+            profiler.dump_stats(os.path.join(self.profile_dir, f"{self.prefix}{name}.prof"))
+        return result
+
+
+def simulate_animation(widget, path, anim_list, frames):
+    """
+    Replay a sequential drawing animation frame by frame.
+
+    Each frame completes the strokes due by then, moves the current one half
+    way, then redraws the canvas and looks up the pen position, like
+    Kivg.update_canvas does on every animation progress event.
+
+    Returns:
+        Tuple of (update_canvas seconds, get_current_pen_position seconds), one per frame
+    """
+    canvas_times, pen_times = [], []
+    done = 0
+    n_strokes = len(anim_list)
+    for frame in range(1, frames + 1):
+        due = n_strokes * frame // frames
+        for anim in anim_list[done:due]:
+            for key, value in anim.animated_properties.items():
+                setattr(widget, key, value)
+        done = due
+        if done < n_strokes:
+            for key, value in anim_list[done].animated_properties.items():
+                if key.endswith(("_x", "_y")):
+                    start = getattr(widget, key)
+                    setattr(widget, key, start + (value - start) / 2)
+                else:
+                    setattr(widget, key, value)
+
+        start = time.perf_counter()
+        SvgRenderer.update_canvas(widget, path, LINE_COLOR)
+        canvas_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        SvgRenderer.get_current_pen_position(widget, path)
+        pen_times.append(time.perf_counter() - start)
+    return canvas_times, pen_times
+
+
+def frame_stats(times):
+    ordered = sorted(times)
+    return {
+        "mean": round(statistics.fmean(times), 6),
+        "p50": round(ordered[len(ordered) // 2], 6),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 6),
+        "max": round(ordered[-1], 6),
+        "first": round(times[0], 6),
+        "last": round(times[-1], 6),
+    }
+
+
+def bench_case(kind, n_segments, frames, profile_dir=None):
+    """Time every stage for one generated SVG, returns a dict of results."""
+    markup = sketch_svg(n_segments) if kind == "sketch" else font_svg(n_segments)
+    timer = StageTimer(profile_dir, prefix=f"{kind}_{n_segments}_")
+    widget = Widget(size=(SVG_SIZE, SVG_SIZE))
+
+    timer.run("parse_svg", parse_svg, markup)
+    svg_size, closed_shapes, path = timer.run("process_path_data", DrawingManager.process_path_data, markup)
+    anim_list = timer.run(
+        "calculate_paths", DrawingManager.calculate_paths,
+        widget, closed_shapes, svg_size, "", True, 2, 0.02,
+    )
+    if kind == "font":
+        # one tesselation per path, as Kivg.fill_up_shapes does; sketch strokes are never filled
+        shape_lists = [closed_paths[id_ + "shapes"] for id_, closed_paths in closed_shapes.items()]
+        timer.run("generate_meshes", lambda: [MeshHandler.generate_meshes(shapes) for shapes in shape_lists])
+
+    profiler = cProfile.Profile() if profile_dir else None
+    if profiler:
+        profiler.enable()
+    canvas_times, pen_times = simulate_animation(widget, path, anim_list, frames)
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(os.path.join(profile_dir, f"{kind}_{n_segments}_animation.prof"))
+
+    return {
+        "kind": kind,
+        "segments": n_segments,
+        "svg_bytes": len(markup),
+        "stages": timer.results,
+        "frames": frames,
+        "update_canvas": frame_stats(canvas_times),
+        "get_current_pen_position": frame_stats(pen_times),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Kivg loading and per-frame cost")
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES, help="segment counts")
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=KINDS)
+    parser.add_argument("--frames", type=int, default=FRAMES, help="simulated animation frames")
+    parser.add_argument("--profile", help="directory for one cProfile dump per stage")
+    parser.add_argument("--output", help="write the results JSON here")
+    args = parser.parse_args(argv)
+
+    if args.profile:
+        os.makedirs(args.profile, exist_ok=True)
+    results = []
+    for kind in args.kinds:
+        for n_segments in args.sizes:
+            print(f"benchmarking {kind} svg, {n_segments} segments")
+            results.append(bench_case(kind, n_segments, args.frames, args.profile))
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""
+Benchmark suite for the image-to-video sketch pipeline.
+Times preprocessing, grid detection, the ordering walk, draw_hand_on_img,
+frame compositing / encoding and the H.264 conversion on synthetic images
+and on images checked into the repo, at the resolutions get_target_res
+produces, across split_len and skip rate settings. Runs headless (no Kivy
+window) and writes JSON; with --baseline it compares against a stored
+result and exits with status 1 when a timing regressed.
+
+Usage (from the kivy directory):
+    python benchmarks/bench_sketch.py --output bench.json
+    python benchmarks/bench_sketch.py --quick --baseline bench.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+os.environ.setdefault("KIVY_NO_FILELOG", "1")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+import sketchApi
+from sketchPlan import find_cell_rects, walk_order, clear_plan_cache, DEFAULT_CELLS
+from sketchMetrics import SketchMetrics, recording
+
+RESOLUTIONS = ((640, 360), (1280, 720), (1920, 1080), (2560, 1440), (3840, 2160))
+QUICK_RESOLUTIONS = ((640, 360), (1280, 720))
+SPLIT_LENS = (10, 20)
+SKIP_RATES = (8, 16)
+CHECKED_IN_IMAGES = (os.path.join(sketchApi.images_path, "drawing-hand.png"),)
+HAND_DRAWS = 200
+TOLERANCE = 0.15  # relative slowdown reported as a regression
+MIN_DELTA = 0.005  # seconds, smaller differences are noise
+
+
+def synthetic_image(width, height, seed=0):
+    """Line-art like test image: shapes and strokes over a soft gradient."""
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(200, 255, width, dtype=np.float32)
+    image = np.repeat(np.tile(gradient, (height, 1))[:, :, np.newaxis], 3, axis=2).astype(np.uint8)
+    scale = width / 640
+    for _ in range(40):
+        x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+        color = tuple(int(c) for c in rng.integers(0, 120, 3))
+        thickness = max(1, int(2 * scale))
+        if rng.random() < 0.5:
+            cv2.circle(image, (x, y), int(rng.integers(5, 60) * scale), color, thickness)
+        else:
+            x1, y1 = int(rng.integers(0, width)), int(rng.integers(0, height))
+            cv2.line(image, (x, y), (x1, y1), color, thickness)
+    cv2.putText(image, "sketch", (width // 10, height // 2), cv2.FONT_HERSHEY_SIMPLEX,
+                3 * scale, (20, 20, 20), max(1, int(4 * scale)))
+    return image
+
+
+def bench_images(resolutions, extra_images=()):
+    """Yield (name, width, height, BGR image at that resolution)."""
+    for width, height in resolutions:
+        yield "synthetic", width, height, synthetic_image(width, height)
+        for path in tuple(CHECKED_IN_IMAGES) + tuple(extra_images):
+            image = cv2.imread(path)
+            if image is None:
+                print(f"skipping unreadable image: {path}")
+                continue
+            name = os.path.splitext(os.path.basename(path))[0]
+            yield name, width, height, cv2.resize(image, (width, height))
+
+
+def timed(func, repeat):
+    """Median wall time of func over repeat runs, and the last result."""
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def new_variables(width, height, split_len=10, skip_rate=8, end_duration=1):
+    return sketchApi.AllVariables(
+        frame_rate=25, resize_wd=width, resize_ht=height, split_len=split_len,
+        object_skip_rate=skip_rate, bg_object_skip_rate=skip_rate,
+        end_gray_img_duration_in_sec=end_duration,
+    )
+
+
+def bench_case(name, width, height, image, split_lens, skip_rates, repeat, tmp_dir):
+    """Time every stage for one image at one resolution, returns {key: seconds}."""
+    results = {}
+    prefix = f"{name}/{width}x{height}"
+
+    def preprocess():
+        clear_plan_cache()
+        return sketchApi.preprocess_image(image, new_variables(width, height))
+
+    results[f"{prefix}/preprocess"], variables = timed(preprocess, repeat)
+    img_thresh = variables.img_thresh
+
+    hand_vars = sketchApi.preprocess_hand_image(sketchApi.hand_path, sketchApi.hand_mask_path, new_variables(width, height))
+    frame = np.full((height, width, 3), 255, np.uint8)
+
+    def draw_hands():
+        for i in range(HAND_DRAWS):
+            sketchApi.draw_hand_on_img(
+                frame.copy(), hand_vars.hand.copy(), (i * 37) % width, (i * 23) % height,
+                hand_vars.hand_mask_inv.copy(), hand_vars.hand_ht, hand_vars.hand_wd, height, width,
+            )
+
+    seconds, _ = timed(draw_hands, repeat)
+    results[f"{prefix}/draw_hand_on_img"] = seconds / HAND_DRAWS
+
+    for split_len in split_lens:
+        case = f"{prefix}/split{split_len}"
+        results[f"{case}/grid"], rects = timed(
+            lambda: find_cell_rects(img_thresh, split_len, DEFAULT_CELLS), repeat
+        )
+        results[f"{case}/ordering"], _ = timed(lambda: walk_order(rects[:, :2] // split_len), repeat)
+
+        for skip_rate in skip_rates:
+            raw_path = os.path.join(tmp_dir, "raw.mp4")
+            metrics = SketchMetrics()
+            with recording(metrics):
+                sketchApi.draw_whiteboard_animations(
+                    image, None, sketchApi.hand_path, sketchApi.hand_mask_path, raw_path,
+                    new_variables(width, height, split_len, skip_rate),
+                )
+            stages = metrics.to_dict()["stages"]
+            render = f"{case}/skip{skip_rate}"
+            results[f"{render}/composite"] = stages["composite"]["seconds"]
+            results[f"{render}/encode"] = stages["encode"]["seconds"]
+            start = time.perf_counter()
+            sketchApi.ffmpeg_convert(raw_path, os.path.join(tmp_dir, "h264.mp4"))
+            results[f"{render}/convert"] = time.perf_counter() - start
+    return {key: round(value, 6) for key, value in results.items()}
+
+
+def compare(results, baseline, tolerance=TOLERANCE, min_delta=MIN_DELTA):
+    """
+    Compare timings against a baseline.
+
+    Returns:
+        List of dicts ('key', 'baseline', 'current', 'ratio') of the timings
+        slower than the baseline by more than tolerance and min_delta seconds
+    """
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        if current > previous * (1 + tolerance) and current - previous > min_delta:
+            regressions.append({
+                "key": key, "baseline": previous, "current": current,
+                "ratio": round(current / previous, 3),
+            })
+    return regressions
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the sketch video pipeline")
+    parser.add_argument("--quick", action="store_true", help="small resolutions, one split_len and skip rate")
+    parser.add_argument("--resolutions", nargs="+", help="WIDTHxHEIGHT list, e.g. 640x360 1920x1080")
+    parser.add_argument("--split-lens", nargs="+", type=int)
+    parser.add_argument("--skip-rates", nargs="+", type=int)
+    parser.add_argument("--images", nargs="+", default=(), help="extra image files to benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per preprocessing/planning timing (median)")
+    parser.add_argument("--output", help="write the results JSON here")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args(argv)
+
+    if args.resolutions:
+        resolutions = [tuple(int(v) for v in res.lower().split("x")) for res in args.resolutions]
+    else:
+        resolutions = QUICK_RESOLUTIONS if args.quick else RESOLUTIONS
+    # only resolutions the app can render at
+    resolutions = [sketchApi.get_target_res(width, height) for width, height in resolutions]
+    split_lens = args.split_lens or (SPLIT_LENS[:1] if args.quick else SPLIT_LENS)
+    skip_rates = args.skip_rates or (SKIP_RATES[:1] if args.quick else SKIP_RATES)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, width, height, image in bench_images(resolutions, args.images):
+            print(f"benchmarking {name} at {width}x{height}")
+            results.update(bench_case(name, width, height, image, split_lens, skip_rates, args.repeat, tmp_dir))
+
+    report = {
+        "environment": environment(),
+        "settings": {
+            "resolutions": resolutions, "split_lens": list(split_lens),
+            "skip_rates": list(skip_rates), "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    status = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        report["regressions"] = compare(results, baseline, args.tolerance)
+        for item in report["regressions"]:
+            print(f"REGRESSION {item['key']}: {item['baseline']:.4f}s -> {item['current']:.4f}s (x{item['ratio']})")
+        print(f"{len(report['regressions'])} regressions over {len(results)} timings")
+        status = 1 if report["regressions"] else 0
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
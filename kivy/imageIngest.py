@@ -0,0 +1,237 @@
+"""
+Image ingest: header-only probing and reduced-resolution decoding.
+Dimensions and EXIF orientation are read from the PNG, JPEG or WebP header
+without decoding pixels, and large images are decoded with OpenCV's
+IMREAD_REDUCED_* modes when the render target is much smaller.
+"""
+import struct
+from typing import NamedTuple
+import cv2
+import numpy as np
+
+# IMREAD_REDUCED_* modes by reduction factor (color)
+_REDUCED_COLOR_MODES = {
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_EXIF_ORIENTATION_TAG = 0x0112
+_JPEG_HEADER_SCAN_LIMIT = 1024 * 1024  # SOF is near the start, don't read the whole file
+
+
+class ImageInfo(NamedTuple):
+    """Header information of an image file."""
+    width: int  # displayed width, after applying the orientation
+    height: int  # displayed height, after applying the orientation
+    orientation: int  # EXIF orientation, 1 = as stored
+    format: str  # "png", "jpeg" or "webp"
+
+
+def _exif_orientation(tiff):
+    """Read the orientation tag from an EXIF (TIFF structured) block, 1 if absent."""
+    if len(tiff) < 8 or tiff[:2] not in (b"II", b"MM"):
+        return 1
+    endian = "<" if tiff[:2] == b"II" else ">"
+    ifd_offset = struct.unpack(endian + "I", tiff[4:8])[0]
+    if ifd_offset + 2 > len(tiff):
+        return 1
+    n_entries = struct.unpack(endian + "H", tiff[ifd_offset:ifd_offset + 2])[0]
+    for i in range(n_entries):
+        entry = ifd_offset + 2 + i * 12
+        if entry + 12 > len(tiff):
+            break
+        tag, _, _, value = struct.unpack(endian + "HHIH", tiff[entry:entry + 10])
+        if tag == _EXIF_ORIENTATION_TAG:
+            return value if 1 <= value <= 8 else 1
+    return 1
+
+
+def _probe_png(f):
+    header = f.read(24)
+    if header[12:16] != b"IHDR":
+        return None
+    width, height = struct.unpack(">II", header[16:24])
+    return width, height, 1
+
+
+def _probe_jpeg(f):
+    f.seek(2)
+    orientation = 1
+    while f.tell() < _JPEG_HEADER_SCAN_LIMIT:
+        byte = f.read(1)
+        if not byte:
+            return None
+        if byte != b"\xff":
+            continue
+        marker = f.read(1)
+        while marker == b"\xff":  # fill bytes
+            marker = f.read(1)
+        if not marker:
+            return None
+        marker = marker[0]
+        if marker == 0x01 or 0xD0 <= marker <= 0xD9:
+            continue  # markers without a length
+        if marker == 0xDA:
+            return None  # start of scan without a frame header
+        length = struct.unpack(">H", f.read(2))[0]
+        if marker in _JPEG_SOF_MARKERS:
+            height, width = struct.unpack(">xHH", f.read(5))
+            return width, height, orientation
+        segment = f.read(length - 2)
+        if marker == 0xE1 and segment[:6] == b"Exif\x00\x00":
+            orientation = _exif_orientation(segment[6:])
+    return None
+
+
+def _probe_webp(f):
+    f.seek(12)
+    size = None
+    orientation = 1
+    while True:
+        chunk_header = f.read(8)
+        if len(chunk_header) < 8:
+            break
+        fourcc, length = chunk_header[:4], struct.unpack("<I", chunk_header[4:])[0]
+        chunk_end = f.tell() + length + (length & 1)  # chunks are padded to even size
+        if fourcc == b"VP8X" and size is None:
+            data = f.read(10)
+            width = 1 + int.from_bytes(data[4:7], "little")
+            height = 1 + int.from_bytes(data[7:10], "little")
+            size = (width, height)
+        elif fourcc == b"VP8 " and size is None:
+            # frame tag, start code, then the dimensions; the bitstream is not read
+            data = f.read(10)
+            if data[3:6] != b"\x9d\x01\x2a":
+                return None
+            width, height = struct.unpack("<HH", data[6:10])
+            return width & 0x3FFF, height & 0x3FFF, 1
+        elif fourcc == b"VP8L" and size is None:
+            data = f.read(5)
+            if data[:1] != b"\x2f":
+                return None
+            bits = struct.unpack("<I", data[1:5])[0]
+            return 1 + (bits & 0x3FFF), 1 + ((bits >> 14) & 0x3FFF), 1
+        elif fourcc == b"EXIF":
+            data = f.read(length)
+            if data[:6] == b"Exif\x00\x00":
+                data = data[6:]
+            orientation = _exif_orientation(data)
+        # skip the rest of the chunk (image data, ICC profile, XMP...)
+        f.seek(chunk_end)
+    if size is None:
+        return None
+    return size[0], size[1], orientation
+
+
+def probe_image(image_path):
+    """
+    Read an image's dimensions and orientation from its header.
+
+    Args:
+        image_path: Path of a PNG, JPEG or WebP file
+
+    Returns:
+        ImageInfo, or None when the format is not recognised or the header
+        is damaged (callers then fall back to a full decode)
+    """
+    try:
+        with open(image_path, "rb") as f:
+            signature = f.read(12)
+            f.seek(0)
+            if signature[:8] == b"\x89PNG\r\n\x1a\n":
+                image_format, probed = "png", _probe_png(f)
+            elif signature[:2] == b"\xff\xd8":
+                image_format, probed = "jpeg", _probe_jpeg(f)
+            elif signature[:4] == b"RIFF" and signature[8:12] == b"WEBP":
+                image_format, probed = "webp", _probe_webp(f)
+            else:
+                return None
+    except (OSError, struct.error):
+        return None
+    if probed is None:
+        return None
+    width, height, orientation = probed
+    if orientation >= 5:
+        # the image is stored rotated by 90 degrees
+        width, height = height, width
+    return ImageInfo(width, height, orientation, image_format)
+
+
+def image_size(image_path):
+    """
+    Return (width, height) of an image as displayed, reading only its header
+    when possible.
+
+    Returns:
+        Tuple of (width, height), or None if the image cannot be read
+    """
+    info = probe_image(image_path)
+    if info is not None:
+        return info.width, info.height
+    image_bgr = cv2.imread(image_path)
+    if image_bgr is None:
+        return None
+    return image_bgr.shape[1], image_bgr.shape[0]
+
+
+def reduction_factor(width, height, target_wd=None, target_ht=None):
+    """
+    Largest IMREAD_REDUCED_* factor that still keeps the decoded image at
+    least as large as the target on both sides.
+
+    Returns:
+        1, 2, 4 or 8
+    """
+    if not target_wd or not target_ht:
+        return 1
+    for factor in (8, 4, 2):
+        if width // factor >= target_wd and height // factor >= target_ht:
+            return factor
+    return 1
+
+
+def apply_orientation(image, orientation):
+    """Rotate / flip a decoded image as its EXIF orientation asks."""
+    if orientation == 2:
+        return cv2.flip(image, 1)
+    if orientation == 3:
+        return cv2.rotate(image, cv2.ROTATE_180)
+    if orientation == 4:
+        return cv2.flip(image, 0)
+    if orientation == 5:
+        return cv2.transpose(image)
+    if orientation == 6:
+        return cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE)
+    if orientation == 7:
+        return cv2.flip(cv2.transpose(image), -1)
+    if orientation == 8:
+        return cv2.rotate(image, cv2.ROTATE_90_COUNTERCLOCKWISE)
+    return image
+
+
+def read_image(image_path, target_wd=None, target_ht=None, info=None):
+    """
+    Decode an image in BGR, at a reduced resolution when the target is at
+    least twice smaller than the source on both sides.
+
+    Args:
+        image_path: Path of the image
+        target_wd: Width the image will be resized to (optional)
+        target_ht: Height the image will be resized to (optional)
+        info: ImageInfo from probe_image, probed here when not given
+
+    Returns:
+        BGR image (np.ndarray), or None if it cannot be read, like cv2.imread
+    """
+    if info is None:
+        info = probe_image(image_path)
+    if info is None:
+        return cv2.imread(image_path)
+
+    factor = reduction_factor(info.width, info.height, target_wd, target_ht)
+    flags = _REDUCED_COLOR_MODES.get(factor, cv2.IMREAD_COLOR) | cv2.IMREAD_IGNORE_ORIENTATION
+    image_bgr = cv2.imread(image_path, flags)
+    if image_bgr is None:
+        return None
+    return np.ascontiguousarray(apply_orientation(image_bgr, info.orientation))
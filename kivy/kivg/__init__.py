@@ -3,10 +3,12 @@ Kivg - SVG drawing and animation for Kivy
 """
 from kivy.logger import Logger
 from .main import Kivg
+from .data_classes import SvgGeometry
 from .version import __version__
 from .text_to_svg import (
     text_to_svg_file,
     text_to_svg_paths,
+    text_to_geometry,
     get_text_animation_config,
     find_system_font
 )
@@ -16,8 +18,10 @@ Logger.info(_log_message)
 
 __all__ = [
     "Kivg",
+    "SvgGeometry",
     "text_to_svg_file",
     "text_to_svg_paths",
+    "text_to_geometry",
     "get_text_animation_config",
     "find_system_font"
 ]
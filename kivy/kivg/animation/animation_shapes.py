@@ -5,6 +5,7 @@ from kivg.animation.kivy_animation import Animation
 from typing import Dict, List, Tuple
 
 from kivg.data_classes import AnimationContext
+from .shape_tween import ShapeTween
 from ..path_utils import find_center, line_points, bezier_points
 from svg.path.path import Line, CubicBezier
 
@@ -62,8 +63,40 @@ class ShapeAnimator:
 
         # Store the extracted path data for later use
         setattr(caller, f"{context.shape_id}_tmp", path_data)
+        setattr(caller, f"{context.shape_id}_tween", None)
         return anim_list
     
+    @staticmethod
+    def setup_batched_animation(caller, context: AnimationContext):
+        """
+        Set up a single batched animation for a given shape.
+        
+        All control points of the shape are kept in a ShapeTween and
+        interpolated together; only one widget property
+        ({shape_id}_mesh_progress) is animated, with the transition applied once.
+        Args:
+            caller: The widget calling the animation
+            context: AnimationContext containing animation parameters
+        Returns:
+            Animation object, or None if the shape has nothing to animate
+        """
+        if context.shape_id not in context.closed_shapes:
+            return None
+        
+        caller.prev_shapes = []
+        caller.curr_shape = []
+
+        path_data = ShapeAnimator._extract_path_data(context.widget, context.shape_id, context.closed_shapes, context.sw_size, context.svg_file)
+        
+        if not any(path_data):
+            return None
+        
+        progress_prop = f"{context.shape_id}_mesh_progress"
+        setattr(context.widget, progress_prop, 0)
+        setattr(caller, f"{context.shape_id}_tmp", path_data)
+        setattr(caller, f"{context.shape_id}_tween", ShapeTween.from_path_data(path_data, context.direction))
+        return Animation(d=context.duration, t=context.transition, **{progress_prop: 1})
+    
     @staticmethod
     def _extract_path_data(widget, shape_id: str, closed_shapes: Dict, 
                           sw_size: Tuple[float, float], sf: str) -> List[List]:
@@ -28,14 +28,22 @@ class AnimationHandler:
         if not animations:
             return None
             
-        combined = animations[0]
-        for anim in animations[1:]:
-            if sequential:
-                combined += anim  # Sequential
-            else:
-                combined &= anim  # Parallel
+        # Combine pairwise so the compound tree stays balanced. A left-deep
+        # chain of thousands of steps (e.g. a generated sketch) would
+        # exceed the recursion limit when the animation is started.
+        combined = list(animations)
+        while len(combined) > 1:
+            paired = []
+            for i in range(0, len(combined) - 1, 2):
+                if sequential:
+                    paired.append(combined[i] + combined[i + 1])  # Sequential
+                else:
+                    paired.append(combined[i] & combined[i + 1])  # Parallel
+            if len(combined) % 2:
+                paired.append(combined[-1])
+            combined = paired
                 
-        return combined
+        return combined[0]
     
     @staticmethod
     def add_fill_animation(anim: Animation, widget: Any, 
@@ -108,7 +116,8 @@ class AnimationHandler:
         anim_config_list: List[dict],
         closed_shapes: dict,
         svg_size: List[float],
-        svg_file: str
+        svg_file: str,
+        batched: bool = True
     ) -> List[tuple]:
         """
         Prepare animations for shapes based on configuration.
@@ -120,6 +129,8 @@ class AnimationHandler:
             closed_shapes: SVG path data organized by shape ID
             svg_size: SVG dimensions
             svg_file: SVG file path
+            batched: Use one vectorized animation per shape (ShapeTween)
+                instead of one Animation per line/bezier joined in parallel
             
         Returns:
             List of tuples (shape_id, animation) for the shapes
@@ -139,6 +150,12 @@ class AnimationHandler:
                 svg_file=svg_file
             )
             
+            if batched:
+                anim = ShapeAnimator.setup_batched_animation(caller, context)
+                if anim:
+                    animation_list.append((config["id_"], anim))
+                continue
+            
             # Get animation list from ShapeAnimator
             anim_list = AnimationHandler.setup_shape_animations(caller, context)
             
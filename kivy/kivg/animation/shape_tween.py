@@ -0,0 +1,113 @@
+"""
+Vectorized shape tweening for Kivg shape animations.
+"""
+from typing import List, Optional
+
+import numpy as np
+
+from ..path_utils import bezier_basis, find_center
+
+# Bernstein weights shared by all tweens (same sampling as get_all_points)
+_BEZIER_BASIS = bezier_basis()
+
+
+class ShapeTween:
+    """
+    Start and target control points of a whole shape as NumPy arrays.
+    
+    The shape is interpolated in one vectorized step per tick instead of
+    one Animation per line/bezier property.
+    """
+
+    def __init__(self, start: np.ndarray, target: np.ndarray, kinds: List[int]):
+        """
+        Initialize the tween.
+        
+        Args:
+            start: (N, 2) control points at the start of the animation
+            target: (N, 2) control points at the end of the animation
+            kinds: Number of control points of each element in order
+                (2 for a line, 4 for a bezier)
+        """
+        self.start = start
+        self.delta = target - start
+
+        # Precompute where every element lands in the flattened shape list
+        line_in, line_out, bezier_in, bezier_out = [], [], [], []
+        n_samples = len(_BEZIER_BASIS)
+        offset_in = 0
+        offset_out = 0
+        for kind in kinds:
+            if kind == 2:
+                line_in.extend((offset_in, offset_in + 1))
+                line_out.extend((offset_out, offset_out + 1))
+                offset_out += 2
+            else:
+                bezier_in.append(offset_in)
+                bezier_out.extend(range(offset_out, offset_out + n_samples))
+                offset_out += n_samples
+            offset_in += kind
+
+        self._line_in = np.array(line_in, dtype=int)
+        self._line_out = np.array(line_out, dtype=int)
+        self._bezier_in = np.array(bezier_in, dtype=int)
+        self._bezier_out = np.array(bezier_out, dtype=int)
+        self._n_out = offset_out
+
+    @classmethod
+    def from_path_data(cls, path_data: List[List], direction: Optional[str]) -> "ShapeTween":
+        """
+        Build a tween from extracted shape path data.
+        
+        Args:
+            path_data: Paths of the shape, as returned by
+                ShapeAnimator._extract_path_data
+            direction: Direction of the animation (left, right, top, bottom,
+                center_x, center_y) or None for a direct reveal
+            
+        Returns:
+            ShapeTween object
+        """
+        kinds = []
+        points = []
+        for path in path_data:
+            for element in path:
+                kinds.append(len(element))
+                points.extend(element)
+
+        target = np.array(points, dtype=float).reshape(-1, 2)
+        start = target.copy()
+
+        if direction and len(target):
+            axis = 0 if direction in ("left", "right", "center_x") else 1
+            coordinates = target[:, axis]
+            if direction in ("top", "right"):
+                base_point = coordinates.max()  # Start from rightmost/topmost point
+            elif direction in ("left", "bottom"):
+                base_point = coordinates.min()  # Start from leftmost/bottommost point
+            else:
+                base_point = find_center(np.sort(coordinates))
+            start[:, axis] = base_point
+
+        return cls(start, target, kinds)
+
+    def points_at(self, progress: float) -> List[float]:
+        """
+        Get the flattened shape points at a given (already eased) progress.
+        
+        Args:
+            progress: Transitioned animation progress, 0 at start, 1 at target
+            
+        Returns:
+            Flattened list of points [x1, y1, x2, y2, ...], laid out like
+            SvgRenderer.collect_shape_points
+        """
+        current = self.start + self.delta * progress
+        out = np.empty((self._n_out, 2))
+        if len(self._line_in):
+            out[self._line_out] = current[self._line_in]
+        if len(self._bezier_in):
+            controls = np.stack([current[self._bezier_in + k] for k in range(4)], axis=1)
+            samples = np.einsum("sk,bkd->bsd", _BEZIER_BASIS, controls)
+            out[self._bezier_out] = samples.reshape(-1, 2)
+        return out.ravel().tolist()
@@ -1,4 +1,5 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import List, Tuple
 
 @dataclass
 class AnimationContext:
@@ -10,3 +11,16 @@ class AnimationContext:
     closed_shapes: dict
     sw_size: tuple
     svg_file: str
+
+@dataclass(eq=False)
+class SvgGeometry:
+    """
+    Pre-built drawing data that Kivg can render without reading SVG text.
+
+    shapes holds one (shape_id, color, segments) tuple per SVG path, where
+    segments is a list of svg.path segments (Move, Line, CubicBezier, Close).
+    Instances compare by identity so Kivg can cache them like file paths.
+    """
+    svg_size: List[float]
+    shapes: List[Tuple[str, List[float], list]] = field(default_factory=list)
+    name: str = ""
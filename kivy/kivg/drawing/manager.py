@@ -3,36 +3,63 @@ DrawingManager handles SVG path processing and rendering preparation.
 """
 
 from collections import OrderedDict
-from typing import List, Tuple, Dict, Any, Optional
+from typing import List, Tuple, Dict, Any, Optional, Union
 
 from svg.path import parse_path
 from svg.path.path import Line, CubicBezier, Close, Move
 
 from ..animation.kivy_animation import Animation
 from ..path_utils import get_all_points, bezier_points, line_points
-from ..svg_parser import parse_svg
+from ..svg_parser import parse_svg, is_svg_markup
+from ..data_classes import SvgGeometry
 
 
 class DrawingManager:
     """Handles the drawing and rendering of SVG paths."""
     
     @staticmethod
-    def process_path_data(svg_file: str) -> Tuple[List[float], OrderedDict, List]:
+    def source_name(svg_source: Union[str, SvgGeometry]) -> str:
         """
-        Process SVG file and extract path data.
+        Get the name used for file-based special cases (e.g. kivy icons).
         
         Args:
-            svg_file: Path to the SVG file
+            svg_source: SVG file path, SVG markup string or SvgGeometry
+            
+        Returns:
+            The file path, the geometry name, or "" for inline markup
+        """
+        if isinstance(svg_source, SvgGeometry):
+            return svg_source.name
+        if is_svg_markup(svg_source):
+            return ""
+        return svg_source
+
+    @staticmethod
+    def process_path_data(svg_file: Union[str, SvgGeometry]) -> Tuple[List[float], OrderedDict, List]:
+        """
+        Process SVG data and extract path data.
+        
+        Args:
+            svg_file: Path to the SVG file, SVG markup string, or a
+                pre-built SvgGeometry (used as is, no XML parsing)
             
         Returns:
             Tuple of (svg_dimensions, closed_shapes, path_elements)
         """
-        sw_size, path_strings = parse_svg(svg_file)
+        if isinstance(svg_file, SvgGeometry):
+            sw_size = list(svg_file.svg_size)
+            shapes = svg_file.shapes
+        else:
+            sw_size, path_strings = parse_svg(svg_file)
+            shapes = [
+                (id_, clr, parse_path(path_string))
+                for path_string, id_, clr in path_strings
+            ]
         
         path = []
         closed_shapes = OrderedDict()
         
-        for path_string, id_, clr in path_strings:
+        for id_, clr, segments in shapes:
             move_found = False
             tmp = []
             closed_shapes[id_] = dict()
@@ -40,8 +67,7 @@ class DrawingManager:
             closed_shapes[id_][id_ + "shapes"] = []  # for drawing meshes
             closed_shapes[id_]["color"] = clr
             
-            _path = parse_path(path_string)
-            for e in _path:
+            for e in segments:
                 path.append(e)
 
                 if isinstance(e, Close) or (isinstance(e, Move) and move_found):
@@ -54,6 +80,10 @@ class DrawingManager:
 
                 if not isinstance(e, Move) and move_found:
                     tmp.append(e)
+
+            # keep a trailing open sub-path (e.g. sketch strokes without "Z")
+            if move_found and tmp:
+                closed_shapes[id_][id_ + "paths"].append(tmp)
         
         return sw_size, closed_shapes, path
 
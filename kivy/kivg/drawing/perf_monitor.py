@@ -0,0 +1,193 @@
+"""
+PerfMonitor records per-tick timings of Kivg animations and can show them
+in a small overlay on the widget.
+"""
+
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from kivy.config import Config
+from kivy.core.text import Label as CoreLabel
+from kivy.graphics import Color, Rectangle, InstructionGroup
+
+STAGES = ("canvas", "pen", "fill")
+
+
+class PerfMonitor:
+    """
+    Opt-in instrumentation of a Kivg instance (see Kivg.enable_metrics).
+
+    A tick is one animation progress callback (update_canvas, a fill step or
+    a shape animation step). For each tick it records the time spent per
+    stage, the number of top-level canvas instructions, the segments
+    completed and remaining, and the frames dropped since the previous tick
+    relative to the Clock target frame rate.
+    """
+
+    def __init__(self, widget: Any, target_fps: Optional[float] = None,
+                 on_tick: Optional[Callable[[Dict], None]] = None,
+                 overlay: bool = False, max_ticks: int = 10000,
+                 overlay_interval: float = 0.25):
+        """
+        Initialize the PerfMonitor.
+
+        Args:
+            widget: Widget the animation draws on
+            target_fps: Expected frame rate, defaults to the graphics maxfps
+                setting (60 when unlimited)
+            on_tick: Called with each tick record (dict) as it is recorded
+            overlay: Show a summary in the widget's top-left corner
+            max_ticks: Number of tick records kept for export
+            overlay_interval: Seconds between overlay refreshes
+        """
+        self.widget = widget
+        if not target_fps:
+            target_fps = Config.getint("graphics", "maxfps") or 60
+        self.target_fps = float(target_fps)
+        self.on_tick = on_tick
+        self.ticks: deque = deque(maxlen=max_ticks)
+        self.segments_total = 0
+        self.segments_done = 0
+        self.dropped_frames = 0
+        self.tick_count = 0
+
+        self._tick_start: Optional[float] = None
+        self._last_tick_start: Optional[float] = None
+        self._stages: Dict[str, float] = {}
+
+        self._overlay_group: Optional[InstructionGroup] = None
+        self._overlay_rect: Optional[Rectangle] = None
+        self._overlay_bg: Optional[Rectangle] = None
+        self._overlay_label: Optional[CoreLabel] = None
+        self._overlay_interval = overlay_interval
+        self._overlay_updated = 0.0
+        if overlay:
+            self._create_overlay()
+
+    def start_run(self, segments_total: int) -> None:
+        """Reset segment progress for a new draw animation."""
+        self.segments_total = segments_total
+        self.segments_done = 0
+        self._last_tick_start = None  # the idle gap before a run is not dropped frames
+
+    def on_segment_complete(self, *args) -> None:
+        """Count a finished segment (bound to each stroke animation's on_complete)."""
+        self.segments_done += 1
+
+    def begin_tick(self) -> None:
+        """Start timing a tick."""
+        self._tick_start = time.perf_counter()
+        self._stages = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a stage of the current tick."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._stages[name] = self._stages.get(name, 0.0) + time.perf_counter() - start
+
+    def end_tick(self) -> None:
+        """Finish the current tick and record it."""
+        if self._tick_start is None:
+            return
+        end = time.perf_counter()
+        dropped = 0
+        interval = None
+        if self._last_tick_start is not None:
+            interval = self._tick_start - self._last_tick_start
+            # a tick every 1/target_fps is on time, longer gaps skipped frames
+            dropped = max(0, int(round(interval * self.target_fps)) - 1)
+        self.dropped_frames += dropped
+        self.tick_count += 1
+
+        record = {
+            "time": round(self._tick_start, 6),
+            "interval": None if interval is None else round(interval, 6),
+            "total": round(end - self._tick_start, 6),
+            "stages": {name: round(seconds, 6) for name, seconds in self._stages.items()},
+            "instructions": len(self.widget.canvas.children),
+            "segments_done": self.segments_done,
+            "segments_remaining": max(self.segments_total - self.segments_done, 0),
+            "dropped": dropped,
+        }
+        self.ticks.append(record)
+        self._last_tick_start = self._tick_start
+        self._tick_start = None
+
+        if self.on_tick:
+            self.on_tick(record)
+        if self._overlay_group is not None and end - self._overlay_updated >= self._overlay_interval:
+            self._overlay_updated = end
+            self._update_overlay(record)
+
+    def summary(self) -> Dict:
+        """
+        Aggregate figures over the recorded ticks.
+
+        Returns:
+            dict with 'ticks', 'dropped_frames', 'target_fps', per stage
+            'mean' and 'max' seconds, and the segment progress
+        """
+        stages = {}
+        for name in STAGES:
+            values = [tick["stages"][name] for tick in self.ticks if name in tick["stages"]]
+            if values:
+                stages[name] = {
+                    "mean": round(sum(values) / len(values), 6),
+                    "max": round(max(values), 6),
+                }
+        totals = [tick["total"] for tick in self.ticks]
+        return {
+            "ticks": self.tick_count,
+            "dropped_frames": self.dropped_frames,
+            "target_fps": self.target_fps,
+            "tick_mean": round(sum(totals) / len(totals), 6) if totals else 0.0,
+            "tick_max": round(max(totals), 6) if totals else 0.0,
+            "stages": stages,
+            "segments_done": self.segments_done,
+            "segments_total": self.segments_total,
+        }
+
+    def export_json(self, path: str) -> None:
+        """Write the summary and the recorded ticks to a JSON file."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"summary": self.summary(), "ticks": list(self.ticks)}, f, indent=2)
+
+    def _create_overlay(self) -> None:
+        self._overlay_label = CoreLabel(text="", font_size=12, color=(1, 1, 1, 1))
+        self._overlay_group = InstructionGroup()
+        self._overlay_group.add(Color(0, 0, 0, 0.6))
+        self._overlay_bg = Rectangle(size=(0, 0))
+        self._overlay_group.add(self._overlay_bg)
+        self._overlay_group.add(Color(1, 1, 1, 1))
+        self._overlay_rect = Rectangle(size=(0, 0))
+        self._overlay_group.add(self._overlay_rect)
+        # canvas.after survives the canvas.clear() done on every tick
+        self.widget.canvas.after.add(self._overlay_group)
+
+    def _update_overlay(self, record: Dict) -> None:
+        stages = record["stages"]
+        lines: List[str] = [
+            f"tick {record['total'] * 1000:.1f} ms  dropped {self.dropped_frames}",
+            "  ".join(f"{name} {stages[name] * 1000:.1f}" for name in STAGES if name in stages),
+            f"instr {record['instructions']}  seg {record['segments_done']}/{self.segments_total}",
+        ]
+        self._overlay_label.text = "\n".join(lines)
+        self._overlay_label.refresh()
+        texture = self._overlay_label.texture
+        self._overlay_rect.texture = texture
+        self._overlay_rect.size = texture.size
+        self._overlay_rect.pos = (self.widget.x, self.widget.top - texture.height)
+        self._overlay_bg.size = texture.size
+        self._overlay_bg.pos = self._overlay_rect.pos
+
+    def remove_overlay(self) -> None:
+        """Remove the overlay from the widget."""
+        if self._overlay_group is not None:
+            self.widget.canvas.after.remove(self._overlay_group)
+            self._overlay_group = None
@@ -0,0 +1,99 @@
+"""
+StrokeBaker flattens completed strokes into an offscreen texture during
+sequential draw animations.
+"""
+
+from kivy.graphics import Fbo, Color, Rectangle, Translate
+from typing import Any, List, Optional, Tuple
+
+from ..svg_renderer import SvgRenderer
+
+
+class StrokeBaker:
+    """
+    Keeps the canvas of a long draw animation bounded.
+    
+    Completed strokes are periodically rendered once into an Fbo and dropped
+    from the canvas. Each tick only draws a single textured rectangle plus
+    the strokes completed since the last bake and the one in progress.
+    """
+
+    def __init__(self, widget: Any, drawables: List[Tuple[str, int]],
+                 line_color: List[float], bake_every: int = 200):
+        """
+        Initialize the StrokeBaker.
+        
+        Args:
+            widget: Widget the strokes are drawn on
+            drawables: ("line" | "bezier", index) of every stroke in drawing order
+            line_color: Color of the strokes
+            bake_every: Number of newly completed strokes that triggers a bake
+        """
+        self.widget = widget
+        self.drawables = drawables
+        self.line_color = line_color
+        self.bake_every = max(1, int(bake_every))
+        self.completed = 0  # strokes whose animation has finished
+        self.baked = 0  # strokes already flattened into the texture
+        self._fbo: Optional[Fbo] = None
+        self._origin = tuple(widget.pos)
+
+        size = (int(widget.width), int(widget.height))
+        if size[0] > 0 and size[1] > 0:
+            self._fbo = Fbo(size=size, clear_color=(0, 0, 0, 0))
+            self._fbo.bind()
+            self._fbo.clear_buffer()
+            self._fbo.release()
+
+    def on_stroke_complete(self, *args) -> None:
+        """Count a finished stroke (bound to each stroke animation's on_complete)."""
+        self.completed += 1
+
+    def _bake(self) -> None:
+        """Render strokes completed since the last bake into the texture."""
+        # Drop the previous batch: its pixels are already in the texture
+        self._fbo.clear()
+        with self._fbo:
+            Translate(-self._origin[0], -self._origin[1])
+            Color(*self.line_color)
+            for kind, index in self.drawables[self.baked:self.completed]:
+                SvgRenderer.draw_element(self.widget, kind, index)
+        self._fbo.draw()
+        self._fbo.clear()
+        self.baked = self.completed
+
+    def update_canvas(self) -> None:
+        """Redraw the widget: baked texture plus the live strokes."""
+        if self._fbo is not None and self.completed - self.baked >= self.bake_every:
+            self._bake()
+
+        widget = self.widget
+        widget.canvas.clear()
+        with widget.canvas:
+            if self.baked:
+                Color(1, 1, 1, 1)
+                Rectangle(texture=self._fbo.texture, pos=self._origin, size=self._fbo.size)
+            Color(*self.line_color)
+            # completed but not yet baked strokes, then the one in progress
+            for kind, index in self.drawables[self.baked:self.completed + 1]:
+                SvgRenderer.draw_element(widget, kind, index)
+
+    def pen_position(self) -> Optional[Tuple[float, float]]:
+        """End point of the stroke in progress (or of the last finished one)."""
+        position = None
+        for i in (self.completed, self.completed - 1):
+            if 0 <= i < len(self.drawables):
+                kind, index = self.drawables[i]
+                start_x = getattr(self.widget, f"{kind}{index}_start_x")
+                start_y = getattr(self.widget, f"{kind}{index}_start_y")
+                end_x = getattr(self.widget, f"{kind}{index}_end_x")
+                end_y = getattr(self.widget, f"{kind}{index}_end_y")
+                if abs(end_x - start_x) > 0.001 or abs(end_y - start_y) > 0.001:
+                    position = (end_x, end_y)
+                    break
+        return position
+
+    def release(self) -> None:
+        """Free the offscreen buffer."""
+        self._fbo = None
+        self.baked = 0
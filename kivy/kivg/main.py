@@ -3,10 +3,9 @@ Kivg - SVG drawing and animation for Kivy
 Core class and main API
 """
 
-import os
-import tempfile
 from collections import OrderedDict
-from typing import List, Tuple, Dict, Any, Callable, Optional
+from contextlib import nullcontext
+from typing import List, Tuple, Dict, Any, Callable, Optional, Union
 
 from kivg.animation.kivy_animation import Animation
 from kivg.drawing.manager import DrawingManager
@@ -14,8 +13,11 @@ from kivg.animation.handler import AnimationHandler
 from kivg.mesh_handler import MeshHandler
 from kivg.svg_renderer import SvgRenderer
 from kivg.drawing.pen_tracker import PenTracker
+from kivg.drawing.stroke_baker import StrokeBaker
+from kivg.drawing.perf_monitor import PerfMonitor
+from kivg.data_classes import SvgGeometry
 from kivg.text_to_svg import (
-    text_to_svg_file,
+    text_to_geometry,
     get_text_animation_config,
     find_system_font
 )
@@ -42,7 +44,7 @@ class Kivg:
         self._line_width = 2
         self._line_color = [0, 0, 0, 1]
         self._animation_duration = 0.02
-        self._previous_svg_file = ""  # Cache previous SVG file
+        self._previous_svg_file = ""  # Cache previous SVG source (path, string or geometry)
         
         # Animation state
         self.path = []
@@ -61,17 +63,45 @@ class Kivg:
         self._show_hand = False
         self._current_pen_pos: Optional[Tuple[float, float]] = None  # Store current pen position
         
-        # Temporary file management for text rendering
-        self._temp_text_svg: Optional[str] = None
+        # Offscreen baking of completed strokes (draw(..., bake_strokes=True))
+        self._stroke_baker: Optional[StrokeBaker] = None
+        
+        # Per-tick instrumentation, off unless enable_metrics() is called
+        self.metrics: Optional[PerfMonitor] = None
+
+    def enable_metrics(self, overlay: bool = False, on_tick: Optional[Callable[[Dict], None]] = None,
+                       target_fps: Optional[float] = None, max_ticks: int = 10000) -> PerfMonitor:
+        """
+        Record per-tick performance figures of the animations.
+        
+        Args:
+            overlay: Show a live summary in the widget's top-left corner
+            on_tick: Called with each tick record (dict)
+            target_fps: Frame rate used to count dropped frames, defaults
+                to the graphics maxfps setting
+            max_ticks: Number of tick records kept for export_json()
+            
+        Returns:
+            The PerfMonitor, also available as self.metrics
+        """
+        self.disable_metrics()
+        self.metrics = PerfMonitor(
+            self.widget, target_fps=target_fps, on_tick=on_tick,
+            overlay=overlay, max_ticks=max_ticks
+        )
+        return self.metrics
+
+    def disable_metrics(self) -> Optional[PerfMonitor]:
+        """Stop recording, remove the overlay and return the last PerfMonitor (if any)."""
+        metrics = self.metrics
+        if metrics:
+            metrics.remove_overlay()
+        self.metrics = None
+        return metrics
 
-    def _cleanup_temp_svg(self) -> None:
-        """Clean up temporary SVG file if it exists."""
-        if self._temp_text_svg and os.path.exists(self._temp_text_svg):
-            try:
-                os.unlink(self._temp_text_svg)
-            except OSError:
-                pass  # Ignore cleanup errors
-            self._temp_text_svg = None
+    def _stage(self, name: str):
+        """Timing context of a tick stage, a no-op when metrics are disabled."""
+        return self.metrics.stage(name) if self.metrics else nullcontext()
 
     def fill_up(self, shapes: List[List[float]], color: List[float]) -> None:
         """
@@ -89,10 +119,16 @@ class Kivg:
         Clears the canvas first to remove stroke lines from the drawing animation,
         then renders filled shapes.
         """
-        self.widget.canvas.clear()
-        for id_, closed_paths in self.closed_shapes.items():
-            color = self.closed_shapes[id_]["color"]
-            self.fill_up(closed_paths[id_ + "shapes"], color)
+        metrics = self.metrics
+        if metrics:
+            metrics.begin_tick()
+        with self._stage("fill"):
+            self.widget.canvas.clear()
+            for id_, closed_paths in self.closed_shapes.items():
+                color = self.closed_shapes[id_]["color"]
+                self.fill_up(closed_paths[id_ + "shapes"], color)
+        if metrics:
+            metrics.end_tick()
     
     def fill_up_shapes_anim(self, shapes: List[Tuple[List[float], List[float]]], *args) -> None:
         """Fill shapes during animation."""
@@ -104,6 +140,8 @@ class Kivg:
         """Handle completion of an animation in the sequence."""
         self.curr_count += 1
         self.prev_shapes.append(self.curr_shape)
+        if self.metrics:
+            self.metrics.on_segment_complete()
         
         if self.curr_count < len(self.all_anim):
             id_, animation = self.all_anim[self.curr_count]
@@ -125,29 +163,63 @@ class Kivg:
         
         Called during animation progress. Updates the current shape.
         """
+        metrics = self.metrics
+        if metrics:
+            metrics.begin_tick()
         id_ = getattr(self, "curr_id")
-        elements_list = getattr(self, f"{id_}_tmp")
+        tween = getattr(self, f"{id_}_tween", None)
 
-        shape_list = SvgRenderer.collect_shape_points(elements_list, self.widget, id_)
-        
-        self.widget.canvas.clear()
-        self.curr_shape = (getattr(self, "curr_clr"), shape_list)
-        shapes = [*self.prev_shapes, self.curr_shape]
-        self.fill_up_shapes_anim(shapes)
+        with self._stage("fill"):
+            if tween is not None:
+                # Batched engine: whole shape interpolated in one step
+                progress = getattr(self.widget, f"{id_}_mesh_progress")
+                shape_list = tween.points_at(progress)
+            else:
+                elements_list = getattr(self, f"{id_}_tmp")
+                shape_list = SvgRenderer.collect_shape_points(elements_list, self.widget, id_)
+            
+            self.widget.canvas.clear()
+            self.curr_shape = (getattr(self, "curr_clr"), shape_list)
+            shapes = [*self.prev_shapes, self.curr_shape]
+            self.fill_up_shapes_anim(shapes)
+        if metrics:
+            metrics.end_tick()
 
     def update_canvas(self, *args, **kwargs) -> None:
         """Update the canvas with the current drawing state."""
-        SvgRenderer.update_canvas(self.widget, self.path, self._line_color)
-        
-        # Update and store current pen position
-        pen_pos = SvgRenderer.get_current_pen_position(self.widget, self.path)
-        if pen_pos:
-            self._current_pen_pos = pen_pos
+        metrics = self.metrics
+        if metrics:
+            metrics.begin_tick()
+        with self._stage("canvas"):
+            if self._stroke_baker:
+                # Baked texture + live strokes only
+                self._stroke_baker.update_canvas()
+            else:
+                SvgRenderer.update_canvas(self.widget, self.path, self._line_color)
         
-        # Update pen tracker position if active
-        if self._pen_tracker and self._pen_tracker.is_active and self._current_pen_pos:
-            self._pen_tracker.update_position(*self._current_pen_pos)
+        with self._stage("pen"):
+            if self._stroke_baker:
+                # pen is on the stroke in progress
+                pen_pos = self._stroke_baker.pen_position()
+            else:
+                pen_pos = SvgRenderer.get_current_pen_position(self.widget, self.path)
+            
+            # Update and store current pen position
+            if pen_pos:
+                self._current_pen_pos = pen_pos
+            
+            # Update pen tracker position if active
+            if self._pen_tracker and self._pen_tracker.is_active and self._current_pen_pos:
+                self._pen_tracker.update_position(*self._current_pen_pos)
+        if metrics:
+            metrics.end_tick()
     
+    def _release_stroke_baker(self, *args) -> None:
+        """Free the offscreen texture once the strokes are fully drawn."""
+        if self._stroke_baker:
+            self._stroke_baker.release()
+            self._stroke_baker = None
+
     def _on_draw_complete(self, *args) -> None:
         """Handle completion of draw animation."""
         # Slide out the hand with animation instead of stopping immediately
@@ -160,13 +232,14 @@ class Kivg:
         """Handle completion of hand slide-out animation."""
         self._current_pen_pos = None
 
-    def draw(self, svg_file: str, animate: bool = False, 
+    def draw(self, svg_file: Union[str, SvgGeometry], animate: bool = False, 
              anim_type: str = "seq", *args, **kwargs) -> None:
         """
         Draw an SVG file onto the widget with optional animation.
         
         Args:
-            svg_file: Path to the SVG file
+            svg_file: Path to the SVG file, an SVG document string, or a
+                pre-built SvgGeometry (skips file I/O and XML parsing)
             animate: Whether to animate the drawing process
             anim_type: Animation type - "seq" for sequential or "par" for parallel
             
@@ -180,6 +253,10 @@ class Kivg:
             hand_image: Path to custom hand image file (str)
             hand_size: Size of hand image as (width, height) tuple
             pen_offset: Offset of pen tip in hand image as (x, y) tuple
+            bake_strokes: Periodically flatten completed strokes into an
+                offscreen texture so the canvas stays small during long
+                sequential animations (bool)
+            bake_every: Number of completed strokes per flatten (int)
         """
         # Process arguments
         fill = kwargs.get("fill", self._fill)
@@ -195,12 +272,16 @@ class Kivg:
         hand_size = kwargs.get("hand_size", (100, 100))
         pen_offset = kwargs.get("pen_offset", (10, 85))
         
+        # Stroke baking options
+        bake_strokes = kwargs.get("bake_strokes", False)
+        bake_every = kwargs.get("bake_every", 200)
+        
         # Set current values as instance attributes for other methods to access
         self._fill = fill
         self._line_width = line_width
         self._line_color = line_color
         self._animation_duration = duration
-        self.current_svg_file = svg_file
+        self.current_svg_file = DrawingManager.source_name(svg_file)
         self._show_hand = show_hand and animate  # Only show hand when animating
         
         # Initialize pen tracker if needed
@@ -225,12 +306,29 @@ class Kivg:
         # Calculate the paths and get animation list
         anim_list = DrawingManager.calculate_paths(
             self.widget, self.closed_shapes, self.svg_size, 
-            svg_file, animate, line_width, duration
+            self.current_svg_file, animate, line_width, duration
         )
         
         # Handle animation and rendering
+        self._release_stroke_baker()
         if not from_shape_anim:
             if animate:
+                # Only sequential drawing finishes strokes one after another
+                if bake_strokes and anim_type == "seq":
+                    self._stroke_baker = StrokeBaker(
+                        self.widget,
+                        SvgRenderer.list_drawables(self.path),
+                        line_color,
+                        bake_every=bake_every
+                    )
+                    for stroke_anim in anim_list:
+                        stroke_anim.bind(on_complete=self._stroke_baker.on_stroke_complete)
+                
+                if self.metrics:
+                    self.metrics.start_run(len(anim_list))
+                    for stroke_anim in anim_list:
+                        stroke_anim.bind(on_complete=self.metrics.on_segment_complete)
+                
                 # Combine animations according to anim_type
                 draw_anim = AnimationHandler.create_animation_sequence(
                     anim_list, sequential=(anim_type == "seq")
@@ -238,6 +336,8 @@ class Kivg:
                 
                 # Bind update_canvas only to drawing animation progress
                 draw_anim.bind(on_progress=self.update_canvas)
+                if self._stroke_baker:
+                    draw_anim.bind(on_complete=self._release_stroke_baker)
                 
                 # Add fill animation if needed
                 if fill:
@@ -267,19 +367,23 @@ class Kivg:
                     self.widget.canvas.clear()
                     self.fill_up_shapes()
 
-    def shape_animate(self, svg_file: str, anim_config_list: List[Dict] = None, 
-                     on_complete: Callable = None) -> None:
+    def shape_animate(self, svg_file: Union[str, SvgGeometry], anim_config_list: List[Dict] = None, 
+                     on_complete: Callable = None, batched: bool = True) -> None:
         """
         Animate individual shapes in an SVG file.
         
         Args:
-            svg_file: Path to the SVG file
+            svg_file: Path to the SVG file, an SVG document string, or a
+                pre-built SvgGeometry
             anim_config_list: List of animation configurations, each containing:
                 - id_: Shape ID to animate
                 - from_: Direction of animation
                 - d: Duration (optional)
                 - t: Transition (optional)
             on_complete: Function to call when all animations complete
+            batched: Interpolate each shape in one vectorized step per tick
+                (one Animation per shape) instead of one Animation per
+                line/bezier of the shape
         """
         if anim_config_list is None:
             anim_config_list = []
@@ -301,9 +405,13 @@ class Kivg:
             anim_config_list,
             self.closed_shapes,
             self.svg_size,
-            self.current_svg_file
+            self.current_svg_file,
+            batched=batched
         )
         
+        if self.metrics:
+            self.metrics.start_run(len(self.all_anim))
+        
         # Start animations if any are ready
         if self.all_anim:
             id_, animation = self.all_anim[0]
@@ -340,7 +448,7 @@ class Kivg:
         """
         Draw and animate text like handwriting.
         
-        This method converts text to SVG paths and animates the drawing
+        This method converts text to path geometry and animates the drawing
         to create a handwriting effect suitable for whiteboards.
         
         Args:
@@ -376,51 +484,33 @@ class Kivg:
                     "No font file found. Please specify a font_path parameter."
                 )
         
-        # Clean up any previous temporary file
-        self._cleanup_temp_svg()
-        
-        # Create temporary SVG file from text
-        fd, temp_svg_path = tempfile.mkstemp(suffix='.svg')
-        os.close(fd)
-        
-        try:
-            # Convert text to SVG
-            text_to_svg_file(
-                text=text,
-                output_path=temp_svg_path,
-                font_path=font_path,
-                font_size=font_size,
-                fill_color=fill_color
-            )
-            
-            # Store the temp path for cleanup
-            self._temp_text_svg = temp_svg_path
-            
-            # Store the completion callback for animation
-            self._text_on_complete = on_complete
-            
-            # Draw the SVG with animation
-            self.draw(
-                temp_svg_path,
-                animate=animate,
-                anim_type=anim_type,
-                **kwargs
-            )
-            
-            # Handle completion callback
-            if on_complete:
-                if not animate:
-                    # For non-animated draws, call immediately
-                    on_complete()
-                # For animated draws, the callback should be called when animation completes.
-                # Note: The draw() method currently doesn't expose on_complete callback.
-                # Users can use text_animate() for full animation control with callbacks.
-                    
-        except Exception as e:
-            # Clean up temp file on error
-            if os.path.exists(temp_svg_path):
-                os.unlink(temp_svg_path)
-            raise e
+        # Convert text straight to drawing geometry (no temporary SVG file)
+        geometry = text_to_geometry(
+            text=text,
+            font_path=font_path,
+            font_size=font_size,
+            fill_color=fill_color
+        )
+        
+        # Store the completion callback for animation
+        self._text_on_complete = on_complete
+        
+        # Draw the text geometry with animation
+        self.draw(
+            geometry,
+            animate=animate,
+            anim_type=anim_type,
+            **kwargs
+        )
+        
+        # Handle completion callback
+        if on_complete:
+            if not animate:
+                # For non-animated draws, call immediately
+                on_complete()
+            # For animated draws, the callback should be called when animation completes.
+            # Note: The draw() method currently doesn't expose on_complete callback.
+            # Users can use text_animate() for full animation control with callbacks.
 
     def text_animate(
         self,
@@ -473,43 +563,25 @@ class Kivg:
                     "No font file found. Please specify a font_path parameter."
                 )
         
-        # Clean up any previous temporary file
-        self._cleanup_temp_svg()
-        
-        # Create temporary SVG file from text
-        fd, temp_svg_path = tempfile.mkstemp(suffix='.svg')
-        os.close(fd)
-        
-        try:
-            # Convert text to SVG
-            text_to_svg_file(
-                text=text,
-                output_path=temp_svg_path,
-                font_path=font_path,
-                font_size=font_size,
-                fill_color=fill_color
-            )
-            
-            # Store the temp path for cleanup
-            self._temp_text_svg = temp_svg_path
-            
-            # Generate animation config for each character
-            anim_config = get_text_animation_config(
-                text=text,
-                animation_type=animation_type,
-                duration_per_char=duration_per_char,
-                transition=transition
-            )
-            
-            # Use shape_animate to animate the text
-            self.shape_animate(
-                temp_svg_path,
-                anim_config_list=anim_config,
-                on_complete=on_complete
-            )
-            
-        except Exception as e:
-            # Clean up temp file on error
-            if os.path.exists(temp_svg_path):
-                os.unlink(temp_svg_path)
-            raise e
+        # Convert text straight to drawing geometry (no temporary SVG file)
+        geometry = text_to_geometry(
+            text=text,
+            font_path=font_path,
+            font_size=font_size,
+            fill_color=fill_color
+        )
+        
+        # Generate animation config for each character
+        anim_config = get_text_animation_config(
+            text=text,
+            animation_type=animation_type,
+            duration_per_char=duration_per_char,
+            transition=transition
+        )
+        
+        # Use shape_animate to animate the text
+        self.shape_animate(
+            geometry,
+            anim_config_list=anim_config,
+            on_complete=on_complete
+        )
@@ -4,6 +4,7 @@ Contains functions to convert SVG paths to Kivy-compatible coordinates.
 """
 from typing import Tuple, List, Union, Callable
 import math
+import numpy as np
 from svg.path.path import Line, CubicBezier
 
 def transform_x(x_pos: float, widget_x: float, widget_width: float, 
@@ -156,6 +157,30 @@ def get_all_points(start: Tuple[float, float], control1: Tuple[float, float],
 
     return points
 
+def bezier_basis(segments: int = 40) -> np.ndarray:
+    """
+    Bernstein weights for sampling cubic beziers with numpy.
+    
+    Uses the same parameter steps as get_all_points, so
+    bezier_basis() @ [start, control1, control2, end] gives the same points.
+    
+    Args:
+        segments: Number of segments to generate
+        
+    Returns:
+        (n_points, 4) array of weights
+    """
+    ts = []
+    seg = 1 / segments
+    t = 0
+
+    while t <= 1:
+        ts.append(t)
+        t += seg
+
+    ts = np.array(ts)
+    return np.stack([B0_t(ts), B1_t(ts), B2_t(ts), B3_t(ts)], axis=1)
+
 def find_center(sorted_list: List[float]) -> float:
     """
     Find the center value of a sorted list.
@@ -1,17 +1,29 @@
 """
 SVG parsing utilities for Kivg.
-Handles parsing SVG files and extracting path data.
+Handles parsing SVG files (or SVG markup strings) and extracting path data.
 """
 from typing import Tuple, List, Dict, Any
 from xml.dom import minidom
 from kivy.utils import get_color_from_hex
 
+def is_svg_markup(svg_source: str) -> bool:
+    """
+    Check whether a string holds SVG markup rather than a file path.
+    
+    Args:
+        svg_source: SVG file path or SVG document string
+        
+    Returns:
+        True if the string looks like an SVG/XML document
+    """
+    return svg_source.lstrip().startswith("<")
+
 def parse_svg(svg_file: str) -> Tuple[List[float], List[Tuple[str, str, List[float]]]]:
     """
     Parse an SVG file and extract relevant information.
     
     Args:
-        svg_file: Path to the SVG file
+        svg_file: Path to the SVG file, or the SVG document as a string
         
     Returns:
         Tuple containing (svg_dimensions, path_data)
@@ -19,9 +31,13 @@ def parse_svg(svg_file: str) -> Tuple[List[float], List[Tuple[str, str, List[flo
             - path_data: List of tuples (path_string, element_id, color)
     """
     try:
-        doc = minidom.parse(svg_file)
+        if is_svg_markup(svg_file):
+            doc = minidom.parseString(svg_file)
+        else:
+            doc = minidom.parse(svg_file)
     except Exception as e:
-        raise ValueError(f"Failed to parse SVG file '{svg_file}': {e}")
+        source = "<svg string>" if is_svg_markup(svg_file) else svg_file
+        raise ValueError(f"Failed to parse SVG file '{source}': {e}")
 
     # Extract viewBox
     svg_element = doc.getElementsByTagName("svg")[0]
@@ -108,6 +108,38 @@ class SvgRenderer:
         
         return current_pos
     
+    @staticmethod
+    def list_drawables(path_elements: List) -> List[Tuple[str, int]]:
+        """
+        List the drawable path elements in drawing order.
+        
+        Args:
+            path_elements: List of SVG path elements
+            
+        Returns:
+            List of ("line" | "bezier", index) tuples, using the same
+            numbering as the widget animation properties
+        """
+        drawables = []
+        line_count = 0
+        bezier_count = 0
+        for element in path_elements:
+            if isinstance(element, Line):
+                drawables.append(("line", line_count))
+                line_count += 1
+            elif isinstance(element, CubicBezier):
+                drawables.append(("bezier", bezier_count))
+                bezier_count += 1
+        return drawables
+    
+    @staticmethod
+    def draw_element(widget, kind: str, index: int) -> None:
+        """Draw a single line ("line") or bezier ("bezier") element on the current canvas."""
+        if kind == "line":
+            SvgRenderer._draw_line(widget, index)
+        else:
+            SvgRenderer._draw_bezier(widget, index)
+    
     @staticmethod
     def _draw_line(widget, line_index: int) -> None:
         """Draw a line element on the canvas."""
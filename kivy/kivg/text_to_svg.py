@@ -6,10 +6,16 @@ enabling text animation like handwriting on a whiteboard.
 """
 
 import os
-import tempfile
-from typing import List, Tuple, Optional
+import threading
+from collections import OrderedDict
+from typing import List, Tuple, Optional, NamedTuple
+import numpy as np
 from fontTools.ttLib import TTFont
-from fontTools.pens.svgPathPen import SVGPathPen
+from fontTools.pens.basePen import BasePen
+from kivy.utils import get_color_from_hex
+from svg.path.path import Move, Line, CubicBezier, Close
+
+from .data_classes import SvgGeometry
 
 
 # Default system fonts to try in order of preference
@@ -32,6 +38,144 @@ DEFAULT_FONT_PATHS = [
 ]
 
 
+# Number of fonts kept open by the process-wide font cache
+FONT_CACHE_SIZE = 8
+
+# Number of points consumed by each outline command
+_COMMAND_POINTS = {"M": 1, "L": 1, "Q": 2, "C": 3, "Z": 0}
+
+_font_cache: "OrderedDict[str, FontOutlines]" = OrderedDict()
+_font_cache_lock = threading.Lock()
+
+
+class GlyphOutline(NamedTuple):
+    """Pre-parsed glyph outline in font units."""
+    commands: Tuple[str, ...]  # outline commands: M, L, Q, C or Z
+    points: np.ndarray  # (N, 2) float array of all command points, in order
+    advance: float  # glyph advance width
+
+
+class _OutlinePen(BasePen):
+    """Pen that records a glyph outline as numeric commands instead of SVG text."""
+
+    def __init__(self, glyph_set):
+        super().__init__(glyph_set)
+        self.commands = []
+        self.points = []
+
+    def _moveTo(self, pt):
+        self.commands.append("M")
+        self.points.append(pt)
+
+    def _lineTo(self, pt):
+        self.commands.append("L")
+        self.points.append(pt)
+
+    def _curveToOne(self, pt1, pt2, pt3):
+        self.commands.append("C")
+        self.points.extend((pt1, pt2, pt3))
+
+    def _qCurveToOne(self, pt1, pt2):
+        self.commands.append("Q")
+        self.points.extend((pt1, pt2))
+
+    def _closePath(self):
+        self.commands.append("Z")
+
+    def _endPath(self):
+        pass  # open contour, nothing to record
+
+
+class FontOutlines:
+    """
+    A loaded font together with a cache of its pre-parsed glyph outlines.
+    
+    Instances are shared process-wide through get_font(), so the font file,
+    glyph set and cmap are loaded once and each glyph is drawn only once.
+    """
+
+    def __init__(self, font_path: str):
+        self.font_path = font_path
+        self.font = TTFont(font_path)
+        self.glyph_set = self.font.getGlyphSet()
+        self.cmap = self.font.getBestCmap()
+        self.units_per_em = self.font['head'].unitsPerEm
+        self.ascender = self.font['hhea'].ascender
+        self.descender = self.font['hhea'].descender
+        self._glyphs = {}
+        self._lock = threading.Lock()
+
+    def glyph(self, char: str) -> Optional[GlyphOutline]:
+        """
+        Get the outline of a single character.
+        
+        Args:
+            char: Single character
+            
+        Returns:
+            GlyphOutline, or None if the font has no glyph for the character
+        """
+        outline = self._glyphs.get(char)
+        if outline is not None or char in self._glyphs:
+            return outline
+        
+        with self._lock:
+            if char in self._glyphs:
+                return self._glyphs[char]
+            
+            glyph_name = self.cmap.get(ord(char))
+            if glyph_name is None:
+                outline = None
+            else:
+                glyph = self.glyph_set[glyph_name]
+                pen = _OutlinePen(self.glyph_set)
+                glyph.draw(pen)
+                outline = GlyphOutline(
+                    commands=tuple(pen.commands),
+                    points=np.array(pen.points, dtype=float).reshape(-1, 2),
+                    advance=glyph.width
+                )
+            self._glyphs[char] = outline
+        return outline
+
+    def close(self) -> None:
+        """Close the underlying font file."""
+        self.font.close()
+
+
+def get_font(font_path: str) -> FontOutlines:
+    """
+    Get a loaded font from the process-wide LRU font cache.
+    
+    Args:
+        font_path: Path to TTF/OTF font file
+        
+    Returns:
+        FontOutlines for the font
+    """
+    key = os.path.abspath(font_path)
+    with _font_cache_lock:
+        font = _font_cache.get(key)
+        if font is not None:
+            _font_cache.move_to_end(key)
+            return font
+        
+        font = FontOutlines(font_path)
+        _font_cache[key] = font
+        # evicted fonts are only forgotten, not closed: a renderer in another
+        # thread may still be reading glyphs from them. Their file is closed
+        # once the last reference is gone.
+        while len(_font_cache) > FONT_CACHE_SIZE:
+            _font_cache.popitem(last=False)
+        return font
+
+
+def clear_font_cache() -> None:
+    """Forget all cached fonts and glyph outlines (fonts in use stay open)."""
+    with _font_cache_lock:
+        _font_cache.clear()
+
+
 def find_system_font() -> Optional[str]:
     """
     Find an available system font file.
@@ -55,173 +199,116 @@ def find_system_font() -> Optional[str]:
     return None
 
 
-def get_glyph_path(font: TTFont, char: str) -> Tuple[str, float]:
+def layout_text(
+    text: str,
+    font_path: Optional[str] = None,
+    font_size: float = 100.0,
+    line_spacing: float = 1.2,
+    letter_spacing: float = 0.0
+) -> Tuple[List[Tuple[str, Tuple[str, ...], np.ndarray]], Tuple[float, float]]:
     """
-    Get the SVG path data for a single character.
+    Place the glyph outlines of a text in SVG coordinates.
+    
+    Glyphs come from the cached font outlines and are placed with a single
+    vectorized affine transform (scale, Y flip and offset) per character.
     
     Args:
-        font: TTFont object
-        char: Single character to convert
+        text: Text string to lay out
+        font_path: Path to TTF/OTF font file. If None, uses system default.
+        font_size: Target font size in pixels
+        line_spacing: Line spacing multiplier
+        letter_spacing: Additional spacing between letters
         
     Returns:
-        Tuple of (path_string, glyph_width)
+        Tuple of (glyphs, (width, height)) where glyphs is a list of
+        (char_id, commands, points) with points as an (N, 2) array
     """
-    glyph_set = font.getGlyphSet()
-    cmap = font.getBestCmap()
+    if font_path is None:
+        font_path = find_system_font()
+        if font_path is None:
+            raise ValueError("No font file found. Please specify a font_path.")
+    
+    font = get_font(font_path)
+    scale = font_size / font.units_per_em
     
-    char_code = ord(char)
-    if char_code not in cmap:
-        return "", 0
+    # Calculate dimensions
+    ascender = font.ascender * scale
+    descender = font.descender * scale
+    line_height = font_size * line_spacing
     
-    glyph_name = cmap[char_code]
-    glyph = glyph_set[glyph_name]
+    space = font.glyph(' ')
+    if space is not None:
+        space_advance = space.advance * scale + letter_spacing
+    else:
+        space_advance = font_size * 0.25 + letter_spacing
     
-    pen = SVGPathPen(glyph_set)
-    glyph.draw(pen)
+    glyphs = []
+    lines = text.split('\n')
     
-    path_string = pen.getCommands()
-    glyph_width = glyph.width
+    max_width = 0
+    current_y = ascender  # Start from top
     
-    return path_string, glyph_width
+    for line_idx, line in enumerate(lines):
+        current_x = 0
+        non_space_char_idx = 0  # Counter for non-space characters only
+        
+        for char in line:
+            if char == ' ':
+                current_x += space_advance
+                continue
+            
+            outline = font.glyph(char)
+            if outline is None:
+                glyph_width = 0
+            else:
+                glyph_width = outline.advance
+                if outline.commands:
+                    # fonts have Y going up, SVG has Y going down
+                    points = outline.points * (scale, -scale) + (current_x, current_y)
+                    # Use non_space_char_idx to match animation config IDs
+                    char_id = f"char_{line_idx}_{non_space_char_idx}"
+                    glyphs.append((char_id, outline.commands, points))
+            
+            non_space_char_idx += 1
+            current_x += glyph_width * scale + letter_spacing
+        
+        max_width = max(max_width, current_x)
+        current_y += line_height
+    
+    total_height = current_y - line_height + abs(descender)
+    return glyphs, (max_width, total_height)
+
 
+def _format_number(n: float) -> str:
+    """Format a coordinate with 2 decimals, without trailing zeros."""
+    formatted = f"{n:.2f}"
+    # Only strip trailing zeros after decimal point
+    if '.' in formatted:
+        formatted = formatted.rstrip('0').rstrip('.')
+    return formatted
 
-def transform_path(path: str, x_offset: float, y_offset: float, 
-                   scale: float = 1.0, flip_y: bool = True,
-                   units_per_em: int = 2048) -> str:
+
+def outline_to_path(commands: Tuple[str, ...], points: np.ndarray) -> str:
     """
-    Transform SVG path coordinates by offset and scale.
+    Format placed outline commands as SVG path data.
     
     Args:
-        path: SVG path string
-        x_offset: X offset to apply
-        y_offset: Y offset to apply
-        scale: Scale factor to apply to coordinates
-        flip_y: Whether to flip Y coordinates (fonts have Y going up, SVG has Y going down)
-        units_per_em: Font units per em (reserved for future use, default 2048 is common)
+        commands: Outline commands (M, L, Q, C or Z)
+        points: (N, 2) array of the command points
         
     Returns:
-        Transformed path string with coordinates adjusted by offset, scale, and optionally flipped
+        SVG path string
     """
-    if not path:
-        return ""
-    
     result = []
+    coords = points.ravel().tolist()
     i = 0
-    commands = []
-    current_nums = []
-    current_cmd = None
-    
-    # Parse the path
-    while i < len(path):
-        char = path[i]
-        
-        if char.isalpha():
-            if current_cmd is not None and current_nums:
-                commands.append((current_cmd, current_nums))
-            current_cmd = char
-            current_nums = []
-            i += 1
-        elif char in "0123456789.-":
-            # Read number
-            num_start = i
-            if char == '-':
-                i += 1
-            while i < len(path) and (path[i].isdigit() or path[i] == '.'):
-                i += 1
-            num_str = path[num_start:i]
-            if num_str and num_str != '-':
-                current_nums.append(float(num_str))
-        else:
-            i += 1
-    
-    if current_cmd is not None and current_nums:
-        commands.append((current_cmd, current_nums))
-    
-    # Transform coordinates
-    for cmd, nums in commands:
-        new_nums = []
-        
-        if cmd in 'MmLlTt':
-            # Move, Line, Smooth quadratic: x, y pairs
-            for j in range(0, len(nums), 2):
-                if j + 1 < len(nums):
-                    x = nums[j] * scale + x_offset
-                    y = nums[j + 1]
-                    if flip_y:
-                        y = -y * scale + y_offset
-                    else:
-                        y = y * scale + y_offset
-                    new_nums.extend([x, y])
-        elif cmd in 'HhVv':
-            # Horizontal or Vertical line
-            if cmd in 'Hh':
-                for n in nums:
-                    new_nums.append(n * scale + x_offset)
-            else:
-                for n in nums:
-                    if flip_y:
-                        new_nums.append(-n * scale + y_offset)
-                    else:
-                        new_nums.append(n * scale + y_offset)
-        elif cmd in 'CcSs':
-            # Cubic bezier or Smooth cubic: 6 values (3 x,y pairs) for C, 4 for S
-            for j in range(0, len(nums), 2):
-                if j + 1 < len(nums):
-                    x = nums[j] * scale + x_offset
-                    y = nums[j + 1]
-                    if flip_y:
-                        y = -y * scale + y_offset
-                    else:
-                        y = y * scale + y_offset
-                    new_nums.extend([x, y])
-        elif cmd in 'QqTt':
-            # Quadratic bezier: x,y pairs
-            for j in range(0, len(nums), 2):
-                if j + 1 < len(nums):
-                    x = nums[j] * scale + x_offset
-                    y = nums[j + 1]
-                    if flip_y:
-                        y = -y * scale + y_offset
-                    else:
-                        y = y * scale + y_offset
-                    new_nums.extend([x, y])
-        elif cmd in 'Aa':
-            # Arc: rx, ry, rotation, large-arc, sweep, x, y
-            for j in range(0, len(nums), 7):
-                if j + 6 < len(nums):
-                    rx = nums[j] * scale
-                    ry = nums[j + 1] * scale
-                    rotation = nums[j + 2]
-                    large_arc = nums[j + 3]
-                    sweep = nums[j + 4]
-                    if flip_y:
-                        # Flip sweep direction: 0 becomes 1, 1 becomes 0
-                        sweep = 1 if sweep == 0 else 0
-                    x = nums[j + 5] * scale + x_offset
-                    y = nums[j + 6]
-                    if flip_y:
-                        y = -y * scale + y_offset
-                    else:
-                        y = y * scale + y_offset
-                    new_nums.extend([rx, ry, rotation, large_arc, sweep, x, y])
-        elif cmd in 'Zz':
-            pass  # Close path, no coordinates
-        
-        # Format the command with numbers
-        if new_nums:
-            # Format numbers with 2 decimal places, but avoid stripping trailing zeros
-            # from the integer part (e.g., 100.0 should remain 100, not become 1)
-            num_strs = []
-            for n in new_nums:
-                formatted = f"{n:.2f}"
-                # Only strip trailing zeros after decimal point
-                if '.' in formatted:
-                    formatted = formatted.rstrip('0').rstrip('.')
-                num_strs.append(formatted)
-            result.append(cmd + " ".join(num_strs))
+    for cmd in commands:
+        count = _COMMAND_POINTS[cmd] * 2
+        if count:
+            result.append(cmd + " ".join(_format_number(n) for n in coords[i:i + count]))
+            i += count
         else:
             result.append(cmd)
-    
     return "".join(result)
 
 
@@ -247,66 +334,14 @@ def text_to_svg_paths(
     Returns:
         Tuple of (svg_content, (width, height))
     """
-    if font_path is None:
-        font_path = find_system_font()
-        if font_path is None:
-            raise ValueError("No font file found. Please specify a font_path.")
-    
-    font = TTFont(font_path)
-    units_per_em = font['head'].unitsPerEm
-    scale = font_size / units_per_em
-    
-    # Calculate dimensions
-    ascender = font['hhea'].ascender * scale
-    descender = font['hhea'].descender * scale
-    line_height = font_size * line_spacing
-    
-    paths = []
-    lines = text.split('\n')
-    
-    max_width = 0
-    current_y = ascender  # Start from top
-    
-    for line_idx, line in enumerate(lines):
-        current_x = 0
-        non_space_char_idx = 0  # Counter for non-space characters only
-        
-        for char in line:
-            if char == ' ':
-                # Get space width
-                glyph_set = font.getGlyphSet()
-                cmap = font.getBestCmap()
-                if ord(' ') in cmap:
-                    space_name = cmap[ord(' ')]
-                    current_x += glyph_set[space_name].width * scale + letter_spacing
-                else:
-                    current_x += font_size * 0.25 + letter_spacing
-                continue
-            
-            path_str, glyph_width = get_glyph_path(font, char)
-            
-            if path_str:
-                # Transform the path
-                transformed = transform_path(
-                    path_str,
-                    x_offset=current_x,
-                    y_offset=current_y,
-                    scale=scale,
-                    flip_y=True,
-                    units_per_em=units_per_em
-                )
-                
-                # Use non_space_char_idx to match animation config IDs
-                char_id = f"char_{line_idx}_{non_space_char_idx}"
-                paths.append(f'<path fill="{fill_color}" id="{char_id}" d="{transformed}"/>')
-            
-            non_space_char_idx += 1
-            current_x += glyph_width * scale + letter_spacing
-        
-        max_width = max(max_width, current_x)
-        current_y += line_height
+    glyphs, (max_width, total_height) = layout_text(
+        text, font_path, font_size, line_spacing, letter_spacing
+    )
     
-    total_height = current_y - line_height + abs(descender)
+    paths = [
+        f'<path fill="{fill_color}" id="{char_id}" d="{outline_to_path(commands, points)}"/>'
+        for char_id, commands, points in glyphs
+    ]
     
     # Create SVG content
     svg_content = f'''<?xml version="1.0" encoding="UTF-8"?>
@@ -316,25 +351,68 @@ def text_to_svg_paths(
 </g>
 </svg>'''
     
-    font.close()
     return svg_content, (max_width, total_height)
 
 
-def text_to_svg_file(
+def outline_to_segments(commands: Tuple[str, ...], points: np.ndarray) -> list:
+    """
+    Convert placed outline commands straight into Kivg path segments.
+    
+    Quadratic curves are elevated to cubic Beziers, the curve type Kivg
+    draws and fills.
+    
+    Args:
+        commands: Outline commands (M, L, Q, C or Z)
+        points: (N, 2) array of the command points
+        
+    Returns:
+        List of svg.path segments (Move, Line, CubicBezier, Close)
+    """
+    pts = (points[:, 0] + 1j * points[:, 1]).tolist()
+    segments = []
+    start = current = 0j
+    i = 0
+    for cmd in commands:
+        if cmd == "M":
+            start = current = pts[i]
+            segments.append(Move(to=current))
+        elif cmd == "L":
+            segments.append(Line(start=current, end=pts[i]))
+            current = pts[i]
+        elif cmd == "Q":
+            control, end = pts[i], pts[i + 1]
+            segments.append(CubicBezier(
+                start=current,
+                control1=current + (control - current) * 2 / 3,
+                control2=end + (control - end) * 2 / 3,
+                end=end
+            ))
+            current = end
+        elif cmd == "C":
+            segments.append(CubicBezier(
+                start=current, control1=pts[i], control2=pts[i + 1], end=pts[i + 2]
+            ))
+            current = pts[i + 2]
+        elif cmd == "Z":
+            segments.append(Close(start=current, end=start))
+            current = start
+        i += _COMMAND_POINTS[cmd]
+    return segments
+
+
+def text_to_geometry(
     text: str,
-    output_path: str,
     font_path: Optional[str] = None,
     font_size: float = 100.0,
     fill_color: str = "#000000",
     line_spacing: float = 1.2,
     letter_spacing: float = 0.0
-) -> Tuple[float, float]:
+) -> SvgGeometry:
     """
-    Convert text to an SVG file.
+    Convert text to Kivg geometry, without generating or parsing SVG text.
     
     Args:
         text: Text string to convert
-        output_path: Path to save the SVG file
         font_path: Path to TTF/OTF font file. If None, uses system default.
         font_size: Target font size in pixels
         fill_color: Fill color for the text (hex format)
@@ -342,42 +420,59 @@ def text_to_svg_file(
         letter_spacing: Additional spacing between letters
         
     Returns:
-        Tuple of (width, height) of the generated SVG
+        SvgGeometry with one shape per character (ids match
+        get_text_animation_config)
     """
-    svg_content, dimensions = text_to_svg_paths(
-        text, font_path, font_size, fill_color, line_spacing, letter_spacing
+    glyphs, (max_width, total_height) = layout_text(
+        text, font_path, font_size, line_spacing, letter_spacing
     )
     
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(svg_content)
-    
-    return dimensions
+    try:
+        color = get_color_from_hex(fill_color)
+    except ValueError:
+        color = [1, 1, 1, 0]  # Same default as the SVG parser
+    
+    shapes = [
+        (char_id, color, outline_to_segments(commands, points))
+        for char_id, commands, points in glyphs
+    ]
+    # same rounding as the viewBox written by text_to_svg_paths
+    svg_size = [round(max_width, 2), round(total_height, 2)]
+    return SvgGeometry(svg_size=svg_size, shapes=shapes, name="text")
 
 
-def create_text_svg_temp(
+def text_to_svg_file(
     text: str,
+    output_path: str,
     font_path: Optional[str] = None,
     font_size: float = 100.0,
-    fill_color: str = "#000000"
-) -> str:
+    fill_color: str = "#000000",
+    line_spacing: float = 1.2,
+    letter_spacing: float = 0.0
+) -> Tuple[float, float]:
     """
-    Create a temporary SVG file from text.
+    Convert text to an SVG file.
     
     Args:
         text: Text string to convert
-        font_path: Path to TTF/OTF font file
+        output_path: Path to save the SVG file
+        font_path: Path to TTF/OTF font file. If None, uses system default.
         font_size: Target font size in pixels
         fill_color: Fill color for the text (hex format)
+        line_spacing: Line spacing multiplier
+        letter_spacing: Additional spacing between letters
         
     Returns:
-        Path to the temporary SVG file
+        Tuple of (width, height) of the generated SVG
     """
-    fd, temp_path = tempfile.mkstemp(suffix='.svg')
-    os.close(fd)
+    svg_content, dimensions = text_to_svg_paths(
+        text, font_path, font_size, fill_color, line_spacing, letter_spacing
+    )
     
-    text_to_svg_file(text, temp_path, font_path, font_size, fill_color)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(svg_content)
     
-    return temp_path
+    return dimensions
 
 
 def get_text_animation_config(
@@ -2,6 +2,7 @@
 import os
 os.environ['KIVY_GL_BACKEND'] = 'sdl2'
 import sys
+from functools import partial
 from threading import Thread
 
 # kivy world
@@ -13,6 +14,7 @@ from kivymd.uix.menu import MDDropdownMenu
 from kivymd.uix.spinner import MDSpinner
 from kivymd.uix.filemanager import MDFileManager
 from kivymd.uix.dialog import MDDialog
+from kivymd.uix.list import TwoLineListItem
 
 from kivy.uix.videoplayer import VideoPlayer
 from kivy.lang import Builder
@@ -28,7 +30,10 @@ Window.softinput_mode = "below_target"
 
 # Import your local screen classes & modules
 from screens.divider import MyMDDivider
-from sketchApi import get_split_lens, initiate_sketch, generate_svg_from_image_sketch
+from sketchApi import get_split_lens, get_split_len_advice, initiate_sketch, generate_svg_from_image_sketch
+from renderJobs import RenderQueue, default_workers
+from renderCheckpoint import DEFAULT_CHECKPOINT_SECONDS, pending_renders, discard_render
+from renditions import h264_available
 from kivg import Kivg
 
 ## Global definitions
@@ -61,9 +66,17 @@ class DlImg2SktchApp(MDApp):
     animation_mode = StringProperty("Video")  # "Video" or "SVG Live"
     kivg_instance = ObjectProperty(None)  # Kivg instance for SVG animation
     is_svg_file = ObjectProperty(False)  # Track if uploaded file is SVG
+    save_live_svg = ObjectProperty(False)  # Also write generated SVG to video_dir in SVG Live mode
+    render_job = ObjectProperty(None, allownone=True)  # RenderJob shown in the player box
+    render_workers = NumericProperty(default_workers())  # concurrent video renders
+    # video seconds per resumable render segment, None renders without checkpoints
+    checkpoint_seconds = NumericProperty(DEFAULT_CHECKPOINT_SECONDS, allownone=True)
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
+        if not h264_available():
+            # checkpointed segments are encoded with PyAV, see initiate_sketch
+            self.checkpoint_seconds = None
         Window.bind(on_keyboard=self.events)
 
     def build(self):
@@ -80,12 +93,20 @@ class DlImg2SktchApp(MDApp):
                 "action": "web",
                 "url": "https://daslearning.in/contact/",
             },
+            "Render queue": {
+                "icon": "format-list-checks",
+                "action": "jobs",
+                "url": "",
+            },
             "Check for update": {
                 "icon": "github",
                 "action": "update",
                 "url": "",
             }
         }
+        # video renders run through a queue, render_workers at a time
+        self.render_queue = RenderQueue(self.render_workers, on_change=self._render_job_changed)
+        self.bind(render_workers=lambda instance, value: self.render_queue.set_max_workers(value))
         return Builder.load_file(kv_file_path)
 
     def on_start(self):
@@ -169,6 +190,8 @@ class DlImg2SktchApp(MDApp):
             items=menu_items,
             width_mult=4,
         )
+        # renders stopped by the app being killed can pick up where they were
+        self.offer_render_resume()
 
     def menu_bar_callback(self, button):
         self.menu.caller = button
@@ -185,6 +208,8 @@ class DlImg2SktchApp(MDApp):
             print(f"Erro in menu process: {e}")
         if action == "web" and url != "":
             self.open_link(url)
+        elif action == "jobs":
+            self.show_render_queue()
         elif action == "update":
             buttons = [
                 MDFlatButton(
@@ -206,6 +231,52 @@ class DlImg2SktchApp(MDApp):
                 buttons
             )
 
+    def offer_render_resume(self):
+        """Ask whether to resume the video renders that were interrupted last time."""
+        self.interrupted_renders = pending_renders(self.video_dir)
+        if not self.interrupted_renders:
+            return
+        lines = [
+            f"{os.path.basename(item['render']['image_path'])}: "
+            f"{item['frames_done']}/{item['total_frames']} frames"
+            for item in self.interrupted_renders
+        ]
+        buttons = [
+            MDFlatButton(
+                text="Discard",
+                theme_text_color="Custom",
+                text_color=self.theme_cls.primary_color,
+                on_release=self.discard_interrupted_renders
+            ),
+            MDFlatButton(
+                text="Resume",
+                theme_text_color="Custom",
+                text_color="green",
+                on_release=self.resume_interrupted_renders
+            ),
+        ]
+        self.show_text_dialog("Resume unfinished videos?", "\n".join(lines), buttons)
+
+    def resume_interrupted_renders(self, *args):
+        self.txt_dialog.dismiss()
+        for item in self.interrupted_renders:
+            render_args = dict(item["render"], save_path=self.video_dir)
+            if not os.path.isfile(render_args["image_path"]):
+                discard_render(self.video_dir, item["key"])
+                continue
+            # finished jobs are announced with a toast, see _render_job_changed
+            self.render_queue.submit(
+                initiate_sketch, render_args, label=os.path.basename(render_args["image_path"])
+            )
+        self.interrupted_renders = []
+        self.show_toast_msg("Resuming unfinished videos, see Render queue")
+
+    def discard_interrupted_renders(self, *args):
+        self.txt_dialog.dismiss()
+        for item in self.interrupted_renders:
+            discard_render(self.video_dir, item["key"])
+        self.interrupted_renders = []
+
     def show_toast_msg(self, message, is_error=False):
         from kivymd.uix.snackbar import MDSnackbar
         bg_color = (0.2, 0.6, 0.2, 1) if not is_error else (0.8, 0.2, 0.2, 1)
@@ -228,6 +299,44 @@ class DlImg2SktchApp(MDApp):
         )
         self.txt_dialog.open()
 
+    def _build_split_len_menu(self, split_lens, advice=None):
+        """Split length dropdown, each option labelled with its predicted video duration when known"""
+        durations = {item["split_len"]: item["duration"] for item in (advice or [])}
+        menu_items = [
+            {
+                "text": f"{option}  (~{durations[option]}s)" if option in durations else f"{option}",
+                "on_release": lambda x=f"{option}": self.set_split_len(x),
+                "font_size": sp(24)
+            } for option in split_lens
+        ]
+        self.split_len_options = MDDropdownMenu(
+            md_bg_color="#bdc6b0",
+            caller=self.split_len_drp,
+            items=menu_items,
+        )
+
+    def _current_render_rates(self):
+        """(frame_rate, obj_skip_rate, main_img_duration) from the input fields"""
+        frame_rate = self.root.ids.frame_rate.text if self.root.ids.frame_rate.text != "" else self.frame_rate
+        obj_skip_rate = self.root.ids.obj_skip_rate.text if self.root.ids.obj_skip_rate.text != "" else self.obj_skip_rate
+        main_img_duration = self.root.ids.main_img_duration.text if self.root.ids.main_img_duration.text != "" else self.main_img_duration
+        try:
+            return int(frame_rate), int(obj_skip_rate), int(main_img_duration)
+        except ValueError:
+            return int(self.frame_rate), int(self.obj_skip_rate), int(self.main_img_duration)
+
+    def _load_split_len_advice(self, path, frame_rate, obj_skip_rate, main_img_duration):
+        """Runs in a thread: estimate the video duration of each split length"""
+        from kivy.clock import Clock
+        api_resp = get_split_len_advice(path, frame_rate, obj_skip_rate, main_img_duration)
+        if api_resp["advice"]:
+            Clock.schedule_once(lambda dt: self._apply_split_len_advice(path, api_resp), 0)
+
+    def _apply_split_len_advice(self, path, api_resp):
+        if path != self.image_path or self.is_svg_file:
+            return  # another file was selected meanwhile
+        self._build_split_len_menu(api_resp["split_lens"], api_resp["advice"])
+
     def set_split_len(self, value):
         self.split_len = int(value)
         self.split_len_drp.text = str(self.split_len)
@@ -316,18 +425,10 @@ class DlImg2SktchApp(MDApp):
             image_details = api_resp["image_res"]
             img_box = self.root.ids.img_selector_lbl
             img_box.text = f"{image_details}"
-            menu_items = [
-                {
-                    "text": f"{option}",
-                    "on_release": lambda x=f"{option}": self.set_split_len(x),
-                    "font_size": sp(24)
-                } for option in split_lens
-            ]
-            self.split_len_options = MDDropdownMenu(
-                md_bg_color="#bdc6b0",
-                caller=self.split_len_drp,
-                items=menu_items,
-            )
+            self._build_split_len_menu(split_lens)
+            # predicted durations per split length are filled in when ready
+            advice_thread = Thread(target=self._load_split_len_advice, args=(path, *self._current_render_rates()), daemon=True)
+            advice_thread.start()
             if len(split_lens) >= 1:
                 if 10 in split_lens:
                     self.split_len = 10
@@ -387,10 +488,6 @@ class DlImg2SktchApp(MDApp):
         if self.image_path == "":
             self.show_toast_msg("No image is selected", is_error=True)
             return
-        if self.is_cv2_running:
-            self.show_toast_msg("Please wait for the previous request to finish", is_error=True)
-            return
-        
         # Check if SVG file is being used with Video mode
         if self.is_svg_file and self.animation_mode == "Video":
             self.show_toast_msg("SVG files can only be used in SVG Live mode. Switching mode...", is_error=True)
@@ -406,22 +503,41 @@ class DlImg2SktchApp(MDApp):
                 print(f"Error switching mode: {e}")
             return
         
-        # Check animation mode
+        # Check animation mode, video renders are queued, SVG Live runs one at a time
         if self.animation_mode == "SVG Live":
+            if self.is_cv2_running:
+                self.show_toast_msg("Please wait for the previous request to finish", is_error=True)
+                return
             self.submit_svg_animation()
         else:
             self.submit_video_animation()
 
     def submit_video_animation(self):
-        """Original video-based animation"""
+        """Queue a video render of the selected image, shown in the player box"""
         split_len = self.split_len
         frame_rate = self.root.ids.frame_rate.text if self.root.ids.frame_rate.text != "" else self.frame_rate
         obj_skip_rate = self.root.ids.obj_skip_rate.text if self.root.ids.obj_skip_rate.text != "" else self.obj_skip_rate
         bck_skip_rate = self.root.ids.bck_skip_rate.text if self.root.ids.bck_skip_rate.text != "" else self.bck_skip_rate
         main_img_duration = self.root.ids.main_img_duration.text if self.root.ids.main_img_duration.text != "" else self.main_img_duration
-        sketch_thread = Thread(target=initiate_sketch, args=(self.image_path, split_len, int(frame_rate), int(obj_skip_rate), int(bck_skip_rate), int(main_img_duration), self.task_complete_callback, self.video_dir, platform), daemon=True)
-        sketch_thread.start()
-        self.is_cv2_running = True
+        self.queue_render(
+            dict(
+                image_path=self.image_path, split_len=split_len, frame_rate=int(frame_rate),
+                object_skip_rate=int(obj_skip_rate), bg_object_skip_rate=int(bck_skip_rate),
+                main_img_duration=int(main_img_duration), save_path=self.video_dir, which_platform=platform,
+                checkpoint_seconds=self.checkpoint_seconds,
+            ),
+            label=os.path.basename(self.image_path),
+        )
+
+    def queue_render(self, render_kwargs, label):
+        """Queue an initiate_sketch render and follow its progress in the player box"""
+        n_jobs = len(self.render_queue.jobs)
+        job = self.render_queue.submit(initiate_sketch, render_kwargs, label=label)
+        if len(self.render_queue.jobs) == n_jobs:
+            # the same render is already queued or running, follow that one
+            self.show_toast_msg("This video is already being rendered")
+        job.on_progress = partial(self.render_progress_callback, job)
+        self.render_job = job
         player_box = self.root.ids.player_box
         player_box.clear_widgets()
         player_box.add_widget(MDSpinner(
@@ -430,6 +546,95 @@ class DlImg2SktchApp(MDApp):
             active = True,
             pos_hint={'center_x': .5, 'center_y': .5}
         ))
+        if job.state == "queued":
+            text = f"Queued, {len(self.render_queue.queued) - 1} ahead"
+        else:
+            text = "Preparing..."
+        self.render_progress_lbl = MDLabel(
+            text=text,
+            halign="center",
+            size_hint_y=None,
+            height=dp(32),
+        )
+        player_box.add_widget(self.render_progress_lbl)
+        cancel_btn = MDFlatButton(text="Cancel", pos_hint={'center_x': .5})
+        cancel_btn.bind(on_release=partial(self.cancel_render, job))
+        player_box.add_widget(cancel_btn)
+
+    def render_progress_callback(self, job, event):
+        """Show the progress events of the render in the player box (called on the main thread)."""
+        if job is not self.render_job or job.cancelled:
+            return
+        self.render_progress_lbl.text = self._progress_text(event)
+
+    def _progress_text(self, event):
+        stage = "Drawing" if event["stage"] == "drawing" else "Converting"
+        text = f"{stage}: {event['frames']}/{event['total']} frames ({event['percent']:.0f}%)"
+        if event["eta"] is not None:
+            text += f", about {int(event['eta'])}s left"
+        return text
+
+    def cancel_render(self, job, *args):
+        """Abort a video render, a running one stops before its next frame."""
+        self.render_queue.cancel(job)
+        if job is self.render_job and job.state == "running":
+            self.render_progress_lbl.text = "Cancelling..."
+
+    def _render_job_changed(self, job):
+        """RenderQueue callback: a job was queued, started or finished."""
+        if job.state == "running" and job is self.render_job:
+            self.render_progress_lbl.text = "Preparing..."
+        if job.state not in ("done", "failed", "cancelled"):
+            return
+        if job is self.render_job:
+            self.task_complete_callback(job.result)
+        elif job.state == "done":
+            self.show_toast_msg(f"Video ready: {job.label} (see Render queue)")
+        elif job.state == "failed":
+            self.show_toast_msg(f"{job.label}: {job.result['message']}", is_error=True)
+
+    def show_render_queue(self):
+        """List the render jobs: tap a finished one to play it, an unfinished one to cancel it."""
+        items = []
+        for job in reversed(self.render_queue.jobs):
+            if job.state == "running" and job.last_progress is not None:
+                detail = f"{self._progress_text(job.last_progress)} - tap to cancel"
+            elif job.state in ("running", "queued"):
+                detail = f"{job.state} - tap to cancel"
+            elif job.state == "done":
+                detail = f"done - tap to play {os.path.basename(job.result['message'])}"
+            else:
+                detail = job.state
+            items.append(TwoLineListItem(
+                text=f"#{job.job_id} {job.label}",
+                secondary_text=detail,
+                on_release=partial(self._render_queue_item_selected, job),
+            ))
+        if not items:
+            self.show_toast_msg("No video renders yet")
+            return
+        self.jobs_dialog = MDDialog(
+            title=f"Render queue ({self.render_queue.max_workers} at a time)",
+            type="simple",
+            items=items,
+        )
+        self.jobs_dialog.open()
+
+    def _render_queue_item_selected(self, job, *args):
+        self.jobs_dialog.dismiss()
+        if job.state == "done" and not os.path.isfile(job.result["message"]):
+            # the video was deleted or moved since, render it again
+            if not os.path.isfile(job.render_kwargs["image_path"]):
+                self.show_toast_msg(f"{os.path.basename(job.result['message'])} and its image are gone", is_error=True)
+                return
+            self.show_toast_msg(f"{os.path.basename(job.result['message'])} is gone, rendering it again")
+            self.queue_render(job.render_kwargs, job.label)
+        elif job.state == "done":
+            self.render_job = job
+            self.task_complete_callback(job.result)
+        elif job.state in ("running", "queued"):
+            self.cancel_render(job)
+            self.show_toast_msg(f"Cancelling {job.label}")
 
     def submit_svg_animation(self):
         """SVG-based live animation using kivg"""
@@ -474,28 +679,32 @@ class DlImg2SktchApp(MDApp):
             self.show_toast_msg(f"Error: {e}", is_error=True)
 
     def _generate_and_animate_svg(self, image_path, split_len, player_box):
-        """Generate SVG and schedule animation on main thread"""
+        """Generate sketch geometry and schedule animation on main thread"""
         import datetime
         from kivy.clock import Clock
         
         try:
-            # Generate SVG file path
-            now = datetime.datetime.now()
-            current_time = str(now.strftime("%H%M%S"))
-            current_date = str(now.strftime("%Y%m%d"))
-            svg_filename = f"sketch_{current_date}_{current_time}.svg"
-            svg_path = os.path.join(self.video_dir, svg_filename)
+            # Saving the SVG is an optional side output, the animation is fed in memory
+            svg_path = None
+            if self.save_live_svg:
+                now = datetime.datetime.now()
+                current_time = str(now.strftime("%H%M%S"))
+                current_date = str(now.strftime("%Y%m%d"))
+                svg_filename = f"sketch_{current_date}_{current_time}.svg"
+                svg_path = os.path.join(self.video_dir, svg_filename)
             
-            # Generate SVG using sketchApi (which uses the same algorithm as video generation)
+            # Generate geometry using sketchApi (which uses the same algorithm as video generation)
             result = generate_svg_from_image_sketch(
                 image_path=image_path,
                 split_len=split_len,
-                output_path=svg_path
+                output_path=svg_path,
+                as_geometry=True
             )
             
             if result["status"]:
                 # Schedule animation on main thread
-                Clock.schedule_once(lambda dt: self._start_svg_animation(svg_path, player_box), 0)
+                geometry = result["geometry"]
+                Clock.schedule_once(lambda dt: self._start_svg_animation(geometry, player_box), 0)
             else:
                 # Show error
                 Clock.schedule_once(lambda dt: self.show_toast_msg(result["message"], is_error=True), 0)
@@ -508,41 +717,45 @@ class DlImg2SktchApp(MDApp):
             Clock.schedule_once(lambda dt: self.show_toast_msg(f"Error: {e}", is_error=True), 0)
             Clock.schedule_once(lambda dt: setattr(self, 'is_cv2_running', False), 0)
 
-    def _start_svg_animation(self, svg_path, player_box):
-        """Start SVG animation on the main thread with validation"""
-        from kivy.uix.widget import Widget
+    def _validate_svg_file(self, svg_path):
+        """Validate an SVG file before animation, shows a toast on failure"""
         import os
         
+        if not os.path.exists(svg_path):
+            self.show_toast_msg("SVG file not found", is_error=True)
+            return False
+        
+        if not os.path.isfile(svg_path):
+            self.show_toast_msg("Invalid SVG path", is_error=True)
+            return False
+        
+        # Validate file size (max 10MB for SVG to prevent resource exhaustion)
+        max_svg_size = 10 * 1024 * 1024  # 10MB
+        svg_size = os.path.getsize(svg_path)
+        if svg_size > max_svg_size:
+            self.show_toast_msg("SVG file too large for animation (max 10MB)", is_error=True)
+            return False
+        
+        # Basic SVG content validation
         try:
-            # Validate SVG file before animation
-            if not os.path.exists(svg_path):
-                self.show_toast_msg("SVG file not found", is_error=True)
-                self.is_cv2_running = False
-                return
-            
-            if not os.path.isfile(svg_path):
-                self.show_toast_msg("Invalid SVG path", is_error=True)
-                self.is_cv2_running = False
-                return
-            
-            # Validate file size (max 10MB for SVG to prevent resource exhaustion)
-            max_svg_size = 10 * 1024 * 1024  # 10MB
-            svg_size = os.path.getsize(svg_path)
-            if svg_size > max_svg_size:
-                self.show_toast_msg("SVG file too large for animation (max 10MB)", is_error=True)
-                self.is_cv2_running = False
-                return
-            
-            # Basic SVG content validation
-            try:
-                with open(svg_path, 'r', encoding='utf-8') as f:
-                    content = f.read(1024)  # Read first 1KB
-                    if not content.strip().startswith('<?xml') and '<svg' not in content:
-                        self.show_toast_msg("Invalid SVG file format", is_error=True)
-                        self.is_cv2_running = False
-                        return
-            except Exception as e:
-                self.show_toast_msg(f"Error reading SVG: {e}", is_error=True)
+            with open(svg_path, 'r', encoding='utf-8') as f:
+                content = f.read(1024)  # Read first 1KB
+                if not content.strip().startswith('<?xml') and '<svg' not in content:
+                    self.show_toast_msg("Invalid SVG file format", is_error=True)
+                    return False
+        except Exception as e:
+            self.show_toast_msg(f"Error reading SVG: {e}", is_error=True)
+            return False
+        return True
+
+    def _start_svg_animation(self, svg_source, player_box):
+        """Start SVG animation on the main thread with validation.
+        svg_source is an SVG file path or in-memory kivg geometry (no disk I/O)"""
+        from kivy.uix.widget import Widget
+        
+        try:
+            # Only files need validation, generated geometry is used as is
+            if isinstance(svg_source, str) and not self._validate_svg_file(svg_source):
                 self.is_cv2_running = False
                 return
             
@@ -556,14 +769,15 @@ class DlImg2SktchApp(MDApp):
             # Create Kivg instance and draw with animation
             self.kivg_instance = Kivg(svg_widget)
             self.kivg_instance.draw(
-                svg_path,
+                svg_source,
                 animate=True,
                 anim_type="seq",
                 fill=True,
                 line_width=2,
                 line_color=[0, 0, 0, 1],
                 dur=0.01,
-                show_hand=True
+                show_hand=True,
+                bake_strokes=True
             )
             
             self.is_cv2_running = False
@@ -581,7 +795,10 @@ class DlImg2SktchApp(MDApp):
         player_box = self.root.ids.player_box
         message = result["message"]
         self.is_cv2_running = False
-        if status is True:
+        if result.get("cancelled"):
+            player_box.clear_widgets()
+            self.show_toast_msg("Render cancelled")
+        elif status is True:
             self.vid_download_path = message
             self.show_toast_msg(f"Video generated at: {message}")
             player_box.clear_widgets()
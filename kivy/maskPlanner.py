@@ -0,0 +1,141 @@
+"""
+Per-object planning for mask-driven renders.
+Object polygons (LabelMe style mask JSON) are rasterised straight at the
+target resolution inside their bounding box, and the cell plans of all
+objects and of the remaining background are computed concurrently in a
+process pool. Rendering then replays them in the original order.
+"""
+import json
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+from sketchPlan import plan_cells, DEFAULT_CELLS
+from renderJobs import default_workers
+
+
+def load_mask_shapes(mask_path):
+    """Polygon points (N, 2) of every shape in a LabelMe style mask JSON, in file order."""
+    with open(mask_path) as file:
+        object_masks = json.load(file)
+    return [np.array(shape["points"], dtype=np.float64) for shape in object_masks["shapes"]]
+
+
+def align_bbox(bbox, split_len, width, height):
+    """Widen a (y0, x0, y1, x1) box to the split_len grid, clipped to the image."""
+    y0, x0, y1, x1 = (int(v) for v in bbox)
+    y0, x0 = (y0 // split_len) * split_len, (x0 // split_len) * split_len
+    y1 = min(-(-y1 // split_len) * split_len, height)
+    x1 = min(-(-x1 // split_len) * split_len, width)
+    return y0, x0, y1, x1
+
+
+def mask_bbox(mask, split_len):
+    """
+    Bounding box of the non-zero area of a full-frame mask, on the split_len grid.
+
+    Returns:
+        (y0, x0, y1, x1), or None when the mask is empty
+    """
+    x, y, w, h = cv2.boundingRect(mask)
+    if w == 0 or h == 0:
+        return None
+    return align_bbox((y, x, y + h, x + w), split_len, mask.shape[1], mask.shape[0])
+
+
+def rasterize_shape(points, scale_x, scale_y, split_len, width, height):
+    """
+    Rasterise a polygon at the target resolution inside its bounding box.
+
+    The box is widened to the split_len grid so the object's cells line up
+    with the cells of a whole-image plan.
+
+    Args:
+        points: Polygon points (N, 2) in source image pixels
+        scale_x: Target width / source width
+        scale_y: Target height / source height
+        split_len: Grid size
+        width: Target width
+        height: Target height
+
+    Returns:
+        Tuple of (bbox as (y0, x0, y1, x1), uint8 mask of the bbox, 255 inside),
+        both None when the polygon is outside the image
+    """
+    scaled = np.round(points * (scale_x, scale_y)).astype(np.int32)
+    x0, y0 = np.maximum(scaled.min(axis=0), 0)
+    x1, y1 = np.minimum(scaled.max(axis=0) + 1, (width, height))
+    if x0 >= x1 or y0 >= y1:
+        return None, None
+    y0, x0, y1, x1 = align_bbox((y0, x0, y1, x1), split_len, width, height)
+
+    mask_roi = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+    cv2.fillPoly(mask_roi, [scaled - (x0, y0)], 255)
+    return (y0, x0, y1, x1), mask_roi
+
+
+def plan_object(img_thresh_roi, mask_roi, bbox, split_len, cell_settings=DEFAULT_CELLS):
+    """
+    Cell plan of one object, computed on its bounding box only.
+
+    Returns:
+        (y0, x0, y1, x1) rects in image coordinates, in drawing order
+    """
+    rects = plan_cells(img_thresh_roi, split_len, cell_settings, object_mask=mask_roi)
+    return rects + (bbox[0], bbox[1], bbox[0], bbox[1])
+
+
+def plan_masked_objects(img_thresh, shapes, source_size, split_len, bg_split_len,
+                        cell_settings=DEFAULT_CELLS, max_workers=None):
+    """
+    Plan every object and the background at once.
+
+    Args:
+        img_thresh: Thresholded image at the target resolution
+        shapes: Polygons from load_mask_shapes, in source image pixels
+        source_size: (width, height) of the source image
+        split_len: Grid size of the objects
+        bg_split_len: Grid size of the background
+        cell_settings: CellSettings object
+        max_workers: Planning processes, default_workers() when None,
+            1 plans in this process
+
+    Returns:
+        Tuple of (objects, background_mask, background_rects); objects is a
+        list of (bbox, mask_roi, rects) in shape order, skipping shapes
+        outside the image
+    """
+    height, width = img_thresh.shape[:2]
+    scale_x, scale_y = width / source_size[0], height / source_size[1]
+
+    # masks are cheap, rasterise them here; the background needs all of them
+    background_mask = np.full((height, width), 255, dtype=np.uint8)
+    rasterized = []
+    for points in shapes:
+        bbox, mask_roi = rasterize_shape(points, scale_x, scale_y, split_len, width, height)
+        if bbox is None:
+            continue
+        y0, x0, y1, x1 = bbox
+        background_mask[y0:y1, x0:x1][mask_roi == 255] = 0
+        rasterized.append((bbox, mask_roi))
+
+    jobs = [
+        (plan_object, (img_thresh[y0:y1, x0:x1], mask_roi, (y0, x0, y1, x1), split_len, cell_settings))
+        for (y0, x0, y1, x1), mask_roi in rasterized
+    ]
+    jobs.append((plan_cells, (img_thresh, bg_split_len, cell_settings, background_mask)))
+
+    max_workers = max_workers or default_workers()
+    results = None
+    if max_workers > 1 and len(jobs) > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=min(max_workers, len(jobs))) as pool:
+                futures = [pool.submit(func, *args) for func, args in jobs]
+                results = [future.result() for future in futures]
+        except Exception as e:
+            # no process support (e.g. some mobile builds), plan in this process
+            print(f"parallel mask planning unavailable, planning serially: {e}")
+    if results is None:
+        results = [func(*args) for func, args in jobs]
+
+    objects = [(bbox, mask_roi, rects) for (bbox, mask_roi), rects in zip(rasterized, results[:-1])]
+    return objects, background_mask, results[-1]
@@ -0,0 +1,200 @@
+"""
+Content-addressed store for rendered sketch videos.
+A render is keyed by a hash of the image bytes, the render parameters and
+the engine version, so an identical request can reuse the earlier video.
+"""
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+
+CACHE_DIR_NAME = ".render_cache"
+INDEX_FILE_NAME = "index.json"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512 MB
+
+_dir_locks = {}
+_dir_locks_guard = threading.Lock()
+
+
+def dir_lock(path):
+    """
+    The process-wide lock of a directory: renders running at once in the
+    render queue threads each build their own RenderCache (or checkpoint)
+    on it, so a per-instance lock would not serialise them.
+    """
+    key = os.path.abspath(path)
+    with _dir_locks_guard:
+        return _dir_locks.setdefault(key, threading.Lock())
+
+
+def hash_file(file_path, chunk_size=1024 * 1024):
+    """Return the sha256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def render_key(image_path, params, engine_version):
+    """
+    Build the cache key of a render.
+
+    Args:
+        image_path: Path of the source image (its bytes are hashed, not its name)
+        params: Dict of render parameters (JSON serializable)
+        engine_version: Version string of the rendering code
+
+    Returns:
+        Hex digest identifying the render
+    """
+    digest = hashlib.sha256()
+    digest.update(hash_file(image_path).encode("utf-8"))
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+    digest.update(str(engine_version).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _link_or_copy(src, dst):
+    """Hard link src to dst, falling back to a copy (e.g. across filesystems)."""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class RenderCache:
+    """
+    Size-bounded LRU store of rendered videos.
+
+    Entries live in cache_dir as <key><ext>, tracked by an index.json holding
+    each entry's file name, size and last use time. Callers always receive a
+    fresh file outside the store, so deleting it (as the app does after a
+    download) never damages the cached copy.
+    """
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, INDEX_FILE_NAME)
+        self._lock = dir_lock(cache_dir)
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            return index if isinstance(index, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self, index):
+        """Write the index atomically, returns False (and logs) when it cannot be written."""
+        tmp_path = None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=INDEX_FILE_NAME, suffix=".tmp", dir=self.cache_dir)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(index, f)
+            os.replace(tmp_path, self.index_path)
+            return True
+        except OSError as e:
+            print(f"render cache: failed to write the index: {e}")
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+
+    def lookup(self, key, dest_path_no_ext):
+        """
+        Fetch a cached render.
+
+        Args:
+            key: Render key from render_key()
+            dest_path_no_ext: Output path without extension; the cached
+                file's extension is appended
+
+        Returns:
+            Path of the fresh output file, or None on a miss
+        """
+        with self._lock:
+            index = self._load_index()
+            entry = index.get(key)
+            if entry is None:
+                return None
+            cached_file = os.path.join(self.cache_dir, entry["file"])
+            if not os.path.isfile(cached_file):
+                # stale entry, the file was removed behind our back
+                del index[key]
+                self._save_index(index)
+                return None
+            dest_path = dest_path_no_ext + os.path.splitext(entry["file"])[1]
+            try:
+                _link_or_copy(cached_file, dest_path)
+            except OSError as e:
+                print(f"render cache: failed to reuse {cached_file}: {e}")
+                return None
+            entry["last_used"] = time.time()
+            self._save_index(index)
+            return dest_path
+
+    def store(self, key, video_path):
+        """
+        Add a finished render to the cache, evicting least recently used
+        entries when the store grows beyond max_bytes.
+
+        Args:
+            key: Render key from render_key()
+            video_path: Rendered video; it is linked (or copied) into the store
+
+        Returns:
+            True if the render was stored
+        """
+        try:
+            size = os.path.getsize(video_path)
+        except OSError as e:
+            print(f"render cache: failed to store {video_path}: {e}")
+            return False
+        if size > self.max_bytes:
+            return False
+        file_name = key + os.path.splitext(video_path)[1]
+        cached_file = os.path.join(self.cache_dir, file_name)
+        with self._lock:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                if not os.path.isfile(cached_file):
+                    _link_or_copy(video_path, cached_file)
+            except OSError as e:
+                print(f"render cache: failed to store {video_path}: {e}")
+                return False
+            index = self._load_index()
+            is_new = key not in index
+            index[key] = {"file": file_name, "size": size, "last_used": time.time()}
+            self._evict(index)
+            if self._save_index(index):
+                return True
+            if is_new:
+                # an unindexed file would never be evicted
+                try:
+                    os.remove(cached_file)
+                except OSError:
+                    pass
+            return False
+
+    def _evict(self, index):
+        """Drop least recently used entries until the store fits max_bytes."""
+        total = sum(entry["size"] for entry in index.values())
+        for key in sorted(index, key=lambda k: index[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            entry = index.pop(key)
+            total -= entry["size"]
+            try:
+                os.remove(os.path.join(self.cache_dir, entry["file"]))
+            except OSError:
+                pass
+
+    def clear(self):
+        """Remove every cached render."""
+        with self._lock:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
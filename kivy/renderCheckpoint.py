@@ -0,0 +1,201 @@
+"""
+Checkpoints of resumable sketch renders.
+A checkpointed render is encoded as a series of H.264 segment files (see
+segmentEncoder); a manifest records the segment boundaries, which of them
+are finished and the arguments of the render. When the app is killed or
+the process dies, the next render with the same key keeps the finished
+segments and only encodes the rest. The drawn canvas at a segment boundary
+is rebuilt from the cell plan, so it does not need to be saved.
+"""
+import os
+import json
+import time
+import shutil
+import threading
+from dataclasses import asdict, is_dataclass
+from sketchPreprocess import PreprocessSettings
+from sketchPlan import CellSettings
+from renderCache import dir_lock
+
+RESUME_DIR_NAME = ".render_resume"
+MANIFEST_FILE_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+# initiate_sketch arguments holding settings objects, rebuilt on resume
+_SETTINGS_ARGS = {"preprocess_settings": PreprocessSettings, "cell_settings": CellSettings}
+# video seconds per segment of the app's renders: a killed render loses at
+# most this much, and each segment starts with a keyframe
+DEFAULT_CHECKPOINT_SECONDS = 10
+
+
+def resume_dir(save_path):
+    return os.path.join(save_path, RESUME_DIR_NAME)
+
+
+def _to_json(render_args):
+    return {
+        name: asdict(value) if is_dataclass(value) else value
+        for name, value in render_args.items()
+    }
+
+
+def _from_json(render_args):
+    render_args = dict(render_args)
+    for name, settings_class in _SETTINGS_ARGS.items():
+        if isinstance(render_args.get(name), dict):
+            render_args[name] = settings_class(**render_args[name])
+    return render_args
+
+
+class RenderCheckpoint:
+    """
+    Manifest and segment files of one render, in <save_path>/.render_resume/<key>/.
+
+    The manifest holds the render key, the initiate_sketch arguments, the
+    total frame count, the (start, stop) frame range of every segment and
+    the ranges already encoded. It is first written once a segment is
+    finished, then rewritten atomically after each one, so a render killed
+    at any point loses at most the segments that were in progress and a
+    render failing before its first segment leaves nothing to resume.
+    """
+    def __init__(self, save_path, key):
+        self.key = key
+        self.checkpoint_dir = os.path.join(resume_dir(save_path), key)
+        self.manifest_path = os.path.join(self.checkpoint_dir, MANIFEST_FILE_NAME)
+        self.manifest = None
+        self._lock = threading.Lock()
+        # held from begin() to clear() / release(), so two renders with the
+        # same key never write the same segments
+        self._dir_lock = dir_lock(self.checkpoint_dir)
+        self._owns_dir = False
+
+    def load(self):
+        """The saved manifest, or None when there is no usable one."""
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+            return None
+        return manifest
+
+    def _save(self):
+        self.manifest["updated"] = time.time()
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def begin(self, render_args, total_frames, ranges):
+        """
+        Open the checkpoint for a render, keeping the finished segments of an
+        earlier run with the same frame ranges and starting afresh otherwise.
+        Waits while another render of this process holds the same key; the
+        caller must end with clear() or release().
+
+        Args:
+            render_args: initiate_sketch arguments (without callbacks), saved
+                so an interrupted render can be restarted
+            total_frames: Frames of the whole video
+            ranges: (start, stop) frame range of every segment
+
+        Returns:
+            Number of frames already encoded
+        """
+        ranges = [list(frame_range) for frame_range in ranges]
+        if not self._dir_lock.acquire(blocking=False):
+            print(f"render {self.key[:12]} is already running, waiting for it")
+            self._dir_lock.acquire()
+        self._owns_dir = True
+        try:
+            with self._lock:
+                manifest = self.load()
+                if manifest is not None and manifest["total_frames"] == total_frames and manifest["ranges"] == ranges:
+                    # only keep segments whose file survived
+                    manifest["done"] = [
+                        frame_range for frame_range in manifest["done"]
+                        if os.path.isfile(self.segment_path(frame_range))
+                    ]
+                    print(f"resuming render {self.key[:12]}: {len(manifest['done'])}/{len(ranges)} segments done")
+                else:
+                    shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+                    manifest = {
+                        "version": MANIFEST_VERSION,
+                        "key": self.key,
+                        "created": time.time(),
+                        "total_frames": total_frames,
+                        "ranges": ranges,
+                        "done": [],
+                    }
+                manifest["render"] = _to_json(render_args)
+                os.makedirs(self.checkpoint_dir, exist_ok=True)
+                self.manifest = manifest
+                if manifest["done"]:
+                    self._save()
+                return self.frames_done
+        except BaseException:
+            self.release()
+            raise
+
+    def segment_path(self, frame_range):
+        start, stop = frame_range
+        return os.path.join(self.checkpoint_dir, f"part_{start:08d}_{stop:08d}.mp4")
+
+    def is_done(self, frame_range):
+        return list(frame_range) in self.manifest["done"]
+
+    def mark_done(self, frame_range):
+        """Record a finished segment."""
+        with self._lock:
+            if not self.is_done(frame_range):
+                self.manifest["done"].append(list(frame_range))
+                self._save()
+
+    @property
+    def frames_done(self):
+        """Render position: frames in finished segments."""
+        return sum(stop - start for start, stop in self.manifest["done"])
+
+    def clear(self):
+        """Remove the manifest and segments, once the video is complete or abandoned."""
+        with self._lock:
+            shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+        self.release()
+
+    def release(self):
+        """Let another render use this key, keeping the files for a later resume."""
+        if self._owns_dir:
+            self._owns_dir = False
+            self._dir_lock.release()
+
+
+def pending_renders(save_path):
+    """
+    Renders under save_path that stopped before finishing.
+
+    Returns:
+        list of dicts with 'key', 'render' (initiate_sketch keyword
+        arguments), 'frames_done', 'total_frames' and 'updated', newest first
+    """
+    pending = []
+    root = resume_dir(save_path)
+    if not os.path.isdir(root):
+        return pending
+    for key in os.listdir(root):
+        manifest = RenderCheckpoint(save_path, key).load()
+        if manifest is None or "render" not in manifest:
+            continue
+        pending.append({
+            "key": key,
+            "render": _from_json(manifest["render"]),
+            "frames_done": sum(stop - start for start, stop in manifest["done"]),
+            "total_frames": manifest["total_frames"],
+            "updated": manifest.get("updated", 0),
+        })
+    pending.sort(key=lambda item: item["updated"], reverse=True)
+    return pending
+
+
+def discard_render(save_path, key):
+    """Drop the checkpoint of an interrupted render."""
+    RenderCheckpoint(save_path, key).clear()
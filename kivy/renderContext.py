@@ -0,0 +1,89 @@
+"""
+Immutable per-render configuration for the sketch pipeline.
+A RenderContext is built once per job and handed to every stage, so
+several renders can run in one process (RenderQueue workers, a server)
+without sharing or mutating module state. Stages that need a variation,
+e.g. a coarser grid for the background, derive a new context with
+replace() instead of editing the job's one.
+"""
+from dataclasses import dataclass, replace
+from typing import Any, Optional, Tuple
+import cv2
+from sketchPreprocess import DEFAULT_SETTINGS, PreprocessSettings
+from sketchPlan import DEFAULT_CELLS, CellSettings
+
+MASK_PLANNING_MODES = ("serial", "parallel")
+
+
+@dataclass(frozen=True)
+class RenderContext:
+    """
+    Settings of one video render.
+
+    frame_rate, the skip rates and end_gray_img_duration_in_sec shape the
+    video timing; resize_wd x resize_ht is the output resolution and
+    split_len the grid size. image_path enables the shared plan cache and
+    source_size is the (width, height) of the image file. platform picks
+    the raw video codec. encode_segments > 1 renders the video in that many
+    parallel segments (segmentEncoder), None one per core; 1 writes a single
+    stream. checkpoint_seconds cuts the segmented video into parts of that
+    many seconds, checkpointed so an interrupted render can resume.
+    renditions are the lower resolution copies (renditions.Rendition)
+    encoded from the same frames.
+    cancel_token and progress are the optional
+    renderJobs objects of the job; they are shared handles, not settings.
+    """
+    frame_rate: Optional[int] = None
+    resize_wd: Optional[int] = None
+    resize_ht: Optional[int] = None
+    split_len: Optional[int] = None
+    object_skip_rate: Optional[int] = None
+    bg_object_skip_rate: Optional[int] = None
+    end_gray_img_duration_in_sec: Optional[int] = None
+    image_path: Optional[str] = None
+    preprocess_settings: PreprocessSettings = DEFAULT_SETTINGS
+    source_size: Optional[Tuple[int, int]] = None
+    cell_settings: CellSettings = DEFAULT_CELLS
+    mask_planning: str = "serial"
+    platform: str = "linux"
+    encode_segments: Optional[int] = 1
+    checkpoint_seconds: Optional[float] = None
+    renditions: Tuple[Any, ...] = ()
+    cancel_token: Any = None
+    progress: Any = None
+
+    def __post_init__(self):
+        # None keeps the defaults, as the AllVariables arguments always did
+        if self.preprocess_settings is None:
+            object.__setattr__(self, "preprocess_settings", DEFAULT_SETTINGS)
+        if self.cell_settings is None:
+            object.__setattr__(self, "cell_settings", DEFAULT_CELLS)
+        if self.mask_planning not in MASK_PLANNING_MODES:
+            raise ValueError(f"Unknown mask planning: {self.mask_planning}, expected one of {MASK_PLANNING_MODES}")
+
+    @property
+    def segmented(self):
+        """Whether the video is rendered in parallel segments."""
+        return self.encode_segments != 1 or self.checkpoint_seconds is not None
+
+    @property
+    def segment_frames(self):
+        """Maximum frames per segment of a checkpointed render, else None."""
+        if self.checkpoint_seconds is None:
+            return None
+        return max(1, int(round(self.checkpoint_seconds * self.frame_rate)))
+
+    def replace(self, **changes):
+        """A copy of this context with some fields changed."""
+        return replace(self, **changes)
+
+    @property
+    def raw_video_ext(self):
+        """Extension of the OpenCV video written before the H.264 conversion."""
+        return ".avi" if self.platform == "android" else ".mp4"
+
+    def fourcc(self):
+        """Codec of the raw OpenCV video for this platform."""
+        if self.platform == "android":
+            return cv2.VideoWriter_fourcc(*"MJPG")  # mpg2 or h264 or MJPG
+        return cv2.VideoWriter_fourcc(*"mp4v")
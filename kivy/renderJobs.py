@@ -0,0 +1,291 @@
+"""
+Render job handles for the sketch video pipeline.
+A RenderJob runs initiate_sketch in a worker thread with a cancellation
+token, checked between frames, and streams throttled progress events
+(frames written, percent, ETA) to the UI thread through the Kivy Clock.
+A RenderQueue runs several jobs with a bounded number of workers.
+"""
+import os
+import time
+import itertools
+import threading
+from collections import deque
+from kivy.clock import Clock
+
+JOB_STATES = ("queued", "running", "done", "failed", "cancelled")
+_job_ids = itertools.count(1)
+
+
+def default_workers():
+    """Default parallelism of renders, segment encoding and mask planning: one per core, leaving one for the UI."""
+    return max(1, (os.cpu_count() or 1) - 1)
+
+
+class RenderCancelled(Exception):
+    """Raised inside the render thread when its job has been cancelled."""
+
+
+class CancelToken:
+    """Thread-safe cancellation flag shared by a job and its render thread."""
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise RenderCancelled("Render cancelled")
+
+
+class ProgressReporter:
+    """
+    Counts frames of a render stage and emits throttled progress events.
+
+    Events are dicts with 'stage' ("drawing" or "converting"), 'frames',
+    'total', 'percent', 'elapsed' and 'eta' (seconds, None until known),
+    delivered on the Kivy main thread via Clock.
+    """
+    def __init__(self, callback, min_interval=0.25):
+        """
+        Args:
+            callback: Called on the main thread with each event dict
+            min_interval: Minimum seconds between two events
+        """
+        self.callback = callback
+        self.min_interval = min_interval
+        self.stage = "drawing"
+        self.frames = 0
+        self.total = 0
+        self._stage_start = time.perf_counter()
+        self._last_emit = 0.0
+
+    def start_stage(self, stage, total=0):
+        """Begin counting a new stage (e.g. "converting") from zero."""
+        self.stage = stage
+        self.frames = 0
+        self.total = total
+        self._stage_start = time.perf_counter()
+        self._emit(time.perf_counter())
+
+    def expect(self, n_frames):
+        """Add frames to the expected total of the current stage."""
+        self.total += n_frames
+
+    def advance(self, n_frames=1):
+        """Count written frames, emitting an event when min_interval has passed."""
+        self.frames += n_frames
+        now = time.perf_counter()
+        if now - self._last_emit >= self.min_interval:
+            self._emit(now)
+
+    def finish(self):
+        """Emit the final state of the current stage regardless of throttling."""
+        self._emit(time.perf_counter())
+
+    def event(self, now=None):
+        """Current progress as an event dict."""
+        elapsed = (now or time.perf_counter()) - self._stage_start
+        total = max(self.total, self.frames)
+        percent = 100.0 * self.frames / total if total else 0.0
+        eta = None
+        if self.frames and total:
+            eta = round(elapsed * (total - self.frames) / self.frames, 1)
+        return {
+            "stage": self.stage,
+            "frames": self.frames,
+            "total": total,
+            "percent": round(percent, 1),
+            "elapsed": round(elapsed, 1),
+            "eta": eta,
+        }
+
+    def _emit(self, now):
+        self._last_emit = now
+        event = self.event(now)
+        Clock.schedule_once(lambda dt: self.callback(event))
+
+
+class RenderJob:
+    """
+    Handle of one video render running in a daemon thread.
+
+    Usage:
+        job = RenderJob(initiate_sketch, kwargs, on_complete, on_progress)
+        job.start()
+        ...
+        job.cancel()  # the render stops at the next frame
+
+    on_complete receives the initiate_sketch result dict (with
+    "cancelled": True when the job was cancelled), on_progress the
+    ProgressReporter event dicts; both run on the main thread. The latest
+    event is kept in last_progress and the job's state in state.
+    """
+    def __init__(self, render_func, render_kwargs, on_complete, on_progress=None, progress_interval=0.25, label=""):
+        """
+        Args:
+            render_func: initiate_sketch or a function with the same
+                callback / cancel_token / progress arguments
+            render_kwargs: Keyword arguments of render_func, without those three
+            on_complete: Called with the result dict when the render ends
+            on_progress: Optional, called with progress events
+            progress_interval: Minimum seconds between two progress events
+            label: Name shown for the job (e.g. the image file name)
+        """
+        self.job_id = next(_job_ids)
+        self.label = label
+        self.render_func = render_func
+        self.render_kwargs = dict(render_kwargs)
+        self.on_complete = on_complete
+        self.on_progress = on_progress
+        self.cancel_token = CancelToken()
+        self.progress = ProgressReporter(self._progressed, progress_interval)
+        self.last_progress = None
+        self.state = "queued"
+        self.result = None
+        self._thread = None
+
+    def start(self):
+        self.state = "running"
+        self._thread = threading.Thread(
+            target=self.render_func,
+            kwargs=dict(
+                self.render_kwargs, callback=self._finished,
+                cancel_token=self.cancel_token, progress=self.progress,
+            ),
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        """Ask the render to stop; on_complete is still called once it has."""
+        self.cancel_token.cancel()
+
+    @property
+    def cancelled(self):
+        return self.cancel_token.cancelled
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _progressed(self, event):
+        self.last_progress = event
+        if self.on_progress:
+            self.on_progress(event)
+
+    def _finished(self, result):
+        # initiate_sketch already delivers its callback on the main thread
+        self.result = result
+        if result.get("cancelled"):
+            self.state = "cancelled"
+        else:
+            self.state = "done" if result.get("status") else "failed"
+        self.on_complete(result)
+
+
+class RenderQueue:
+    """
+    Runs render jobs, at most max_workers at a time, in submission order.
+
+    All methods are meant to be called from the Kivy main thread (the job
+    callbacks are delivered there), so no locking is needed.
+    """
+    def __init__(self, max_workers=None, on_change=None):
+        """
+        Args:
+            max_workers: Concurrent renders, default_workers() when None
+            on_change: Optional, called with the job whenever a job is
+                queued, started or finished
+        """
+        self.max_workers = max(1, int(max_workers or default_workers()))
+        self.on_change = on_change
+        self.jobs = []  # every submitted job, in submission order
+        self._completions = {}  # job_id -> on_complete callbacks
+        self._pending = deque()
+
+    def submit(self, render_func, render_kwargs, on_complete=None, on_progress=None, label=""):
+        """
+        Queue a render; it starts right away when a worker is free.
+
+        A render identical to a queued or running one (same function and
+        arguments) is merged into it rather than run twice: both would write
+        the same checkpoint. The existing job is returned and on_complete
+        is called for it too; on_progress is only set on new jobs.
+
+        Returns:
+            RenderJob
+        """
+        job = self.find_active(render_func, render_kwargs)
+        if job is not None:
+            if on_complete:
+                self._completions[job.job_id].append(on_complete)
+            return job
+        job = RenderJob(render_func, render_kwargs, on_complete=None, on_progress=on_progress, label=label)
+        self._completions[job.job_id] = [on_complete] if on_complete else []
+        job.on_complete = lambda result: self._job_finished(job, result)
+        self.jobs.append(job)
+        self._pending.append(job)
+        self._changed(job)
+        self._start_next()
+        return job
+
+    def find_active(self, render_func, render_kwargs):
+        """The queued or running job rendering the same thing, or None."""
+        for job in self.jobs:
+            if (job.state in ("queued", "running") and job.render_func is render_func
+                    and job.render_kwargs == dict(render_kwargs)):
+                return job
+        return None
+
+    def cancel(self, job):
+        """Cancel a job: a queued one is dropped, a running one stops at its next frame."""
+        if job.state == "queued":
+            self._pending.remove(job)
+            job.cancel_token.cancel()
+            job._finished({"status": False, "message": "Render cancelled", "cancelled": True})
+        elif job.state == "running":
+            job.cancel()
+
+    def cancel_all(self):
+        for job in list(self.jobs):
+            self.cancel(job)
+
+    def set_max_workers(self, max_workers):
+        """Change the worker count, extra queued jobs start immediately."""
+        self.max_workers = max(1, int(max_workers))
+        self._start_next()
+
+    @property
+    def running(self):
+        return [job for job in self.jobs if job.state == "running"]
+
+    @property
+    def queued(self):
+        return list(self._pending)
+
+    @property
+    def finished(self):
+        """Jobs that produced a video, oldest first."""
+        return [job for job in self.jobs if job.state == "done"]
+
+    def _start_next(self):
+        while self._pending and len(self.running) < self.max_workers:
+            job = self._pending.popleft()
+            job.start()
+            self._changed(job)
+
+    def _job_finished(self, job, result):
+        for on_complete in self._completions.pop(job.job_id, []):
+            on_complete(result)
+        self._changed(job)
+        self._start_next()
+
+    def _changed(self, job):
+        if self.on_change:
+            self.on_change(job)
@@ -0,0 +1,284 @@
+"""
+Predictive render planner.
+Computes the exact frame count and duration of a sketch video from the
+inked-cell count and skip rates before any drawing, solves the inverse
+problem (skip rate and split_len for a target duration) and estimates the
+render time from per-stage costs calibrated on this machine.
+"""
+import os
+import json
+import time
+import tempfile
+import cv2
+import numpy as np
+import sketchApi
+from sketchPlan import get_preprocess_graph, threshold_image, find_cell_rects, order_cells, DEFAULT_CELLS
+from sketchPreprocess import DEFAULT_SETTINGS
+from splitAdvisor import common_divisors, count_frames
+from imageIngest import image_size
+
+COST_FILE_NAME = "render_costs.json"
+MAX_SKIP_RATE = 500
+
+
+class RenderCosts:
+    """
+    Per-stage cost coefficients (seconds) of the video pipeline.
+
+    preprocess: per pixel, resize + grayscale + threshold
+    walk: per cell pair, greedy nearest-neighbour ordering (quadratic)
+    cell / cell_px: per cell, plus per cell per pixel, drawing a cell and
+        compositing the hand on a copy of the frame
+    write: per frame per pixel, writing a raw frame
+    encode: per frame per pixel, H.264 conversion
+    The defaults are rough desktop figures, calibrate() measures real ones.
+    """
+    def __init__(self, preprocess=1.5e-8, walk=3e-8, cell=3e-4, cell_px=1e-9, write=1e-8, encode=3e-8):
+        self.preprocess = preprocess
+        self.walk = walk
+        self.cell = cell
+        self.cell_px = cell_px
+        self.write = write
+        self.encode = encode
+
+    def estimate(self, resize_wd, resize_ht, n_cells, n_frames):
+        """
+        Estimated seconds spent in each stage of a render.
+
+        Returns:
+            dict of stage name to seconds, with the sum under 'total'
+        """
+        pixels = resize_wd * resize_ht
+        drawn_cells = max(n_cells - 1, 0)
+        stages = {
+            "preprocess": self.preprocess * pixels,
+            "walk": self.walk * n_cells * n_cells / 2,
+            "draw": (self.cell + self.cell_px * pixels) * drawn_cells,
+            "write": self.write * pixels * n_frames,
+            "encode": self.encode * pixels * n_frames,
+        }
+        stages["total"] = sum(stages.values())
+        return {name: round(seconds, 2) for name, seconds in stages.items()}
+
+    def to_dict(self):
+        return {
+            "preprocess": self.preprocess,
+            "walk": self.walk,
+            "cell": self.cell,
+            "cell_px": self.cell_px,
+            "write": self.write,
+            "encode": self.encode,
+        }
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        """Load calibrated costs, or the defaults when the file is missing or invalid."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return cls(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return cls()
+
+
+def load_costs(save_dir=sketchApi.save_path):
+    """Calibrated costs stored in save_dir by calibrate(), defaults otherwise."""
+    return RenderCosts.load(os.path.join(save_dir, COST_FILE_NAME))
+
+
+def _sketch_frames(resize_wd, resize_ht, n_frames, rng):
+    """Synthetic frames looking like a drawing in progress: strokes added on white."""
+    frame = np.full((resize_ht, resize_wd, 3), 255, np.uint8)
+    for _ in range(n_frames):
+        for _ in range(4):
+            x0, x1 = rng.integers(0, resize_wd, 2)
+            y0, y1 = rng.integers(0, resize_ht, 2)
+            cv2.line(frame, (int(x0), int(y0)), (int(x1), int(y1)), (0, 0, 0), 2)
+        yield frame
+
+
+def _time_cell_draws(resize_wd, resize_ht, hand_vars, n_draws):
+    drawn_frame = np.full((resize_ht, resize_wd, 3), 255, np.uint8)
+    start = time.perf_counter()
+    for i in range(n_draws):
+        x, y = (i * 37) % resize_wd, (i * 23) % resize_ht
+        sketchApi.draw_hand_on_img(
+            drawn_frame.copy(), hand_vars.hand.copy(), x, y, hand_vars.hand_mask_inv.copy(),
+            hand_vars.hand_ht, hand_vars.hand_wd, resize_ht, resize_wd,
+        )
+    return (time.perf_counter() - start) / n_draws
+
+
+def calibrate(resize_wd=640, resize_ht=360, n_cells=1500, n_frames=60, save_to=None):
+    """
+    Measure the per-stage costs on this machine with small synthetic runs.
+
+    Args:
+        resize_wd: Frame width used for the measurements
+        resize_ht: Frame height used for the measurements
+        n_cells: Cells used to time the walk and the per-cell drawing
+        n_frames: Frames used to time writing and encoding
+        save_to: Optional JSON path to store the result, load_costs() reads
+            os.path.join(save_dir, COST_FILE_NAME)
+
+    Returns:
+        RenderCosts object
+    """
+    pixels = resize_wd * resize_ht
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, (resize_ht, resize_wd, 3), dtype=np.uint8)
+    costs = RenderCosts()
+
+    # preprocessing without the cache, as on a cold render
+    start = time.perf_counter()
+    threshold_image(image, resize_wd, resize_ht)
+    costs.preprocess = (time.perf_counter() - start) / pixels
+
+    cells = rng.integers(0, 200, (n_cells, 2))
+    start = time.perf_counter()
+    order_cells(cells)
+    costs.walk = (time.perf_counter() - start) / (n_cells * n_cells / 2)
+
+    # per cell cost at two frame sizes, split into fixed and per-pixel parts
+    hand_vars = sketchApi.preprocess_hand_image(
+        sketchApi.hand_path, sketchApi.hand_mask_path, sketchApi.AllVariables()
+    )
+    n_draws = min(n_cells, 300)
+    small = _time_cell_draws(resize_wd, resize_ht, hand_vars, n_draws)
+    large = _time_cell_draws(resize_wd * 2, resize_ht * 2, hand_vars, n_draws)
+    costs.cell_px = max((large - small) / (3 * pixels), 0.0)
+    costs.cell = max(small - costs.cell_px * pixels, 0.0)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        raw_path = os.path.join(tmp_dir, "raw.mp4")
+        writer = cv2.VideoWriter(raw_path, cv2.VideoWriter_fourcc(*"mp4v"), 25, (resize_wd, resize_ht))
+        frames = list(_sketch_frames(resize_wd, resize_ht, n_frames, rng))
+        start = time.perf_counter()
+        for frame in frames:
+            writer.write(frame)
+        writer.release()
+        costs.write = (time.perf_counter() - start) / (n_frames * pixels)
+
+        start = time.perf_counter()
+        if sketchApi.ffmpeg_convert(raw_path, os.path.join(tmp_dir, "h264.mp4")):
+            costs.encode = (time.perf_counter() - start) / (n_frames * pixels)
+
+    if save_to:
+        costs.save(save_to)
+    return costs
+
+
+def _target_and_thresh(image_path, preprocess_settings):
+    resize_wd, resize_ht = sketchApi.get_target_res(*image_size(image_path))
+    graph = get_preprocess_graph(image_path, resize_wd, resize_ht)
+    img_thresh = graph.thresholded(resize_wd, resize_ht, preprocess_settings or DEFAULT_SETTINGS)
+    return resize_wd, resize_ht, img_thresh
+
+
+def plan_render(image_path, split_len, frame_rate, object_skip_rate, main_img_duration,
+                preprocess_settings=None, cell_settings=None, costs=None):
+    """
+    Exact frame count, duration and estimated render time of a video render,
+    computed from the thresholded image only (no drawing).
+
+    Args:
+        image_path: Path of the source image
+        split_len: Grid size
+        frame_rate: Video frame rate
+        object_skip_rate: Cells drawn per written frame
+        main_img_duration: Seconds the finished image is shown
+        preprocess_settings: Optional PreprocessSettings
+        cell_settings: Optional CellSettings (uniform grid by default)
+        costs: RenderCosts, defaults to uncalibrated figures
+
+    Returns:
+        dict with 'resolution', 'split_len', 'object_skip_rate', 'cells',
+        'frames', 'duration' (seconds) and 'render_time' (per stage seconds)
+    """
+    resize_wd, resize_ht, img_thresh = _target_and_thresh(image_path, preprocess_settings)
+    n_cells = len(find_cell_rects(img_thresh, split_len, cell_settings or DEFAULT_CELLS))
+    return _plan_entry(resize_wd, resize_ht, split_len, n_cells, frame_rate,
+                       object_skip_rate, main_img_duration, costs or RenderCosts())
+
+
+def _plan_entry(resize_wd, resize_ht, split_len, n_cells, frame_rate, skip_rate, main_img_duration, costs):
+    frames = count_frames(n_cells, skip_rate, frame_rate, main_img_duration)
+    return {
+        "resolution": (resize_wd, resize_ht),
+        "split_len": split_len,
+        "object_skip_rate": skip_rate,
+        "cells": n_cells,
+        "frames": frames,
+        "duration": round(frames / frame_rate, 2),
+        "render_time": costs.estimate(resize_wd, resize_ht, n_cells, frames),
+    }
+
+
+def solve_for_duration(image_path, target_duration, frame_rate=25, main_img_duration=2,
+                       split_lens=None, min_split_len=5, prefer="detail", preprocess_settings=None, cell_settings=None, costs=None):
+    """
+    Choose split_len and skip rate so the video lasts about target_duration.
+
+    For every candidate split_len the skip rate giving the closest duration is
+    computed exactly from its inked-cell count. The best candidate is the one
+    closest to the target; among near ties (within half a second) prefer
+    decides: "detail" takes the finest split_len, "speed" the fastest
+    estimated render.
+
+    Args:
+        image_path: Path of the source image
+        target_duration: Wanted video length in seconds (including the final hold)
+        frame_rate: Video frame rate
+        main_img_duration: Seconds the finished image is shown
+        split_lens: Candidate split lengths, defaults to the common divisors
+            of the target resolution from min_split_len up
+        min_split_len: Smallest default candidate (very small cells make
+            the greedy walk impractical)
+        prefer: "detail" or "speed", how near ties are broken
+        preprocess_settings: Optional PreprocessSettings
+        cell_settings: Optional CellSettings (uniform grid by default)
+        costs: RenderCosts, defaults to uncalibrated figures
+
+    Returns:
+        dict with 'best' (plan dict as in plan_render, plus 'bg_object_skip_rate')
+        and 'candidates' (the best plan of every split_len)
+    """
+    drawing_frames = int(round((target_duration - main_img_duration) * frame_rate))
+    if drawing_frames < 1:
+        raise ValueError(
+            f"target duration {target_duration}s leaves no time to draw "
+            f"(the final image alone is shown for {main_img_duration}s)"
+        )
+    costs = costs or RenderCosts()
+    resize_wd, resize_ht, img_thresh = _target_and_thresh(image_path, preprocess_settings)
+    if split_lens is None:
+        split_lens = [s for s in common_divisors(resize_ht, resize_wd) if s >= min_split_len]
+
+    candidates = []
+    for split_len in split_lens:
+        n_cells = len(find_cell_rects(img_thresh, split_len, cell_settings or DEFAULT_CELLS))
+        ideal_skip = max(n_cells - 1, 0) / drawing_frames
+        best = None
+        for skip_rate in {int(np.floor(ideal_skip)), int(np.ceil(ideal_skip))}:
+            skip_rate = min(max(skip_rate, 1), MAX_SKIP_RATE)
+            entry = _plan_entry(resize_wd, resize_ht, split_len, n_cells, frame_rate,
+                                skip_rate, main_img_duration, costs)
+            if best is None or abs(entry["duration"] - target_duration) < abs(best["duration"] - target_duration):
+                best = entry
+        # the background rate only matters for masked renders, keep it in step
+        best["bg_object_skip_rate"] = best["object_skip_rate"]
+        candidates.append(best)
+
+    if not candidates:
+        raise ValueError("no usable split length for this image")
+
+    closest = min(abs(c["duration"] - target_duration) for c in candidates)
+    near = [c for c in candidates if abs(c["duration"] - target_duration) <= closest + 0.5]
+    if prefer == "speed":
+        best = min(near, key=lambda c: (c["render_time"]["total"], c["split_len"]))
+    else:
+        best = min(near, key=lambda c: (c["split_len"], c["render_time"]["total"]))
+    return {"best": best, "candidates": candidates}
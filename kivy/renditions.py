@@ -0,0 +1,187 @@
+"""
+Lower-resolution renditions of a sketch video from a single render pass.
+Every frame written at the render resolution is also handed to one
+encoder thread per rendition, which downsizes it with cv2.resize
+(INTER_AREA) and encodes it to H.264 with PyAV. Both release the GIL, so
+the renditions encode in parallel with the drawing.
+"""
+import os
+import queue
+import threading
+from collections import namedtuple
+from functools import lru_cache
+import cv2
+
+Rendition = namedtuple("Rendition", ["label", "width", "height"])
+
+DEFAULT_OPTIONS = {"crf": "20"}
+QUEUE_FRAMES = 8  # frames buffered per rendition before the drawing waits
+
+
+def plan_renditions(width, height, heights):
+    """
+    Renditions of a width x height video at lower heights, keeping the
+    aspect ratio with even sizes (yuv420p).
+
+    Args:
+        width: Render width
+        height: Render height
+        heights: Requested heights; those not below height are left out,
+            the rendered video already covers them
+
+    Returns:
+        tuple of Rendition, highest first, labelled e.g. "720p"
+    """
+    renditions = []
+    for target in sorted({int(h) for h in heights or ()}, reverse=True):
+        if target >= height or target < 2:
+            continue
+        target_wd = max(2, int(round(width * target / height / 2)) * 2)
+        renditions.append(Rendition(f"{target}p", target_wd, target // 2 * 2))
+    return tuple(renditions)
+
+
+def rendition_path(video_path, label):
+    """Path of a rendition next to video_path, e.g. vid_h264.mp4 -> vid_h264_720p.mp4"""
+    base, ext = os.path.splitext(video_path)
+    return f"{base}_{label}{ext}"
+
+
+@lru_cache(maxsize=None)
+def h264_available():
+    """
+    Whether PyAV with an H.264 encoder is available, as the segmented
+    encoder and the renditions need; builds without it (e.g. some Android
+    recipes) only have the OpenCV writer and ffmpeg_convert fallback.
+    """
+    try:
+        import av
+        av.codec.Codec("h264", "w")
+    except Exception as e:
+        print(f"H.264 encoding through PyAV unavailable: {e}")
+        return False
+    return True
+
+
+def open_h264(path, width, height, frame_rate, options=DEFAULT_OPTIONS):
+    """Open an mp4 container with one yuv420p H.264 stream, returns (container, stream)."""
+    import av
+    container = av.open(path, mode="w")
+    stream = container.add_stream("h264", rate=frame_rate)
+    stream.width = width
+    stream.height = height
+    stream.pix_fmt = "yuv420p"
+    stream.options = dict(options)
+    return container, stream
+
+
+class RenditionEncoder:
+    """
+    Encodes one rendition in a background thread.
+
+    Frames passed to write() are queued, not copied: the caller must not
+    modify a frame after writing it (the pipeline writes fresh frames).
+    """
+    def __init__(self, rendition, path, frame_rate, options=DEFAULT_OPTIONS):
+        self.rendition = rendition
+        self.path = path
+        self.error = None
+        self._queue = queue.Queue(maxsize=QUEUE_FRAMES)
+        self._container, self._stream = open_h264(path, rendition.width, rendition.height, frame_rate, options)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        import av
+        size = (self.rendition.width, self.rendition.height)
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                break
+            if self.error is not None:
+                continue  # keep draining so write() never blocks
+            try:
+                small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+                for packet in self._stream.encode(av.VideoFrame.from_ndarray(small, format="bgr24")):
+                    self._container.mux(packet)
+            except Exception as e:
+                self.error = e
+        try:
+            if self.error is None:
+                for packet in self._stream.encode(None):
+                    self._container.mux(packet)
+        except Exception as e:
+            self.error = e
+        finally:
+            self._container.close()
+
+    def write(self, frame):
+        if self.error is not None:
+            raise RuntimeError(f"{self.rendition.label} encoding failed: {self.error}")
+        self._queue.put(frame)
+
+    def close(self):
+        """Encode the queued frames and finish the file."""
+        self._queue.put(None)
+        self._thread.join()
+        if self.error is not None:
+            raise RuntimeError(f"{self.rendition.label} encoding failed: {self.error}")
+
+    def abort(self):
+        """Stop and remove the partial file."""
+        self.error = self.error or "aborted"
+        self._queue.put(None)
+        self._thread.join()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def open_encoders(renditions, frame_rate, options=DEFAULT_OPTIONS):
+    """
+    Start an encoder per (Rendition, path) pair.
+
+    Returns:
+        list of RenditionEncoder
+    """
+    encoders = []
+    try:
+        for rendition, path in renditions:
+            encoders.append(RenditionEncoder(rendition, path, frame_rate, options))
+    except BaseException:
+        abort_encoders(encoders)
+        raise
+    return encoders
+
+
+def close_encoders(encoders):
+    for encoder in encoders:
+        encoder.close()
+
+
+def abort_encoders(encoders):
+    for encoder in encoders:
+        encoder.abort()
+
+
+class FanoutWriter:
+    """
+    cv2.VideoWriter stand-in that writes each frame to the main writer and
+    to every rendition encoder.
+    """
+    def __init__(self, writer, encoders):
+        self.writer = writer
+        self.encoders = encoders
+
+    def write(self, frame):
+        self.writer.write(frame)
+        for encoder in self.encoders:
+            encoder.write(frame)
+
+    def release(self):
+        self.writer.release()
+        close_encoders(self.encoders)
+
+    def abort(self):
+        """Release the main writer and drop the renditions (cancelled render)."""
+        self.writer.release()
+        abort_encoders(self.encoders)
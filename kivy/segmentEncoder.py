@@ -0,0 +1,394 @@
+"""
+Segmented parallel encoding of sketch videos.
+Once the cells of every drawing pass are planned, the canvas at any frame
+is known without drawing the frames before it: all earlier cells painted,
+earlier passes pasted over. The timeline is cut into segments, each
+segment is rebuilt from that state and encoded to H.264 in its own
+process, and the segment files are joined by a PyAV remux (no re-encode).
+"""
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_EXCEPTION
+from fractions import Fraction
+import multiprocessing
+import queue
+import numpy as np
+from renderJobs import RenderCancelled, default_workers
+from renditions import open_h264, open_encoders, close_encoders, abort_encoders, rendition_path
+
+# one call of draw_masked_object: rects in image coordinates, in drawing
+# order; bbox (y0, x0, y1, x1) and mask_roi (uint8, 255 inside) for an object,
+# both None for the whole image
+DrawPass = namedtuple("DrawPass", ["rects", "skip_rate", "bbox", "mask_roi"])
+
+# with no B-frames the decode and presentation order match, so segments
+# can be appended by shifting their timestamps only
+ENCODE_OPTIONS = {"crf": "20", "bf": "0"}
+CANCEL_CHECK_FRAMES = 8
+PROGRESS_FRAMES = 25
+
+
+def pass_frames(draw_pass):
+    """Frames written by a pass: every skip_rate-th cell, the last cell excluded."""
+    return max(len(draw_pass.rects) - 1, 0) // draw_pass.skip_rate
+
+
+def total_frames(passes, end_frames):
+    return sum(pass_frames(draw_pass) for draw_pass in passes) + end_frames
+
+
+def split_timeline(n_frames, segments):
+    """
+    Cut frames [0, n_frames) into at most `segments` contiguous ranges of
+    near equal length.
+
+    Returns:
+        list of (start, stop)
+    """
+    segments = max(1, min(segments, n_frames))
+    bounds = [n_frames * k // segments for k in range(segments + 1)]
+    return [(bounds[k], bounds[k + 1]) for k in range(segments) if bounds[k] < bounds[k + 1]]
+
+
+def _pass_source(draw_pass, img_thresh):
+    """Threshold image a pass copies its cells from and its (y0, x0) offset."""
+    if draw_pass.bbox is None:
+        return img_thresh, 0, 0
+    y0, x0, y1, x1 = draw_pass.bbox
+    source = img_thresh[y0:y1, x0:x1].copy()
+    source[draw_pass.mask_roi != 255] = 255
+    return source, y0, x0
+
+
+def _paint(drawn_frame, source, y0, x0, rects):
+    for v0, h0, v1, h1 in rects:
+        drawn_frame[v0:v1, h0:h1] = source[v0 - y0:v1 - y0, h0 - x0:h1 - x0, np.newaxis]
+
+
+def _paste_final(drawn_frame, draw_pass, img):
+    if draw_pass.bbox is None:
+        drawn_frame[:, :, :] = img
+    else:
+        y0, x0, y1, x1 = draw_pass.bbox
+        object_roi = draw_pass.mask_roi == 255
+        drawn_frame[y0:y1, x0:x1][object_roi] = img[y0:y1, x0:x1][object_roi]
+
+
+def iter_frames(passes, end_frames, img, img_thresh, hand, start=0, stop=None):
+    """
+    Frames [start, stop) of the video, identical to the ones
+    draw_whiteboard_animations writes; passes before start are painted
+    without drawing the hand.
+
+    Args:
+        passes: DrawPass list in drawing order
+        end_frames: Number of frames showing the original image at the end
+        img: Original image at the target resolution (BGR)
+        img_thresh: Thresholded image at the target resolution
+        hand: (hand, hand_mask_inv, hand_ht, hand_wd) as prepared by
+            preprocess_hand_image
+        start: First frame
+        stop: Frame after the last one, the end of the video when None
+    """
+    # sketchApi imports this module lazily, so the import is safe here
+    from sketchApi import draw_hand_on_img
+
+    hand_img, hand_mask_inv, hand_ht, hand_wd = hand
+    img_ht, img_wd = img.shape[:2]
+    if stop is None:
+        stop = total_frames(passes, end_frames)
+    drawn_frame = np.zeros(img.shape, np.uint8) + np.array([255, 255, 255], np.uint8)
+
+    first = 0  # index of the pass's first frame in the video
+    for draw_pass in passes:
+        if first >= stop:
+            return
+        n_frames = pass_frames(draw_pass)
+        n_cells = max(len(draw_pass.rects) - 1, 0)
+        source, y0, x0 = _pass_source(draw_pass, img_thresh)
+        skip_rate = draw_pass.skip_rate
+        if first + n_frames <= start:
+            _paint(drawn_frame, source, y0, x0, draw_pass.rects[:n_cells])
+        else:
+            # frame j of the pass shows cells [0, (j + 1) * skip_rate)
+            j = max(start - first, 0)
+            _paint(drawn_frame, source, y0, x0, draw_pass.rects[:j * skip_rate])
+            painted = j * skip_rate
+            while j < n_frames and first + j < stop:
+                cells_end = (j + 1) * skip_rate
+                _paint(drawn_frame, source, y0, x0, draw_pass.rects[painted:cells_end])
+                painted = cells_end
+                v0, h0, v1, h1 = draw_pass.rects[cells_end - 1]
+                yield draw_hand_on_img(
+                    drawn_frame.copy(), hand_img.copy(),
+                    h0 + (h1 - h0) // 2, v0 + (v1 - v0) // 2,
+                    hand_mask_inv.copy(), hand_ht, hand_wd, img_ht, img_wd,
+                )
+                j += 1
+            if first + n_frames > stop:
+                return
+            _paint(drawn_frame, source, y0, x0, draw_pass.rects[painted:n_cells])
+        _paste_final(drawn_frame, draw_pass, img)
+        first += n_frames
+
+    for _ in range(max(start, first), min(stop, first + end_frames)):
+        yield img
+
+
+def encode_segment(path, frame_range, passes, end_frames, img, img_thresh, hand, frame_rate,
+                   cancel_event=None, progress_queue=None, renditions=()):
+    """
+    Encode frames [start, stop) of the video to an H.264 mp4 (worker process entry point).
+
+    Args:
+        cancel_event: Optional object with is_set(), checked every few frames;
+            when set the segment file is removed and RenderCancelled raised
+        progress_queue: Optional object with put(n_frames) receiving the
+            number of frames encoded since the previous put
+        renditions: renditions.Rendition tuples also encoded for this
+            segment, next to path (see renditions.rendition_path)
+
+    Returns:
+        Number of frames encoded
+    """
+    import av
+    start, stop = frame_range
+    container, stream = open_h264(path, img.shape[1], img.shape[0], frame_rate, ENCODE_OPTIONS)
+    try:
+        encoders = open_encoders(
+            [(rendition, rendition_path(path, rendition.label)) for rendition in renditions],
+            frame_rate, ENCODE_OPTIONS,
+        )
+    except BaseException:
+        container.close()
+        raise
+    n_frames = 0
+    reported = 0
+    try:
+        for frame in iter_frames(passes, end_frames, img, img_thresh, hand, start, stop):
+            if cancel_event is not None and n_frames % CANCEL_CHECK_FRAMES == 0 and cancel_event.is_set():
+                raise RenderCancelled("Render cancelled")
+            for encoder in encoders:
+                encoder.write(frame)
+            for packet in stream.encode(av.VideoFrame.from_ndarray(frame, format="bgr24")):
+                container.mux(packet)
+            n_frames += 1
+            if progress_queue is not None and n_frames - reported >= PROGRESS_FRAMES:
+                progress_queue.put(n_frames - reported)
+                reported = n_frames
+        for packet in stream.encode(None):
+            container.mux(packet)
+        close_encoders(encoders)
+    except BaseException:
+        container.close()
+        abort_encoders(encoders)
+        if os.path.exists(path):
+            os.unlink(path)
+        raise
+    container.close()
+    if progress_queue is not None and n_frames > reported:
+        progress_queue.put(n_frames - reported)
+    return n_frames
+
+
+def concat_segments(segment_paths, dest_path):
+    """Join H.264 mp4 segments into dest_path by remuxing their packets, no re-encode."""
+    import av
+    output = av.open(dest_path, mode="w")
+    out_stream = None
+    offset = 0  # start of the current segment, in the output time base
+    try:
+        for segment_path in segment_paths:
+            with av.open(segment_path, mode="r") as source:
+                in_stream = source.streams.video[0]
+                if out_stream is None:
+                    if hasattr(output, "add_stream_from_template"):
+                        out_stream = output.add_stream_from_template(in_stream)
+                    else:  # PyAV < 14
+                        out_stream = output.add_stream(template=in_stream)
+                    out_stream.time_base = in_stream.time_base
+                scale = Fraction(in_stream.time_base) / Fraction(out_stream.time_base)
+                end = offset
+                for packet in source.demux(in_stream):
+                    if packet.dts is None:
+                        continue  # flush packet
+                    packet.pts = offset + int(packet.pts * scale)
+                    packet.dts = offset + int(packet.dts * scale)
+                    end = max(end, packet.pts + int((packet.duration or 0) * scale))
+                    packet.stream = out_stream
+                    output.mux(packet)
+                offset = end
+    finally:
+        output.close()
+
+
+class _TokenEvent:
+    """is_set() view of a renderJobs.CancelToken, for in-process segments."""
+    def __init__(self, cancel_token):
+        self.cancel_token = cancel_token
+
+    def is_set(self):
+        return self.cancel_token.cancelled
+
+
+class _ProgressSink:
+    """put() view of a renderJobs.ProgressReporter, for in-process segments."""
+    def __init__(self, progress):
+        self.progress = progress
+
+    def put(self, n_frames):
+        self.progress.advance(n_frames)
+
+
+def _drain(progress_queue, progress):
+    while True:
+        try:
+            n_frames = progress_queue.get_nowait()
+        except queue.Empty:
+            return
+        if progress is not None:
+            progress.advance(n_frames)
+
+
+def encode_segmented(dest_path, passes, end_frames, img, img_thresh, hand, frame_rate,
+                     segments=None, cancel_token=None, progress=None,
+                     segment_frames=None, checkpoint=None, render_args=None, renditions=()):
+    """
+    Render and encode the video in parallel segments, then join them.
+
+    Args:
+        dest_path: Output H.264 mp4
+        passes: DrawPass list in drawing order
+        end_frames: Frames showing the original image at the end
+        img: Original image at the target resolution
+        img_thresh: Thresholded image at the target resolution
+        hand: (hand, hand_mask_inv, hand_ht, hand_wd)
+        frame_rate: Output frame rate
+        segments: Number of worker processes, default_workers() when None;
+            without segment_frames also the number of segments
+        cancel_token: Optional renderJobs.CancelToken
+        progress: Optional renderJobs.ProgressReporter, advanced per encoded frames
+        segment_frames: Optional maximum frames per segment, the timeline is
+            then cut by length only so the segments do not depend on the
+            worker count
+        checkpoint: Optional renderCheckpoint.RenderCheckpoint; finished
+            segments are recorded there and those of an interrupted run reused
+        render_args: initiate_sketch arguments saved with the checkpoint
+        renditions: (renditions.Rendition, output path) pairs encoded along
+            with every segment and joined like the main video
+
+    Returns:
+        Number of frames in the video
+    """
+    n_frames = total_frames(passes, end_frames)
+    workers = segments or default_workers()
+    if segment_frames:
+        ranges = split_timeline(n_frames, -(-n_frames // segment_frames))
+    else:
+        ranges = split_timeline(n_frames, workers)
+    frames_done = 0
+    if checkpoint is not None:
+        frames_done = checkpoint.begin(render_args or {}, n_frames, ranges)
+        segment_paths = [checkpoint.segment_path(frame_range) for frame_range in ranges]
+    else:
+        base, ext = os.path.splitext(dest_path)
+        segment_paths = [f"{base}_part{k:02d}{ext}" for k in range(len(ranges))]
+    rendition_specs = tuple(rendition for rendition, _ in renditions)
+    # every file of a segment: the main one first, then its renditions
+    segment_files = [
+        [path] + [rendition_path(path, rendition.label) for rendition in rendition_specs]
+        for path in segment_paths
+    ]
+    dest_files = [dest_path] + [path for _, path in renditions]
+    todo = [k for k in range(len(ranges)) if checkpoint is None or not checkpoint.is_done(ranges[k])]
+    if progress is not None:
+        progress.start_stage("drawing", n_frames)
+        if frames_done:
+            progress.advance(frames_done)
+
+    def job_args(k):
+        return (segment_paths[k], ranges[k], passes, end_frames, img, img_thresh, hand, frame_rate)
+
+    def segment_done(k):
+        if checkpoint is not None:
+            checkpoint.mark_done(ranges[k])
+
+    def remove_segments():
+        if checkpoint is not None:
+            checkpoint.clear()
+            return
+        for files in segment_files:
+            for segment_path in files:
+                if os.path.exists(segment_path):
+                    os.unlink(segment_path)
+
+    def remove_outputs():
+        for path in dest_files:
+            if os.path.exists(path):
+                os.unlink(path)
+
+    try:
+        done = False
+        if workers > 1 and len(todo) > 1:
+            try:
+                done = _encode_in_processes(
+                    job_args, todo, min(workers, len(todo)), segment_done, cancel_token, progress, rendition_specs
+                )
+            except (OSError, NotImplementedError, ImportError) as e:
+                # no process support (e.g. some mobile builds), encode in this thread
+                print(f"parallel segment encoding unavailable, encoding serially: {e}")
+        if not done:
+            cancel_event = _TokenEvent(cancel_token) if cancel_token is not None else None
+            sink = _ProgressSink(progress) if progress is not None else None
+            for k in todo:
+                if checkpoint is not None and checkpoint.is_done(ranges[k]):
+                    continue  # finished before the process pool failed
+                encode_segment(*job_args(k), cancel_event=cancel_event, progress_queue=sink,
+                               renditions=rendition_specs)
+                segment_done(k)
+        if progress is not None:
+            progress.finish()
+        for i, path in enumerate(dest_files):
+            concat_segments([files[i] for files in segment_files], path)
+    except RenderCancelled:
+        remove_outputs()
+        remove_segments()
+        raise
+    except BaseException:
+        # a checkpointed render keeps its finished segments for a later resume,
+        # one failing before its first segment has nothing worth resuming
+        remove_outputs()
+        if checkpoint is None or not checkpoint.manifest["done"]:
+            remove_segments()
+        else:
+            checkpoint.release()
+        raise
+    remove_segments()
+    return n_frames
+
+
+def _encode_in_processes(job_args, todo, workers, segment_done, cancel_token, progress, renditions):
+    with multiprocessing.Manager() as manager:
+        cancel_event = manager.Event()
+        progress_queue = manager.Queue()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(encode_segment, *job_args(k), cancel_event=cancel_event,
+                            progress_queue=progress_queue, renditions=renditions): k
+                for k in todo
+            }
+            pending = set(futures)
+            while pending:
+                finished, pending = wait(pending, timeout=0.1, return_when=FIRST_EXCEPTION)
+                _drain(progress_queue, progress)
+                if cancel_token is not None and cancel_token.cancelled:
+                    cancel_event.set()
+                for future in finished:
+                    if future.exception() is not None:
+                        cancel_event.set()  # stop the other segments
+                    else:
+                        segment_done(futures[future])
+            for future in futures:
+                future.result()  # re-raise RenderCancelled or a worker error
+        _drain(progress_queue, progress)
+    return True
@@ -1,14 +1,23 @@
-import os, stat, shutil
+import os
 import sys
-import subprocess
 from pathlib import Path
 import time
-import math
-import json
 import datetime
+import logging
 import cv2
 import numpy as np
 from kivy.clock import Clock
+from renderCache import RenderCache, render_key, CACHE_DIR_NAME
+from sketchPlan import get_sketch_plan, threshold_image, plan_cells, DEFAULT_CELLS
+from sketchPreprocess import DEFAULT_SETTINGS
+from imageIngest import probe_image, image_size
+from splitAdvisor import common_divisors, advise_split_lens
+from sketchMetrics import SketchMetrics, recording, stage, count, logger
+from renderJobs import RenderCancelled
+from renderContext import RenderContext
+from renderCheckpoint import RenderCheckpoint
+from renditions import plan_renditions, open_encoders, FanoutWriter, h264_available
+from maskPlanner import load_mask_shapes, plan_masked_objects, rasterize_shape, mask_bbox
 
 # global variables
 if getattr(sys, 'frozen', False):
@@ -21,27 +30,24 @@ images_path = os.path.join(base_path, 'data', 'images')
 hand_path = os.path.join(images_path, 'drawing-hand.png')
 hand_mask_path = os.path.join(images_path, 'hand-mask.png')
 save_path = os.path.join(base_path, "save_videos")
-platform = "linux"
+# bump whenever a change alters the rendered video, so cached renders are not reused
+SKETCH_ENGINE_VERSION = "2"
 
 ## All functions
-def euc_dist(arr1, point):
-    square_sub = (arr1 - point) ** 2
-    return np.sqrt(np.sum(square_sub, axis=1))
-
 def preprocess_image(img, variables):
+    ctx = variables.context
     #img = cv2.imread(img_path)
-    img_ht, img_wd = img.shape[0], img.shape[1]
-    img = cv2.resize(img, (variables.resize_wd, variables.resize_ht))
-    img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-
-    # color histogram equilization
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(3, 3))
-    cl1 = clahe.apply(img_gray)
+    # img may be None when image_path is set, the plan cache then decodes the
+    # file itself (at a reduced size when possible), so use the file's size
+    if ctx.source_size is not None:
+        img_wd, img_ht = ctx.source_size
+    else:
+        img_ht, img_wd = img.shape[0], img.shape[1]
 
-    # gaussian adaptive thresholding
-    img_thresh = cv2.adaptiveThreshold(
-        img_gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 15, 10
-    )
+    # resize, grayscale, optional clahe and thresholding, shared with the
+    # SVG mode and cached per image file when its path is known
+    with stage("preprocess"):
+        plan, img, img_gray, img_thresh = _preprocess_plan(img, variables)
 
     # adding all the computed required items in variables object
     variables.img_ht = img_ht
@@ -49,8 +55,25 @@ def preprocess_image(img, variables):
     variables.img_gray = img_gray
     variables.img_thresh = img_thresh
     variables.img = img
+    variables.plan = plan
     return variables
 
+def _preprocess_plan(img, variables):
+    ctx = variables.context
+    if ctx.image_path is not None:
+        plan = get_sketch_plan(
+            ctx.image_path, ctx.resize_wd, ctx.resize_ht,
+            ctx.split_len, image_bgr=img, settings=ctx.preprocess_settings,
+            cell_settings=ctx.cell_settings
+        )
+        img, img_gray, img_thresh = plan.img, plan.img_gray, plan.img_thresh
+    else:
+        plan = None
+        img, img_gray, img_thresh = threshold_image(
+            img, ctx.resize_wd, ctx.resize_ht, settings=ctx.preprocess_settings
+        )
+    return plan, img, img_gray, img_thresh
+
 
 def preprocess_hand_image(hand_path, hand_mask_path, variables):
     hand = cv2.imread(hand_path)
@@ -164,95 +187,113 @@ def draw_hand_on_img(
 
 
 def draw_masked_object(
-    variables, object_mask=None, skip_rate=5, black_pixel_threshold=10
+    variables, object_mask=None, skip_rate=5, black_pixel_threshold=10, cell_rects=None, object_bbox=None,
+    split_len=None
 ):
     """
     skip_rate is not provided via variables because this function does not
-    know it is drawing object or background or an entire image
+    know it is drawing object or background or an entire image.
+    cell_rects: optional precomputed plan in image coordinates (e.g. from
+        maskPlanner), skips planning
+    object_bbox: (y0, x0, y1, x1) box of the object on the split_len grid, when
+        given object_mask is cropped to it; otherwise object_mask is a
+        full-frame mask and the box is computed here
+    split_len: grid size of this pass, the context's split_len when None
+        (e.g. a coarser grid for the background)
     """
-    print("Skip Rate: ", skip_rate)
-    # if there is object mask, then the img_thresh will only correspond to the mask provided
-    img_thresh_copy = variables.img_thresh.copy()
+    ctx = variables.context
+    split_len = split_len or ctx.split_len
+    logger.debug("skip rate: %s", skip_rate)
+    # with an object mask, work on the object's bounding box only: the
+    # threshold copy, the mask and the final paste all scale with the object
+    y0, x0 = 0, 0
+    y1, x1 = ctx.resize_ht, ctx.resize_wd
+    img_thresh_copy = variables.img_thresh
     if object_mask is not None:
-        # get the object and its background indices
-        object_mask_black_ind = np.where(object_mask == 0)
-        object_ind = np.where(object_mask == 255)
+        if object_bbox is None:
+            object_bbox = mask_bbox(object_mask, split_len)
+            if object_bbox is None:
+                logger.debug("empty object mask, nothing to draw")
+                return
+            object_mask = object_mask[object_bbox[0]:object_bbox[2], object_bbox[1]:object_bbox[3]]
+        y0, x0, y1, x1 = object_bbox
+        object_roi = object_mask == 255
 
         # make area other than object white
-        img_thresh_copy[object_mask_black_ind] = 255
-
-    selected_ind = 0
-    n_cuts_vertical = int(math.ceil(variables.resize_ht / variables.split_len))
-    n_cuts_horizontal = int(math.ceil(variables.resize_wd / variables.split_len))
-
-    # cut the image into grids
-    grid_of_cuts = np.array(np.split(img_thresh_copy, n_cuts_horizontal, axis=-1))
-    grid_of_cuts = np.array(np.split(grid_of_cuts, n_cuts_vertical, axis=-2))
-    print(grid_of_cuts.shape)
-
-    # find grids where there is atleast one black pixel
-    # as only these grids will be drawn
-    cut_having_black = (grid_of_cuts < black_pixel_threshold) * 1
-    cut_having_black = np.sum(np.sum(cut_having_black, axis=-1), axis=-1)
-    cut_black_indices = np.array(np.where(cut_having_black > 0)).T
-
+        img_thresh_copy = variables.img_thresh[y0:y1, x0:x1].copy()
+        img_thresh_copy[~object_roi] = 255
+
+    # cells having atleast one black pixel as (y0, x0, y1, x1) rects in drawing
+    # order; the whole-image plan comes from the shared cache when it matches
+    plan = variables.plan
+    if cell_rects is not None:
+        cell_rects = np.asarray(cell_rects)
+    elif (object_mask is None and plan is not None and plan.split_len == split_len
+            and plan.cell_settings == ctx.cell_settings):
+        cell_rects = plan.rects
+    else:
+        cell_rects = plan_cells(
+            img_thresh_copy, split_len, ctx.cell_settings,
+            black_pixel_threshold=black_pixel_threshold
+        ) + (y0, x0, y0, x0)
+    logger.debug("cells to draw: %d", len(cell_rects))
+    count("inked_cells", len(cell_rects))
+    cancel_token = ctx.cancel_token
+    progress = ctx.progress
+    if progress is not None:
+        progress.expect(max(len(cell_rects) - 1, 0) // skip_rate)
+
+    # the walk stops with one cell left, the final full image covers it
+    n_cells = len(cell_rects) - 1
     counter = 0
-    while len(cut_black_indices) > 1:
-        selected_ind_val = cut_black_indices[selected_ind].copy()
-        range_v_start = selected_ind_val[0] * variables.split_len
-        range_v_end = range_v_start + variables.split_len
-        range_h_start = selected_ind_val[1] * variables.split_len
-        range_h_end = range_h_start + variables.split_len
-
-        temp_drawing = np.zeros((variables.split_len, variables.split_len, 3))
-        temp_drawing[:, :, 0] = grid_of_cuts[selected_ind_val[0]][selected_ind_val[1]]
-        temp_drawing[:, :, 1] = grid_of_cuts[selected_ind_val[0]][selected_ind_val[1]]
-        temp_drawing[:, :, 2] = grid_of_cuts[selected_ind_val[0]][selected_ind_val[1]]
-
-        variables.drawn_frame[range_v_start:range_v_end, range_h_start:range_h_end] = (
-            temp_drawing
-        )
-
-        hand_coord_x = range_h_start + int(variables.split_len / 2)
-        hand_coord_y = range_v_start + int(variables.split_len / 2)
-        drawn_frame_with_hand = draw_hand_on_img(
-            variables.drawn_frame.copy(),
-            variables.hand.copy(),
-            hand_coord_x,
-            hand_coord_y,
-            variables.hand_mask_inv.copy(),
-            variables.hand_ht,
-            variables.hand_wd,
-            variables.resize_ht,
-            variables.resize_wd,
-        )
-
-        # delete the selected ind from the d_array
-        cut_black_indices[selected_ind] = cut_black_indices[-1]
-        cut_black_indices = cut_black_indices[:-1]
-
-        del selected_ind
+    log_progress = logger.isEnabledFor(logging.DEBUG)
+    with stage("composite"):
+        for range_v_start, range_h_start, range_v_end, range_h_end in cell_rects[:n_cells]:
+            variables.drawn_frame[range_v_start:range_v_end, range_h_start:range_h_end] = (
+                img_thresh_copy[range_v_start - y0:range_v_end - y0, range_h_start - x0:range_h_end - x0, np.newaxis]
+            )
 
-        # select the next new index
-        euc_arr = euc_dist(cut_black_indices, selected_ind_val)
-        selected_ind = np.argmin(euc_arr)
+            hand_coord_x = range_h_start + (range_h_end - range_h_start) // 2
+            hand_coord_y = range_v_start + (range_v_end - range_v_start) // 2
+            drawn_frame_with_hand = draw_hand_on_img(
+                variables.drawn_frame.copy(),
+                variables.hand.copy(),
+                hand_coord_x,
+                hand_coord_y,
+                variables.hand_mask_inv.copy(),
+                variables.hand_ht,
+                variables.hand_wd,
+                ctx.resize_ht,
+                ctx.resize_wd,
+            )
 
-        counter += 1
-        if counter % skip_rate == 0:
-            variables.video_object.write(drawn_frame_with_hand)
+            counter += 1
+            if counter % skip_rate == 0:
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+                with stage("encode"):
+                    variables.video_object.write(drawn_frame_with_hand)
+                count("frames")
+                if progress is not None:
+                    progress.advance()
 
-        if counter % 40 == 0:
-            print("len of black indices: ", len(cut_black_indices))
+            if log_progress and counter % 40 == 0:
+                logger.debug("len of black indices: %d", n_cells + 1 - counter)
 
     if object_mask is not None:
-        variables.drawn_frame[:, :, :][object_ind] = variables.img[object_ind]
+        variables.drawn_frame[y0:y1, x0:x1][object_roi] = variables.img[y0:y1, x0:x1][object_roi]
     else:
         variables.drawn_frame[:, :, :] = variables.img
 
 
 def draw_whiteboard_animations(
-    img, mask_path, hand_path, hand_mask_path, save_video_path, variables
+    img, mask_path, hand_path, hand_mask_path, save_video_path, variables, rendition_paths=None
 ):
+    """
+    Draw the sketch video of img to save_video_path; rendition_paths are
+    the H.264 outputs of ctx.renditions, encoded from the same frames.
+    """
+    ctx = variables.context
     if mask_path is not None:
         object_mask_exists = True
     else:
@@ -269,165 +310,244 @@ def draw_whiteboard_animations(
 
     # calculate how much time it takes to make video for 1 image
     start_time = time.time()
+    end_frames = ctx.frame_rate * ctx.end_gray_img_duration_in_sec
+    if ctx.cancel_token is not None:
+        ctx.cancel_token.raise_if_cancelled()
+    if ctx.progress is not None:
+        # the drawing passes add their frames once their cells are known
+        ctx.progress.start_stage("drawing", end_frames)
 
     # defining the video object
-    print(f"Selected platform in sketch api: {platform}")
-    if platform == "android":
-        fourcc = cv2.VideoWriter_fourcc(*"MJPG") #mpg2 or h264 or MJPG
-    else:
-        fourcc = cv2.VideoWriter_fourcc(*"mp4v") #mp4v
+    logger.debug("selected platform: %s", ctx.platform)
     variables.video_object = cv2.VideoWriter(
         save_video_path,
-        fourcc,
-        variables.frame_rate,
-        (variables.resize_wd, variables.resize_ht),
+        ctx.fourcc(),
+        ctx.frame_rate,
+        (ctx.resize_wd, ctx.resize_ht),
     )
+    if ctx.renditions:
+        # the lower resolutions are downsized and encoded in their own threads
+        variables.video_object = FanoutWriter(variables.video_object, open_encoders(
+            zip(ctx.renditions, rendition_paths), ctx.frame_rate
+        ))
 
     # creating an emtpy frame and select 0th index as the starting point to draw
     variables.drawn_frame = np.zeros(variables.img.shape, np.uint8) + np.array(
         [255, 255, 255], np.uint8
     )
 
-    if object_mask_exists:
+    # a larger grid for the background part, by which the area covered in one
+    # loop iteration will be much larger; quadtree cells already grow large
+    # over sparse background
+    bg_split_len = 20 if ctx.cell_settings.mode == "grid" else ctx.split_len
+    if object_mask_exists and ctx.mask_planning == "parallel":
+        # plan all objects and the background at once, then draw in shape order
+        with stage("plan_objects"):
+            objects, background_mask, background_rects = plan_masked_objects(
+                variables.img_thresh, load_mask_shapes(mask_path),
+                (variables.img_wd, variables.img_ht), ctx.split_len, bg_split_len,
+                ctx.cell_settings,
+            )
+        for bbox, mask_roi, rects in objects:
+            draw_masked_object(
+                variables=variables,
+                object_mask=mask_roi,
+                skip_rate=ctx.object_skip_rate,
+                cell_rects=rects,
+                object_bbox=bbox,
+            )
 
-        # reading the object masks
-        with open(mask_path) as file:
-            object_masks = json.load(file)
+        logger.info("drawing the background region")
+        draw_masked_object(
+            variables=variables,
+            object_mask=background_mask,
+            skip_rate=ctx.bg_object_skip_rate,
+            cell_rects=background_rects,
+            split_len=bg_split_len,
+        )
+    elif object_mask_exists:
 
         background_mask = (
-            np.zeros((variables.resize_ht, variables.resize_wd), dtype=np.uint8) + 255
+            np.zeros((ctx.resize_ht, ctx.resize_wd), dtype=np.uint8) + 255
         )
-
-        for object in object_masks["shapes"]:
-            # Create an empty mask array
-            object_mask = np.zeros((variables.img_ht, variables.img_wd), dtype=np.uint8)
-
-            # Get the object points as a list of tuples
-            object_points = np.array(object["points"], dtype=np.int32)
-            object_points = np.expand_dims(object_points, axis=0)
-
-            # Fill the polygon with white color (255) on the mask array using cv2
-            cv2.fillPoly(object_mask, object_points, 255)
-
-            # resizing the object_mask
-            object_mask = cv2.resize(
-                object_mask, (variables.resize_wd, variables.resize_ht)
+        scale_x = ctx.resize_wd / variables.img_wd
+        scale_y = ctx.resize_ht / variables.img_ht
+
+        for object_points in load_mask_shapes(mask_path):
+            # rasterise the polygon at the target resolution, only inside its bounding box
+            bbox, mask_roi = rasterize_shape(
+                object_points, scale_x, scale_y, ctx.split_len,
+                ctx.resize_wd, ctx.resize_ht,
             )
-
-            # get the object and its background indices
-            object_ind = np.where(object_mask == 255)
+            if bbox is None:
+                continue
+            y0, x0, y1, x1 = bbox
 
             # remove the object from backgrond mask
-            background_mask[object_ind] = 0
+            background_mask[y0:y1, x0:x1][mask_roi == 255] = 0
 
             # create animation for the selected object
             draw_masked_object(
                 variables=variables,
-                object_mask=object_mask,
-                skip_rate=variables.object_skip_rate,
+                object_mask=mask_roi,
+                skip_rate=ctx.object_skip_rate,
+                object_bbox=bbox,
             )
 
         # now draw the last remaing background part
-        """
-        # update the split len for background part by which the 
-        # area covered in one loop iteration will be much larger
-        """
-        # Optional:
-        print("Drawing the blakground region..")
-        variables.split_len = 20
+        logger.info("drawing the background region")
         draw_masked_object(
             variables=variables,
             object_mask=background_mask,
-            skip_rate=variables.bg_object_skip_rate,
+            skip_rate=ctx.bg_object_skip_rate,
+            split_len=bg_split_len,
         )
     else:
-        #variables.split_len = 15
-        #variables.object_skip_rate = 8
         # draw the entire image without any mask
         draw_masked_object(
             variables=variables,
-            skip_rate=variables.object_skip_rate,
+            skip_rate=ctx.object_skip_rate,
         )
 
     # Ending the video with original original image
-    for i in range(variables.frame_rate * variables.end_gray_img_duration_in_sec):
-        variables.video_object.write(variables.img)
+    with stage("encode"):
+        for i in range(end_frames):
+            if ctx.cancel_token is not None:
+                ctx.cancel_token.raise_if_cancelled()
+            variables.video_object.write(variables.img)
+            if ctx.progress is not None:
+                ctx.progress.advance()
+    count("frames", end_frames)
+    if ctx.progress is not None:
+        ctx.progress.finish()
 
     # Calculating the total execution time
     end_time = time.time()
-    print("total time: ", end_time - start_time)
+    logger.info("total time: %.2fs", end_time - start_time)
 
     # closing the video object
     variables.video_object.release()
 
+def plan_draw_passes(variables, mask_path=None):
+    """
+    Cell plans of all drawing passes, as draw_whiteboard_animations draws
+    them: one pass for the whole image, or one per mask object then the
+    background. variables must be preprocessed.
+
+    Returns:
+        list of segmentEncoder.DrawPass
+    """
+    from segmentEncoder import DrawPass
+    ctx = variables.context
+    if mask_path is None:
+        plan = variables.plan
+        if plan is not None and plan.split_len == ctx.split_len and plan.cell_settings == ctx.cell_settings:
+            rects = plan.rects
+        else:
+            rects = plan_cells(variables.img_thresh, ctx.split_len, ctx.cell_settings)
+        return [DrawPass(rects, ctx.object_skip_rate, None, None)]
+
+    bg_split_len = 20 if ctx.cell_settings.mode == "grid" else ctx.split_len
+    with stage("plan_objects"):
+        objects, background_mask, background_rects = plan_masked_objects(
+            variables.img_thresh, load_mask_shapes(mask_path),
+            (variables.img_wd, variables.img_ht), ctx.split_len, bg_split_len,
+            ctx.cell_settings,
+        )
+    passes = [DrawPass(rects, ctx.object_skip_rate, bbox, mask_roi) for bbox, mask_roi, rects in objects]
+    bbox = mask_bbox(background_mask, bg_split_len)
+    if bbox is not None:
+        y0, x0, y1, x1 = bbox
+        passes.append(DrawPass(
+            background_rects, ctx.bg_object_skip_rate, bbox, background_mask[y0:y1, x0:x1]
+        ))
+    return passes
+
+
+def draw_whiteboard_segmented(img, mask_path, hand_path, hand_mask_path, dest_video_path, variables,
+                              checkpoint=None, render_args=None, rendition_paths=None):
+    """
+    Same video as draw_whiteboard_animations, rendered in ctx.encode_segments
+    parallel segments encoded straight to H.264 (no ffmpeg_convert pass).
+    checkpoint (renderCheckpoint.RenderCheckpoint) records the finished
+    segments, with render_args, so an interrupted render can resume.
+    rendition_paths are the outputs of ctx.renditions.
+
+    Returns:
+        Number of frames written
+    """
+    from segmentEncoder import encode_segmented
+    ctx = variables.context
+    variables = preprocess_image(img=img, variables=variables)
+    variables = preprocess_hand_image(
+        hand_path=hand_path, hand_mask_path=hand_mask_path, variables=variables
+    )
+    if ctx.cancel_token is not None:
+        ctx.cancel_token.raise_if_cancelled()
+    start_time = time.time()
+    passes = plan_draw_passes(variables, mask_path)
+    end_frames = ctx.frame_rate * ctx.end_gray_img_duration_in_sec
+    with stage("encode"):
+        n_frames = encode_segmented(
+            dest_video_path, passes, end_frames, variables.img, variables.img_thresh,
+            (variables.hand, variables.hand_mask_inv, variables.hand_ht, variables.hand_wd),
+            ctx.frame_rate, segments=ctx.encode_segments,
+            cancel_token=ctx.cancel_token, progress=ctx.progress,
+            segment_frames=ctx.segment_frames, checkpoint=checkpoint, render_args=render_args,
+            renditions=list(zip(ctx.renditions, rendition_paths or ())),
+        )
+    count("frames", n_frames)
+    count("inked_cells", sum(len(draw_pass.rects) for draw_pass in passes))
+    logger.info("total time (%s segments): %.2fs", ctx.encode_segments, time.time() - start_time)
+    return n_frames
+
 def find_nearest_res(given):
     arr = np.array([640, 360, 480, 1280, 720, 1920, 1080, 2560, 1440, 3840, 2160, 7680, 4320])
     idx = (np.abs(arr - given)).argmin()  # Find index of minimum difference
     return arr[idx]
 
+def get_target_res(img_wd, img_ht):
+    """ Nearest standard video resolution (width, height) keeping the image aspect ratio """
+    aspect_ratio = img_wd / img_ht
+    img_ht = find_nearest_res(img_ht)
+    new_aspect_wd = int(img_ht * aspect_ratio)
+    img_wd = find_nearest_res(new_aspect_wd)
+    return int(img_wd), int(img_ht)
+
 class AllVariables:
-    def __init__(
-        self,
-        frame_rate=None,
-        resize_wd=None,
-        resize_ht=None,
-        split_len=None,
-        object_skip_rate=None,
-        bg_object_skip_rate=None,
-        end_gray_img_duration_in_sec=None,
-    ):
-        self.frame_rate = frame_rate
-        self.resize_wd = resize_wd
-        self.resize_ht = resize_ht
-        self.split_len = split_len
-        self.object_skip_rate = object_skip_rate
-        self.bg_object_skip_rate = bg_object_skip_rate
-        self.end_gray_img_duration_in_sec = end_gray_img_duration_in_sec
-
-def common_divisors(num1, num2):
     """
-    Finds all common divisors of two numbers, stores them in a list,
-    and returns the list sorted in ascending order.
+    Working state of one render: the preprocessed images, the hand, the
+    frame being drawn and the video writer. The settings live in the
+    immutable context (a renderContext.RenderContext); keyword arguments
+    build one when no context is given.
     """
-    divisors1 = []
-    divisors2 = []
-    common_divs = []
-
-    # Find divisors of num1
-    for i in range(1, num1 + 1):
-        if num1 % i == 0:
-            divisors1.append(i)
-
-    # Find divisors of num2
-    for i in range(1, num2 + 1):
-        if num2 % i == 0:
-            divisors2.append(i)
-
-    # Find common divisors
-    for divisor in divisors1:
-        if divisor in divisors2:
-            common_divs.append(divisor)
-
-    common_divs.sort()  # Sort the list in ascending order
-    return common_divs
+    def __init__(self, context=None, **settings):
+        self.context = context if context is not None else RenderContext(**settings)
 
-
-def ffmpeg_convert(source_vid, dest_vid, platform="linux"):
+def ffmpeg_convert(source_vid, dest_vid, platform="linux", cancel_token=None, progress=None):
+    """
+    Re-encode the raw OpenCV video to H.264.
+    cancel_token / progress: optional renderJobs objects, checked / advanced per frame;
+    a failed or cancelled conversion removes dest_vid; a cancelled one
+    raises RenderCancelled, a failed one returns False
+    """
     ff_stat = False
+    input_container = None
+    output_container = None
     try:
         import av
         # ---> diagnostic code
-        print("PyAV:", av.__version__)
-        print("FFmpeg:", av.library_versions)
+        logger.debug("PyAV: %s", av.__version__)
+        logger.debug("FFmpeg: %s", av.library_versions)
         # <--- diag end
 
         src_path = Path(source_vid)
         input_container = av.open(src_path, mode="r")
         output_container = av.open(dest_vid, mode="w")
         # ---> diagnostic code
-        print("Format:", input_container.format.name)
+        logger.debug("format: %s", input_container.format.name)
         for s in input_container.streams:
-            print("Stream:", s.type, s.codec_context.name)
+            logger.debug("stream: %s %s", s.type, s.codec_context.name)
         # <--- diag end
         in_stream = input_container.streams.video[0]
         width = in_stream.codec_context.width
@@ -440,106 +560,292 @@ def ffmpeg_convert(source_vid, dest_vid, platform="linux"):
         out_stream.pix_fmt = "yuv420p"
         # Better quality control
         out_stream.options = {"crf": "20"}  # adjust between 18–23
+        if progress is not None:
+            progress.start_stage("converting", in_stream.frames)
         for frame in input_container.decode(video=0):
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
             packet = out_stream.encode(frame)
             if packet:
                 output_container.mux(packet)
+            if progress is not None:
+                progress.advance()
         packet = out_stream.encode(None)
         if packet:
             output_container.mux(packet)
         output_container.close()
         input_container.close()
 
-        print(f"ffmpeg convert success, converted file: {dest_vid}")
+        logger.info("ffmpeg convert success, converted file: %s", dest_vid)
         ff_stat = True
+        if progress is not None:
+            progress.finish()
+    except RenderCancelled:
+        _discard_conversion(dest_vid, input_container, output_container)
+        raise
     except Exception as e:
-        print(f"ffmpeg convert error: {e}")
+        logger.warning("ffmpeg convert error: %s", e)
+        _discard_conversion(dest_vid, input_container, output_container)
     return ff_stat
 
-def initiate_sketch(image_path, split_len, frame_rate, object_skip_rate, bg_object_skip_rate, main_img_duration, callback, save_path=save_path, which_platform="linux"):
-    global platform
-    platform = which_platform
-    final_result = {"status": False, "message": "Initial load"}
-    try:
-        image_bgr = cv2.imread(image_path)
-        mask_path = None # To be added later
-        # video save path
-        now = datetime.datetime.now()
-        current_time = str(now.strftime("%H%M%S"))
-        current_date = str(now.strftime("%Y%m%d"))
-        if platform == "android":
-            video_save_name = f"vid_{current_date}_{current_time}.avi" #mpg
-        else:
-            video_save_name = f"vid_{current_date}_{current_time}.mp4" #mp4
-        save_video_path = os.path.join(save_path, video_save_name)
-        ffmpeg_file_name = f"vid_{current_date}_{current_time}_h264.mp4"
-        ffmpeg_video_path = os.path.join(save_path, ffmpeg_file_name)
-        os.makedirs(os.path.dirname(save_video_path), exist_ok=True)
-        print("save_video_path: ", save_video_path)
-
-        # Get image width & height. If the resolution is not standard & split length is not a common divisor, get the nearest standard res
-        img_ht, img_wd = image_bgr.shape[0], image_bgr.shape[1]
-        aspect_ratio = img_wd / img_ht
-        img_ht = find_nearest_res(img_ht)
-        new_aspect_wd = int(img_ht * aspect_ratio)
-        img_wd = find_nearest_res(new_aspect_wd)
-        print(f"Target width: {img_wd} x height: {img_ht}")
-
-        # constants and variables object
-        variables = AllVariables(
-            frame_rate = frame_rate,  # frame rate for the output video
-            resize_wd = img_wd,  # output video width
-            resize_ht = img_ht,  # output video height
-            split_len = split_len,  # the image is devided into grids. When split_len = 10, the image is devided as: img_ht/10, img_wd/10
-            object_skip_rate = object_skip_rate,  # when drawing, 8 pixels colored will be saved together in the video
-            # increase this number to make the video runtime smaller (draws faster)
-            bg_object_skip_rate = bg_object_skip_rate,  # assuming background region is larger, hence increasing the skip rate
-            end_gray_img_duration_in_sec = main_img_duration,  # the last few secs of the video, for every image will have the entire original image shown as is
-        )
-
-        # invoking the drawing function
+def _discard_conversion(dest_vid, input_container, output_container):
+    """Close the containers of an unfinished conversion and remove its output."""
+    for container in (output_container, input_container):
+        if container is not None:
+            try:
+                container.close()
+            except Exception as e:
+                logger.warning("ffmpeg convert: error while closing %s: %s", container.name, e)
+    if os.path.exists(dest_vid):
+        os.unlink(dest_vid)
+
+def initiate_sketch(image_path, split_len, frame_rate, object_skip_rate, bg_object_skip_rate, main_img_duration, callback, save_path=save_path, which_platform="linux", use_cache=True, preprocess_settings=None, cell_settings=None, metrics_path=None, cancel_token=None, progress=None, encode_segments=1, checkpoint_seconds=None, renditions=None):
+    """
+    Render the sketch video of an image and call callback (on the main
+    thread) with {"status", "message"}, message being the video path.
+    encode_segments > 1 renders and encodes that many timeline segments in
+    parallel processes (None: one per core) and joins them without re-encoding.
+    checkpoint_seconds cuts that video into parts of as many seconds and
+    records each finished part, so a render interrupted by the app being
+    killed resumes where it stopped when requested again (see
+    renderCheckpoint.pending_renders).
+    renditions: optional heights (e.g. [720, 480]) below the render
+    resolution also encoded from the same frames; their paths are returned
+    under 'renditions' ({"720p": path, ...}, the render resolution included).
+    """
+    # stage timings and counters, returned under 'metrics' and optionally
+    # appended to metrics_path as one JSON line per render
+    metrics = SketchMetrics()
+
+    def finish(final_result):
+        final_result["metrics"] = metrics.to_dict()
+        if metrics_path is not None:
+            try:
+                metrics.write_jsonl(
+                    metrics_path, image_path=image_path, split_len=split_len,
+                    status=final_result["status"], message=final_result["message"],
+                )
+            except OSError as e:
+                logger.warning("error while writing metrics: %s", e)
+        Clock.schedule_once(lambda dt: callback(final_result))
+
+    with recording(metrics):
+        final_result = {"status": False, "message": "Initial load"}
         try:
-            draw_whiteboard_animations(
-                image_bgr, mask_path, hand_path, hand_mask_path, save_video_path, variables
-            )
-            ff_stat = ffmpeg_convert(source_vid=save_video_path, dest_vid=ffmpeg_video_path, platform=platform)
-            if ff_stat:
-                final_result = {"status": True, "message": f"{ffmpeg_video_path}"}
-                os.unlink(save_video_path)
-                print(f"removed raw video: {save_video_path}")
+            # only the header is read here, the pixels are decoded once the target size is known
+            image_info = probe_image(image_path)
+            mask_path = None # To be added later
+            # video save path
+            now = datetime.datetime.now()
+            current_time = str(now.strftime("%H%M%S_%f"))
+            current_date = str(now.strftime("%Y%m%d"))
+            video_save_base = os.path.join(save_path, f"vid_{current_date}_{current_time}")
+            ffmpeg_video_path = f"{video_save_base}_h264.mp4"
+            os.makedirs(save_path, exist_ok=True)
+
+            # segments, checkpoints and renditions are encoded with PyAV only,
+            # without it render one stream through the OpenCV writer
+            if (encode_segments != 1 or checkpoint_seconds is not None or renditions) and not h264_available():
+                logger.warning("no H.264 encoder, rendering a single stream without checkpoints or renditions")
+                encode_segments, checkpoint_seconds, renditions = 1, None, None
+
+            # Get image width & height. If the resolution is not standard & split length is not a common divisor, get the nearest standard res
+            if image_info is not None:
+                image_bgr = None
+                source_size = (image_info.width, image_info.height)
             else:
-                final_result = {"status": True, "message": f"{save_video_path}"}
+                with stage("decode"):
+                    image_bgr = cv2.imread(image_path)
+                source_size = (image_bgr.shape[1], image_bgr.shape[0])
+            img_wd, img_ht = get_target_res(*source_size)
+            logger.info("target width: %d x height: %d", img_wd, img_ht)
+            rendition_specs = plan_renditions(img_wd, img_ht, renditions)
+            rendition_paths = [f"{video_save_base}_{rendition.label}.mp4" for rendition in rendition_specs]
+
+            # the key of a render identifies it in the cache and its checkpoint
+            render_cache = None
+            cache_key = None
+            if use_cache or checkpoint_seconds is not None:
+                render_params = {
+                    "split_len": split_len,
+                    "frame_rate": frame_rate,
+                    "object_skip_rate": object_skip_rate,
+                    "bg_object_skip_rate": bg_object_skip_rate,
+                    "main_img_duration": main_img_duration,
+                    "resolution": [int(img_wd), int(img_ht)],
+                    "platform": which_platform,
+                    "preprocess": preprocess_settings or DEFAULT_SETTINGS,
+                    "cells": cell_settings or DEFAULT_CELLS,
+                }
+                # segmented videos are encoded differently (no B-frames, a
+                # keyframe per segment); cut by length they do not depend on
+                # the worker count
+                if checkpoint_seconds is not None:
+                    render_params["checkpoint_seconds"] = checkpoint_seconds
+                elif encode_segments != 1:
+                    render_params["encode_segments"] = encode_segments
+                if rendition_specs:
+                    render_params["renditions"] = [rendition.label for rendition in rendition_specs]
+                cache_key = render_key(image_path, render_params, SKETCH_ENGINE_VERSION)
+
+            # reuse an identical earlier render if there is one, the cache
+            # keeps a single video so it is not used for renditions
+            if use_cache and not rendition_specs:
+                render_cache = RenderCache(os.path.join(save_path, CACHE_DIR_NAME))
+                cached_video_path = render_cache.lookup(cache_key, os.path.splitext(ffmpeg_video_path)[0])
+                if cached_video_path is not None:
+                    logger.info("render cache hit: %s", cached_video_path)
+                    final_result = {"status": True, "message": f"{cached_video_path}"}
+                    finish(final_result)
+                    return
+
+            # settings of this render, immutable and passed to every stage
+            context = RenderContext(
+                frame_rate = frame_rate,  # frame rate for the output video
+                resize_wd = img_wd,  # output video width
+                resize_ht = img_ht,  # output video height
+                split_len = split_len,  # the image is devided into grids. When split_len = 10, the image is devided as: img_ht/10, img_wd/10
+                object_skip_rate = object_skip_rate,  # when drawing, 8 pixels colored will be saved together in the video
+                # increase this number to make the video runtime smaller (draws faster)
+                bg_object_skip_rate = bg_object_skip_rate,  # assuming background region is larger, hence increasing the skip rate
+                end_gray_img_duration_in_sec = main_img_duration,  # the last few secs of the video, for every image will have the entire original image shown as is
+                image_path = image_path,  # lets the preprocessing and cell plan be reused across renders
+                preprocess_settings = preprocess_settings,  # threshold method, None for the default adaptive threshold
+                source_size = source_size,  # (width, height) of the image file, the decoded image may be reduced
+                cell_settings = cell_settings,  # None for the uniform split_len grid
+                cancel_token = cancel_token,  # renderJobs.CancelToken, lets the UI abort between frames
+                progress = progress,  # renderJobs.ProgressReporter, frames / percent / ETA events
+                platform = which_platform,  # picks the raw video codec
+                encode_segments = encode_segments,  # 1: one stream, more: parallel segments
+                checkpoint_seconds = checkpoint_seconds,  # None, or seconds per resumable segment
+                renditions = rendition_specs,  # lower resolutions encoded from the same frames
+            )
+            variables = AllVariables(context)
+            save_video_path = video_save_base + context.raw_video_ext  # mp4, avi on android
+            logger.debug("save_video_path: %s", save_video_path)
+
+            def discard_partial_render():
+                # close the writer and rendition encoders of a render that did
+                # not finish and drop their files; the converted video is
+                # removed by ffmpeg_convert, segments by encode_segmented
+                video_object = getattr(variables, "video_object", None)
+                if isinstance(video_object, FanoutWriter):
+                    video_object.abort()
+                elif video_object is not None:
+                    video_object.release()
+                for path in [save_video_path] + rendition_paths:
+                    if os.path.exists(path):
+                        os.unlink(path)
+
+            # invoking the drawing function
+            rendered = False
+            try:
+                if context.segmented:
+                    # segments are encoded to H.264 directly, no raw video or conversion
+                    checkpoint = None
+                    if checkpoint_seconds is not None:
+                        checkpoint = RenderCheckpoint(save_path, cache_key)
+                    draw_whiteboard_segmented(
+                        image_bgr, mask_path, hand_path, hand_mask_path, ffmpeg_video_path, variables,
+                        checkpoint=checkpoint,
+                        render_args=dict(
+                            image_path=image_path, split_len=split_len, frame_rate=frame_rate,
+                            object_skip_rate=object_skip_rate, bg_object_skip_rate=bg_object_skip_rate,
+                            main_img_duration=main_img_duration, which_platform=which_platform,
+                            preprocess_settings=preprocess_settings, cell_settings=cell_settings,
+                            encode_segments=encode_segments, checkpoint_seconds=checkpoint_seconds,
+                            renditions=renditions,
+                        ),
+                        rendition_paths=rendition_paths,
+                    )
+                    final_result = {"status": True, "message": f"{ffmpeg_video_path}"}
+                    if rendition_specs:
+                        final_result["renditions"] = {f"{img_ht}p": ffmpeg_video_path, **dict(zip(
+                            (rendition.label for rendition in rendition_specs), rendition_paths
+                        ))}
+                    rendered = True
+                    if render_cache is not None:
+                        render_cache.store(cache_key, ffmpeg_video_path)
+                    finish(final_result)
+                    return
+                draw_whiteboard_animations(
+                    image_bgr, mask_path, hand_path, hand_mask_path, save_video_path, variables,
+                    rendition_paths=rendition_paths,
+                )
+                with stage("convert"):
+                    ff_stat = ffmpeg_convert(
+                        source_vid=save_video_path, dest_vid=ffmpeg_video_path, platform=context.platform,
+                        cancel_token=cancel_token, progress=progress,
+                    )
+                rendered = True
+                if ff_stat:
+                    final_result = {"status": True, "message": f"{ffmpeg_video_path}"}
+                    os.unlink(save_video_path)
+                    logger.debug("removed raw video: %s", save_video_path)
+                    if render_cache is not None:
+                        render_cache.store(cache_key, ffmpeg_video_path)
+                else:
+                    final_result = {"status": True, "message": f"{save_video_path}"}
+                if rendition_specs:
+                    final_result["renditions"] = {f"{img_ht}p": final_result["message"], **dict(zip(
+                        (rendition.label for rendition in rendition_specs), rendition_paths
+                    ))}
+            except RenderCancelled:
+                logger.info("render cancelled")
+                final_result = {"status": False, "message": "Render cancelled", "cancelled": True}
+            except Exception as e:
+                logger.error("render failed: %s", e)
+                final_result = {"status": False, "message": f"Error: {e}"}
+            finally:
+                if not rendered:
+                    discard_partial_render()
+
         except Exception as e:
-            print(f"Error: {e}")
+            logger.error("render failed: %s", e)
             final_result = {"status": False, "message": f"Error: {e}"}
-
-    except Exception as e:
-        print(f"Error: {e}")
-        final_result = {"status": False, "message": f"Error: {e}"}
-    Clock.schedule_once(lambda dt: callback(final_result))
+    finish(final_result)
 
 def get_split_lens(image_path):
     """ Get image width & height. If the resolution is not standard & split length is not a common divisor, get the nearest standard resolution """
     final_return = {"image_res": "None", "split_lens": []}
     hcf_list = []
     try:
-        image_bgr = cv2.imread(image_path)
-        #image_bgr = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-        img_ht, img_wd = image_bgr.shape[0], image_bgr.shape[1]
-        aspect_ratio = img_wd / img_ht
-        img_ht = find_nearest_res(img_ht)
-        new_aspect_wd = int(img_ht * aspect_ratio)
-        img_wd = find_nearest_res(new_aspect_wd)
+        # header only, no pixel decode on the UI thread
+        img_wd, img_ht = image_size(image_path)
+        img_wd, img_ht = get_target_res(img_wd, img_ht)
         hcf_list = common_divisors(img_ht, img_wd)
         filename = os.path.basename(image_path)
         final_return["split_lens"] = hcf_list
         final_return["image_res"] = f"{filename}, video resolution: {img_wd} x {img_ht}"
     except Exception as e:
-        print(f"Error while getting split len: {e}")
+        logger.warning("error while getting split len: %s", e)
     return final_return # list of split length
 
+def get_split_len_advice(image_path, frame_rate=25, object_skip_rate=8, main_img_duration=2, preprocess_settings=None):
+    """
+    Predict, for every split length of the image, the inked cells, frame count
+    and video duration (estimated from a downsampled threshold, no render).
+    Returns a dict with 'split_lens' and 'advice' (list of dicts with
+    split_len, cells, frames, duration)
+    """
+    final_return = {"split_lens": [], "advice": []}
+    try:
+        img_wd, img_ht = get_target_res(*image_size(image_path))
+        advice = advise_split_lens(
+            image_path, img_wd, img_ht,
+            frame_rate=frame_rate,
+            skip_rate=object_skip_rate,
+            end_duration=main_img_duration,
+            settings=preprocess_settings or DEFAULT_SETTINGS,
+        )
+        final_return["split_lens"] = [item["split_len"] for item in advice]
+        final_return["advice"] = advice
+    except Exception as e:
+        logger.warning("error while estimating split lens: %s", e)
+    return final_return
+
 
-def generate_svg_from_image_sketch(image_path, split_len=10, output_path=None):
+def generate_svg_from_image_sketch(image_path, split_len=10, output_path=None, as_geometry=False, preprocess_settings=None, cell_settings=None):
     """
     Generate an SVG file from an image using the same sketch algorithm.
     This integrates with kivg for SVG animation.
@@ -548,37 +854,66 @@ def generate_svg_from_image_sketch(image_path, split_len=10, output_path=None):
         image_path: Path to the input image
         split_len: Grid size for tracing (should match the animation speed)
         output_path: Optional output path for the SVG file
+        as_geometry: Return kivg geometry (ready for Kivg.draw) instead of an
+            SVG string. The SVG text is then only built when output_path is set.
+        preprocess_settings: Optional PreprocessSettings (threshold method),
+            defaults to the adaptive threshold used for videos
+        cell_settings: Optional CellSettings, defaults to the uniform split_len grid
         
     Returns:
         dict with 'status' (bool), 'message' (str with path or error), 'svg_string' (str)
+        and 'geometry' (kivg SvgGeometry or None)
     """
-    from svgGenerator import generate_svg_from_image, save_svg_file
+    from svgGenerator import (
+        generate_svg_from_image, generate_geometry_from_image,
+        create_svg_from_paths, save_svg_file
+    )
     
-    result = {"status": False, "message": "", "svg_string": ""}
+    result = {"status": False, "message": "", "svg_string": "", "geometry": None}
     
     try:
-        # Read and process image
-        image_bgr = cv2.imread(image_path)
-        if image_bgr is None:
+        # Read the image size from its header, the pixels are decoded
+        # (at a reduced size if possible) only on a plan cache miss
+        source_size = image_size(image_path)
+        if source_size is None:
             result["message"] = f"Failed to read image: {image_path}"
             return result
+        image_bgr = None
         
         # Calculate resize dimensions using the same logic as video generation
-        img_ht, img_wd = image_bgr.shape[0], image_bgr.shape[1]
-        aspect_ratio = img_wd / img_ht
-        img_ht = find_nearest_res(img_ht)
-        new_aspect_wd = int(img_ht * aspect_ratio)
-        img_wd = find_nearest_res(new_aspect_wd)
+        img_wd, img_ht = get_target_res(*source_size)
         
-        # Generate SVG
-        svg_string = generate_svg_from_image(
-            image_bgr,
-            split_len=split_len,
-            stroke_color="#000000",
-            stroke_width=2,
-            resize_wd=img_wd,
-            resize_ht=img_ht
-        )
+        if as_geometry:
+            # Build kivg geometry directly, the SVG text is an optional side output
+            geometry, path_points = generate_geometry_from_image(
+                image_bgr,
+                split_len=split_len,
+                resize_wd=img_wd,
+                resize_ht=img_ht,
+                image_path=image_path,
+                preprocess_settings=preprocess_settings,
+                cell_settings=cell_settings
+            )
+            result["geometry"] = geometry
+            svg_string = ""
+            if output_path:
+                svg_string = create_svg_from_paths(
+                    path_points, img_wd, img_ht,
+                    stroke_color="#000000", stroke_width=2
+                )
+        else:
+            # Generate SVG
+            svg_string = generate_svg_from_image(
+                image_bgr,
+                split_len=split_len,
+                stroke_color="#000000",
+                stroke_width=2,
+                resize_wd=img_wd,
+                resize_ht=img_ht,
+                image_path=image_path,
+                preprocess_settings=preprocess_settings,
+                cell_settings=cell_settings
+            )
         
         result["svg_string"] = svg_string
         
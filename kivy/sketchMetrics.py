@@ -0,0 +1,124 @@
+"""
+Stage timing and counters for the sketch pipeline.
+A SketchMetrics recorder is made active for the current thread with
+recording(); pipeline code wraps its work in stage("name") and count(...),
+which do nothing when no recorder is active. Stage times are exclusive:
+time spent in a nested stage is only counted for the inner one.
+"""
+import sys
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+logger = logging.getLogger("sketch")
+# quiet unless enabled: under Kivy the root logger is NOTSET, so without a
+# level every debug message of the hot loop would reach Kivy's log file.
+# logging.getLogger("sketch").setLevel(logging.DEBUG) shows everything.
+logger.setLevel(logging.WARNING)
+
+STAGES = ("decode", "preprocess", "grid", "ordering", "plan_objects", "composite", "encode", "convert")
+_NO_STAGE = nullcontext()
+_active = threading.local()
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB, None where unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class SketchMetrics:
+    """Wall time and call count per stage, plus named counters, of one render."""
+    def __init__(self):
+        self.stages = {}  # name -> [seconds, calls]
+        self.counters = {}
+        self._stack = []  # [name, start, time spent in nested stages]
+        self._start = time.perf_counter()
+
+    def begin(self, name):
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def end(self):
+        name, start, nested = self._stack.pop()
+        elapsed = time.perf_counter() - start
+        entry = self.stages.setdefault(name, [0.0, 0])
+        entry[0] += elapsed - nested
+        entry[1] += 1
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def to_dict(self):
+        """
+        Returns:
+            dict with 'stages' (name -> {'seconds', 'calls'}), 'counters',
+            'total_seconds' and 'peak_rss_mb'
+        """
+        return {
+            "stages": {
+                name: {"seconds": round(seconds, 4), "calls": calls}
+                for name, (seconds, calls) in self.stages.items()
+            },
+            "counters": dict(self.counters),
+            "total_seconds": round(time.perf_counter() - self._start, 4),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+    def write_jsonl(self, path, **fields):
+        """Append the metrics, with any extra fields, as one JSON line to path."""
+        record = dict(fields)
+        record.update(self.to_dict())
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+
+
+def current():
+    """The recorder active in this thread, or None."""
+    return getattr(_active, "metrics", None)
+
+
+@contextmanager
+def recording(metrics):
+    """Make metrics the active recorder of this thread for the duration of the block."""
+    previous = current()
+    _active.metrics = metrics
+    try:
+        yield metrics
+    finally:
+        _active.metrics = previous
+
+
+@contextmanager
+def _timed(metrics, name):
+    metrics.begin(name)
+    try:
+        yield
+    finally:
+        metrics.end()
+
+
+def stage(name):
+    """Context manager timing a stage on the active recorder, a no-op without one."""
+    metrics = current()
+    if metrics is None:
+        return _NO_STAGE
+    return _timed(metrics, name)
+
+
+def count(name, n=1):
+    """Add n to a counter of the active recorder, if any."""
+    metrics = current()
+    if metrics is not None:
+        metrics.count(name, n)
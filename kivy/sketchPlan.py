@@ -0,0 +1,454 @@
+"""
+Shared preprocessing and drawing plan for the sketch video and SVG modes.
+Both modes threshold the image, find the grid cells holding ink and walk
+them nearest-neighbour first; the result is cached so switching modes or
+changing only the frame rate / skip rates does not recompute it.
+"""
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+import cv2
+import numpy as np
+from sketchPreprocess import PreprocessGraph, DEFAULT_SETTINGS
+from imageIngest import probe_image, reduction_factor, read_image
+from sketchMetrics import stage
+
+BLACK_PIXEL_THRESHOLD = 10
+PLAN_CACHE_SIZE = 4  # plans hold full-size images, keep only a few
+CELL_MODES = ("grid", "quadtree")
+CELL_ORDERS = ("greedy", "components")
+
+
+def euc_dist(arr1, point):
+    """Calculate Euclidean distance from array of points to a single point"""
+    square_sub = (arr1 - point) ** 2
+    return np.sqrt(np.sum(square_sub, axis=1))
+
+
+def threshold_image(image_bgr, resize_wd, resize_ht, settings=DEFAULT_SETTINGS):
+    """
+    Resize, grayscale and threshold an image, without caching.
+
+    Returns:
+        Tuple of (resized BGR image, grayscale image, thresholded image)
+    """
+    graph = PreprocessGraph(image_bgr)
+    return (
+        graph.resized(resize_wd, resize_ht),
+        graph.gray(resize_wd, resize_ht),
+        graph.thresholded(resize_wd, resize_ht, settings),
+    )
+
+
+def find_inked_cells(img_thresh, split_len, object_mask=None, black_pixel_threshold=BLACK_PIXEL_THRESHOLD):
+    """
+    Find the grid cells having at least one black pixel.
+
+    Args:
+        img_thresh: Thresholded grayscale image
+        split_len: Grid size
+        object_mask: Optional mask, area outside it (0) is treated as white
+        black_pixel_threshold: Pixel values below this count as ink
+
+    Returns:
+        Array of (row, col) cell indices, shape (N, 2), in row-major order
+    """
+    if object_mask is not None:
+        img_thresh = img_thresh.copy()
+        img_thresh[object_mask == 0] = 255
+
+    resize_ht, resize_wd = img_thresh.shape[:2]
+    n_cuts_vertical = int(np.ceil(resize_ht / split_len))
+    n_cuts_horizontal = int(np.ceil(resize_wd / split_len))
+
+    # cut the image into grids
+    grid_of_cuts = np.array(np.split(img_thresh, n_cuts_horizontal, axis=-1))
+    grid_of_cuts = np.array(np.split(grid_of_cuts, n_cuts_vertical, axis=-2))
+
+    cut_having_black = (grid_of_cuts < black_pixel_threshold) * 1
+    cut_having_black = np.sum(np.sum(cut_having_black, axis=-1), axis=-1)
+    return np.array(np.where(cut_having_black > 0)).T
+
+
+def walk_order(points):
+    """
+    Greedy nearest-neighbour walk over points, starting at the first one.
+
+    The selected point is removed by swapping in the last one, and ties go to
+    the lowest remaining index, exactly as the original drawing loop did, so
+    the drawing order is unchanged.
+
+    Args:
+        points: Array of point coordinates, shape (N, 2)
+
+    Returns:
+        Index array giving the drawing order, shape (N,)
+    """
+    remaining = np.array(points).copy()
+    remaining_ind = np.arange(len(remaining))
+    order = np.empty(len(remaining), dtype=np.intp)
+    selected_ind = 0
+    count = 0
+    while len(remaining) > 1:
+        selected_ind_val = remaining[selected_ind].copy()
+        order[count] = remaining_ind[selected_ind]
+        count += 1
+
+        # delete the selected ind from the array
+        remaining[selected_ind] = remaining[-1]
+        remaining = remaining[:-1]
+        remaining_ind[selected_ind] = remaining_ind[len(remaining)]
+        remaining_ind = remaining_ind[:-1]
+
+        # select the next nearest index
+        euc_arr = euc_dist(remaining, selected_ind_val)
+        selected_ind = np.argmin(euc_arr)
+
+    if len(remaining) == 1:
+        order[count] = remaining_ind[0]
+    return order
+
+
+def order_cells(cut_black_indices):
+    """
+    Order cells by a greedy nearest-neighbour walk starting at the first one.
+
+    Args:
+        cut_black_indices: Array of (row, col) cells, shape (N, 2)
+
+    Returns:
+        Array of the same cells in drawing order, shape (N, 2)
+    """
+    cut_black_indices = np.asarray(cut_black_indices)
+    return cut_black_indices[walk_order(cut_black_indices)]
+
+
+@dataclass(frozen=True)
+class CellSettings:
+    """
+    How the image is cut into cells.
+
+    mode "grid" cuts a uniform split_len grid. mode "quadtree" starts from
+    blocks of split_len * 2**levels and splits a block in four only while its
+    ink density is above density, so sparse areas are drawn in few large
+    cells and detailed areas keep split_len cells.
+
+    order "greedy" walks all cells nearest-neighbour first. order
+    "components" groups cells into connected components, visits the
+    components along a tour of their centroids and walks each one on its own,
+    so the hand finishes a shape before moving on and each search only spans
+    one component.
+    """
+    mode: str = "grid"
+    levels: int = 2
+    density: float = 0.12
+    order: str = "greedy"
+
+    def __post_init__(self):
+        if self.mode not in CELL_MODES:
+            raise ValueError(f"Unknown cell mode: {self.mode}, expected one of {CELL_MODES}")
+        if self.order not in CELL_ORDERS:
+            raise ValueError(f"Unknown cell order: {self.order}, expected one of {CELL_ORDERS}")
+
+
+DEFAULT_CELLS = CellSettings()
+
+
+def grid_rects(cells, split_len):
+    """Convert (row, col) grid cells to (y0, x0, y1, x1) rects."""
+    cells = np.asarray(cells, dtype=np.intp).reshape(-1, 2)
+    y0 = cells[:, 0] * split_len
+    x0 = cells[:, 1] * split_len
+    return np.stack([y0, x0, y0 + split_len, x0 + split_len], axis=1)
+
+
+def quadtree_rects(img_thresh, min_cell, levels=2, density=0.12, object_mask=None,
+                   black_pixel_threshold=BLACK_PIXEL_THRESHOLD):
+    """
+    Adaptive cells: blocks of min_cell * 2**levels, split in four while their
+    ink density is above density and they are larger than min_cell.
+
+    Args:
+        img_thresh: Thresholded grayscale image
+        min_cell: Smallest cell size (split_len)
+        levels: Number of times a block may be split
+        density: Ink fraction above which a block is split
+        object_mask: Optional mask, area outside it (0) is ignored
+        black_pixel_threshold: Pixel values below this count as ink
+
+    Returns:
+        Array of inked (y0, x0, y1, x1) rects, shape (N, 4), sorted by
+        (y0, x0) so the walk starts at the top-left like the grid does
+    """
+    height, width = img_thresh.shape[:2]
+    ink = img_thresh < black_pixel_threshold
+    if object_mask is not None:
+        ink &= object_mask != 0
+    integral = cv2.integral(ink.astype(np.uint8))
+
+    size = min_cell * 2 ** levels
+    ys, xs = np.meshgrid(np.arange(0, height, size), np.arange(0, width, size), indexing="ij")
+    y0, x0 = ys.ravel(), xs.ravel()
+    y1, x1 = np.minimum(y0 + size, height), np.minimum(x0 + size, width)
+
+    leaves = []
+    while len(y0):
+        ink_count = integral[y1, x1] - integral[y0, x1] - integral[y1, x0] + integral[y0, x0]
+        inked = ink_count > 0
+        y0, x0, y1, x1, ink_count = y0[inked], x0[inked], y1[inked], x1[inked], ink_count[inked]
+        split = ink_count > density * (y1 - y0) * (x1 - x0)
+        if size <= min_cell:
+            split[:] = False
+        leaves.append(np.stack([y0[~split], x0[~split], y1[~split], x1[~split]], axis=1))
+
+        # children of the split blocks, clipped to their parent
+        half = size // 2
+        y0, x0, y1, x1 = y0[split], x0[split], y1[split], x1[split]
+        children = []
+        for dy in (0, half):
+            for dx in (0, half):
+                cy0, cx0 = y0 + dy, x0 + dx
+                valid = (cy0 < y1) & (cx0 < x1)
+                children.append(np.stack([
+                    cy0[valid], cx0[valid],
+                    np.minimum(cy0 + half, y1)[valid], np.minimum(cx0 + half, x1)[valid]
+                ], axis=1))
+        children = np.concatenate(children) if children else np.empty((0, 4), np.intp)
+        y0, x0, y1, x1 = children.T
+        size = half
+
+    rects = np.concatenate(leaves).astype(np.intp) if leaves else np.empty((0, 4), np.intp)
+    return rects[np.lexsort((rects[:, 1], rects[:, 0]))]
+
+
+def rect_centers(rects):
+    """(y, x) centre of each rect, the hand position when the rect is drawn."""
+    rects = np.asarray(rects)
+    return np.stack([
+        rects[:, 0] + (rects[:, 2] - rects[:, 0]) // 2,
+        rects[:, 1] + (rects[:, 3] - rects[:, 1]) // 2,
+    ], axis=1)
+
+
+def find_cell_rects(img_thresh, split_len, cell_settings=DEFAULT_CELLS, object_mask=None,
+                    black_pixel_threshold=BLACK_PIXEL_THRESHOLD):
+    """Inked cells as (y0, x0, y1, x1) rects, unordered, for either cell mode."""
+    if cell_settings.mode == "quadtree":
+        return quadtree_rects(
+            img_thresh, split_len, cell_settings.levels, cell_settings.density,
+            object_mask=object_mask, black_pixel_threshold=black_pixel_threshold
+        )
+    cells = find_inked_cells(img_thresh, split_len, object_mask, black_pixel_threshold)
+    return grid_rects(cells, split_len)
+
+
+def component_order(rects, split_len, height, width):
+    """
+    Drawing order visiting connected components of cells one at a time.
+
+    Cells are rasterised on a split_len occupancy grid and labelled with
+    cv2.connectedComponentsWithStats (8-connectivity). Components are visited
+    along a greedy tour of their centroids, starting with the component of
+    the first cell; inside a component the greedy walk starts at the cell
+    nearest to where the previous component ended.
+
+    Args:
+        rects: (y0, x0, y1, x1) rects, shape (N, 4)
+        split_len: Grid size (smallest cell size)
+        height: Image height
+        width: Image width
+
+    Returns:
+        Index array giving the drawing order, shape (N,)
+    """
+    rects = np.asarray(rects)
+    if len(rects) == 0:
+        return np.empty(0, dtype=np.intp)
+    n_rows = int(np.ceil(height / split_len))
+    n_cols = int(np.ceil(width / split_len))
+    occupancy = np.zeros((n_rows, n_cols), np.uint8)
+    grid = rects // split_len
+    occupancy[grid[:, 0], grid[:, 1]] = 1
+    for r0, c0, r1, c1 in grid[(grid[:, 2] - grid[:, 0] > 1) | (grid[:, 3] - grid[:, 1] > 1)]:
+        occupancy[r0:r1, c0:c1] = 1  # quadtree cells larger than split_len
+    n_labels, labels, _, centroids = cv2.connectedComponentsWithStats(occupancy, connectivity=8)
+    rect_labels = labels[grid[:, 0], grid[:, 1]]
+
+    # tour over the component centroids (x, y in grid units), background label 0 excluded
+    first = rect_labels[0]
+    component_ids = np.array([first] + [i for i in range(1, n_labels) if i != first])
+    tour = component_ids[walk_order(centroids[component_ids][:, ::-1])]
+
+    # cell indices grouped by component, ascending inside each group, so a
+    # component's members are found without scanning every cell
+    by_label = np.argsort(rect_labels, kind="stable")
+    group_ends = np.cumsum(np.bincount(rect_labels, minlength=n_labels))
+    group_starts = group_ends - np.bincount(rect_labels, minlength=n_labels)
+
+    centers = rect_centers(rects)
+    order = []
+    position = centers[0]
+    for component in tour:
+        members = by_label[group_starts[component]:group_ends[component]].copy()
+        if len(members) == 0:
+            continue
+        # start the walk at the member closest to the pen
+        start = np.argmin(euc_dist(centers[members], position))
+        members[[0, start]] = members[[start, 0]]
+        members = members[walk_order(centers[members])]
+        order.append(members)
+        position = centers[members[-1]]
+    return np.concatenate(order)
+
+
+def plan_cells(img_thresh, split_len, cell_settings=DEFAULT_CELLS, object_mask=None,
+               black_pixel_threshold=BLACK_PIXEL_THRESHOLD):
+    """
+    Inked cells of the image in drawing order.
+
+    Args:
+        img_thresh: Thresholded grayscale image
+        split_len: Grid size (smallest cell size in quadtree mode)
+        cell_settings: CellSettings object
+        object_mask: Optional mask, area outside it (0) is ignored
+        black_pixel_threshold: Pixel values below this count as ink
+
+    Returns:
+        Array of (y0, x0, y1, x1) rects in drawing order, shape (N, 4)
+    """
+    with stage("grid"):
+        rects = find_cell_rects(img_thresh, split_len, cell_settings, object_mask, black_pixel_threshold)
+    with stage("ordering"):
+        if cell_settings.order == "components":
+            return rects[component_order(rects, split_len, img_thresh.shape[0], img_thresh.shape[1])]
+        if cell_settings.mode == "grid":
+            # walk on grid indices, identical to the original drawing loop
+            return rects[walk_order(rects[:, :2] // split_len)]
+        return rects[walk_order(rect_centers(rects))]
+
+
+class SketchPlan:
+    """
+    Preprocessed image and cell walk for one (image, resolution, split_len,
+    cell settings). The arrays are shared between callers and are read-only.
+    """
+    def __init__(self, img, img_gray, img_thresh, split_len, rects, cell_settings=DEFAULT_CELLS):
+        self.img = img
+        self.img_gray = img_gray
+        self.img_thresh = img_thresh
+        self.resize_ht, self.resize_wd = img_thresh.shape[:2]
+        self.split_len = split_len
+        self.rects = rects  # (y0, x0, y1, x1) in drawing order
+        self.cell_settings = cell_settings
+
+    def cell_centers(self):
+        """Return the centre of each planned cell as (x, y) tuples, in drawing order."""
+        return [(int(x), int(y)) for y, x in rect_centers(self.rects)]
+
+
+_graph_cache = OrderedDict()
+_plan_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cache_get(cache, key):
+    with _cache_lock:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+
+def _cache_put(cache, key, value):
+    with _cache_lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > PLAN_CACHE_SIZE:
+            cache.popitem(last=False)
+
+
+def image_key(image_path):
+    """Identify an image file by path, modification time and size."""
+    st = os.stat(image_path)
+    return (os.path.abspath(image_path), st.st_mtime_ns, st.st_size)
+
+
+def get_preprocess_graph(image_path, resize_wd, resize_ht, image_bgr=None):
+    """
+    Return the cached PreprocessGraph of an image file for a target size.
+
+    Args:
+        image_path: Path of the source image
+        resize_wd: Target width
+        resize_ht: Target height
+        image_bgr: The image if already loaded at full size, otherwise it is
+            read only when a stage needs it, at a reduced size when the
+            target is much smaller than the image
+
+    Returns:
+        PreprocessGraph object
+    """
+    info = probe_image(image_path)
+    factor = 1 if info is None else reduction_factor(info.width, info.height, resize_wd, resize_ht)
+    if factor != 1:
+        image_bgr = None  # cheaper to decode reduced than to reuse the full image
+    key = image_key(image_path) + (factor,)
+    graph = _cache_get(_graph_cache, key)
+    if graph is None:
+        def load_image():
+            img = read_image(image_path, resize_wd, resize_ht, info=info)
+            if img is None:
+                raise ValueError(f"Failed to read image: {image_path}")
+            return img
+
+        graph = PreprocessGraph(image_bgr=image_bgr, load_image=load_image)
+        _cache_put(_graph_cache, key, graph)
+    return graph
+
+
+def get_sketch_plan(image_path, resize_wd, resize_ht, split_len, image_bgr=None, settings=DEFAULT_SETTINGS,
+                    cell_settings=DEFAULT_CELLS):
+    """
+    Return the cached SketchPlan for an image, building it on a miss.
+
+    The cache is invalidated only by the image file (path, mtime, size), the
+    target resolution, split_len, the preprocessing and the cell settings.
+    On a miss only the preprocessing stages after the changed setting are
+    recomputed.
+
+    Args:
+        image_path: Path of the source image
+        resize_wd: Target width
+        resize_ht: Target height
+        split_len: Grid size
+        image_bgr: The full-size image if already loaded, saves a read on a miss
+        settings: PreprocessSettings object
+        cell_settings: CellSettings object
+
+    Returns:
+        SketchPlan object
+    """
+    plan_key = image_key(image_path) + (
+        int(resize_wd), int(resize_ht), settings, int(split_len), cell_settings, BLACK_PIXEL_THRESHOLD
+    )
+    plan = _cache_get(_plan_cache, plan_key)
+    if plan is not None:
+        return plan
+
+    graph = get_preprocess_graph(image_path, resize_wd, resize_ht, image_bgr=image_bgr)
+    img = graph.resized(resize_wd, resize_ht)
+    img_gray = graph.gray(resize_wd, resize_ht)
+    img_thresh = graph.thresholded(resize_wd, resize_ht, settings)
+    rects = plan_cells(img_thresh, split_len, cell_settings)
+    rects.setflags(write=False)
+    plan = SketchPlan(img, img_gray, img_thresh, split_len, rects, cell_settings)
+    _cache_put(_plan_cache, plan_key, plan)
+    return plan
+
+
+def clear_plan_cache():
+    """Drop all cached preprocessing results and plans."""
+    with _cache_lock:
+        _graph_cache.clear()
+        _plan_cache.clear()
@@ -0,0 +1,176 @@
+"""
+Lazy preprocessing graph for the sketch pipeline.
+Stages: resize -> grayscale -> optional CLAHE -> threshold (adaptive, otsu,
+canny or xdog). A stage runs only when something asks for its output, and
+each output is memoized by the parameters of its whole upstream chain, so a
+parameter sweep recomputes only the stages after the changed one.
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+import cv2
+import numpy as np
+from sketchMetrics import stage
+
+THRESHOLD_METHODS = ("adaptive", "otsu", "canny", "xdog")
+GRAPH_MEMO_SIZE = 8  # stage outputs kept per image
+
+
+@dataclass(frozen=True)
+class PreprocessSettings:
+    """Parameters of the preprocessing stages after resizing."""
+    method: str = "adaptive"
+    # adaptive (gaussian) threshold
+    block_size: int = 15
+    c: int = 10
+    # optional contrast equalisation before thresholding
+    clahe: bool = False
+    clahe_clip_limit: float = 2.0
+    clahe_tile_size: int = 3
+    # canny edges
+    canny_low: int = 50
+    canny_high: int = 150
+    # extended difference of gaussians
+    xdog_sigma: float = 0.8
+    xdog_k: float = 1.6
+    xdog_gamma: float = 0.98
+    xdog_epsilon: float = -0.02
+    xdog_phi: float = 100.0
+
+    def __post_init__(self):
+        if self.method not in THRESHOLD_METHODS:
+            raise ValueError(f"Unknown threshold method: {self.method}, expected one of {THRESHOLD_METHODS}")
+
+    def clahe_key(self):
+        """Parameters the CLAHE stage depends on."""
+        if not self.clahe:
+            return ()
+        return ("clahe", self.clahe_clip_limit, self.clahe_tile_size)
+
+    def threshold_key(self):
+        """Parameters the threshold stage depends on (only those of the chosen method)."""
+        if self.method == "adaptive":
+            return ("adaptive", self.block_size, self.c)
+        if self.method == "canny":
+            return ("canny", self.canny_low, self.canny_high)
+        if self.method == "xdog":
+            return ("xdog", self.xdog_sigma, self.xdog_k, self.xdog_gamma, self.xdog_epsilon, self.xdog_phi)
+        return ("otsu",)
+
+
+DEFAULT_SETTINGS = PreprocessSettings()
+
+
+def apply_threshold(img_gray, settings):
+    """
+    Turn a grayscale image into a sketch where ink is black on white.
+
+    Args:
+        img_gray: Grayscale uint8 image
+        settings: PreprocessSettings object
+
+    Returns:
+        uint8 image, ink pixels close to 0
+    """
+    if settings.method == "adaptive":
+        return cv2.adaptiveThreshold(
+            img_gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY,
+            settings.block_size, settings.c
+        )
+    if settings.method == "otsu":
+        _, img_thresh = cv2.threshold(img_gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return img_thresh
+    if settings.method == "canny":
+        # edges come out white on black
+        return 255 - cv2.Canny(img_gray, settings.canny_low, settings.canny_high)
+
+    # xdog: soft thresholded difference of two gaussians
+    img = img_gray.astype(np.float32) / 255.0
+    blur_1 = cv2.GaussianBlur(img, (0, 0), settings.xdog_sigma)
+    blur_2 = cv2.GaussianBlur(img, (0, 0), settings.xdog_sigma * settings.xdog_k)
+    diff = blur_1 - settings.xdog_gamma * blur_2
+    soft = 1.0 + np.tanh(settings.xdog_phi * (diff - settings.xdog_epsilon))
+    xdog = np.where(diff >= settings.xdog_epsilon, 1.0, soft)
+    return np.clip(xdog * 255.0, 0, 255).astype(np.uint8)
+
+
+class PreprocessGraph:
+    """
+    Memoized, lazily evaluated preprocessing stages of one source image.
+    Outputs are shared between callers and are read-only.
+    """
+    def __init__(self, image_bgr=None, load_image=None, memo_size=GRAPH_MEMO_SIZE):
+        """
+        Args:
+            image_bgr: Source image in BGR format
+            load_image: Callable returning the source image, used instead of
+                image_bgr so the file is only read if a stage needs it
+            memo_size: Number of stage outputs to keep
+        """
+        if image_bgr is None and load_image is None:
+            raise ValueError("PreprocessGraph needs image_bgr or load_image")
+        self._image_bgr = image_bgr
+        self._load_image = load_image
+        self._memo_size = memo_size
+        self._memo = OrderedDict()
+        self._lock = threading.RLock()
+
+    def source(self):
+        """Return the source image, loading it on first use."""
+        with self._lock:
+            if self._image_bgr is None:
+                with stage("decode"):
+                    self._image_bgr = self._load_image()
+            return self._image_bgr
+
+    def _memoized(self, key, compute):
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                return self._memo[key]
+        value = compute()
+        value.setflags(write=False)
+        with self._lock:
+            self._memo[key] = value
+            while len(self._memo) > self._memo_size:
+                self._memo.popitem(last=False)
+        return value
+
+    @staticmethod
+    def _resize_key(resize_wd, resize_ht):
+        return ("resize", int(resize_wd), int(resize_ht))
+
+    def resized(self, resize_wd, resize_ht):
+        """Source image resized to the target resolution (BGR)."""
+        return self._memoized(
+            self._resize_key(resize_wd, resize_ht),
+            lambda: cv2.resize(self.source(), (int(resize_wd), int(resize_ht)))
+        )
+
+    def gray(self, resize_wd, resize_ht):
+        """Grayscale of the resized image."""
+        key = self._resize_key(resize_wd, resize_ht) + ("gray",)
+        return self._memoized(
+            key, lambda: cv2.cvtColor(self.resized(resize_wd, resize_ht), cv2.COLOR_BGR2GRAY)
+        )
+
+    def equalized(self, resize_wd, resize_ht, settings=DEFAULT_SETTINGS):
+        """Grayscale after the optional CLAHE stage (the grayscale itself when disabled)."""
+        if not settings.clahe:
+            return self.gray(resize_wd, resize_ht)
+
+        def compute():
+            tile = settings.clahe_tile_size
+            clahe = cv2.createCLAHE(clipLimit=settings.clahe_clip_limit, tileGridSize=(tile, tile))
+            return clahe.apply(self.gray(resize_wd, resize_ht))
+
+        key = self._resize_key(resize_wd, resize_ht) + ("gray",) + settings.clahe_key()
+        return self._memoized(key, compute)
+
+    def thresholded(self, resize_wd, resize_ht, settings=DEFAULT_SETTINGS):
+        """Sketch image, ink is black on white."""
+        key = (self._resize_key(resize_wd, resize_ht) + ("gray",)
+               + settings.clahe_key() + settings.threshold_key())
+        return self._memoized(
+            key, lambda: apply_threshold(self.equalized(resize_wd, resize_ht, settings), settings)
+        )
@@ -0,0 +1,150 @@
+"""
+Split length advisor.
+Lists the split lengths a target resolution allows (divisors of
+gcd(height, width)) and, for each one, predicts the inked-cell count, frame
+count and video duration from a small, downsampled threshold of the image,
+so the user can pick a speed / detail trade-off without trial renders.
+"""
+import math
+import cv2
+import numpy as np
+from imageIngest import probe_image, read_image
+from sketchPreprocess import PreprocessGraph, DEFAULT_SETTINGS
+
+ADVISOR_WIDTH = 640  # width of the downsampled threshold used for estimates
+
+
+def prime_factors(n):
+    """Return the prime factorisation of n as a {prime: exponent} dict."""
+    factors = {}
+    d = 2
+    while d * d <= n:
+        while n % d == 0:
+            factors[d] = factors.get(d, 0) + 1
+            n //= d
+        d += 1 if d == 2 else 2
+    if n > 1:
+        factors[n] = factors.get(n, 0) + 1
+    return factors
+
+
+def divisors(n):
+    """Return all divisors of n in ascending order, built from its prime factors."""
+    if n < 1:
+        return []
+    result = [1]
+    for prime, exponent in prime_factors(n).items():
+        result = [d * prime ** e for d in result for e in range(exponent + 1)]
+    return sorted(result)
+
+
+def common_divisors(num1, num2):
+    """Common divisors of two numbers in ascending order, i.e. the divisors of their gcd."""
+    return divisors(math.gcd(int(num1), int(num2)))
+
+
+def count_frames(n_cells, skip_rate, frame_rate, end_duration):
+    """
+    Exact number of frames the drawing loop writes for one pass.
+
+    The loop draws every cell but the last, writes a frame each skip_rate
+    cells, then holds the final image for end_duration seconds.
+
+    Args:
+        n_cells: Number of inked cells
+        skip_rate: Cells drawn per written frame
+        frame_rate: Video frame rate
+        end_duration: Seconds the finished image is shown
+
+    Returns:
+        Frame count (int)
+    """
+    drawing_frames = max(n_cells - 1, 0) // max(int(skip_rate), 1)
+    return drawing_frames + int(frame_rate) * int(end_duration)
+
+
+def estimate_inked_cells(ink_mask, resize_wd, resize_ht, split_len):
+    """
+    Estimate the number of inked split_len cells at the target resolution
+    from an ink mask of a downsampled image.
+
+    Args:
+        ink_mask: Boolean (or 0/1) array of the downsampled image, True = ink
+        resize_wd: Target width
+        resize_ht: Target height
+        split_len: Cell size at the target resolution
+
+    Returns:
+        Estimated inked cell count (int)
+    """
+    small_ht, small_wd = ink_mask.shape[:2]
+    integral = cv2.integral(ink_mask.astype(np.uint8))
+    n_rows = int(math.ceil(resize_ht / split_len))
+    n_cols = int(math.ceil(resize_wd / split_len))
+
+    def cell_edges(n_cells, full, small):
+        edges = np.floor(np.arange(n_cells + 1) * split_len * small / full).astype(int)
+        edges = np.clip(edges, 0, small)
+        start, end = edges[:-1], edges[1:]
+        # cells smaller than a downsampled pixel still cover one pixel
+        end = np.minimum(np.maximum(end, start + 1), small)
+        start = np.minimum(start, end - 1)
+        return start, end
+
+    y0, y1 = cell_edges(n_rows, resize_ht, small_ht)
+    x0, x1 = cell_edges(n_cols, resize_wd, small_wd)
+    ink = (integral[y1][:, x1] - integral[y0][:, x1]
+           - integral[y1][:, x0] + integral[y0][:, x0])
+    return int(np.count_nonzero(ink))
+
+
+def downsampled_ink_mask(image_path, resize_wd, resize_ht, settings=DEFAULT_SETTINGS, image_bgr=None):
+    """
+    Threshold a small copy of the image, scaled to ADVISOR_WIDTH wide.
+
+    Returns:
+        Boolean ink mask of the downsampled image
+    """
+    scale = max(1.0, resize_wd / ADVISOR_WIDTH)
+    small_wd = max(1, int(round(resize_wd / scale)))
+    small_ht = max(1, int(round(resize_ht / scale)))
+    if image_bgr is None:
+        image_bgr = read_image(image_path, small_wd, small_ht, info=probe_image(image_path))
+        if image_bgr is None:
+            raise ValueError(f"Failed to read image: {image_path}")
+    img_thresh = PreprocessGraph(image_bgr).thresholded(small_wd, small_ht, settings)
+    return img_thresh < 10  # same ink level as the drawing loop
+
+
+def advise_split_lens(image_path, resize_wd, resize_ht, frame_rate=25, skip_rate=8, end_duration=2,
+                      settings=DEFAULT_SETTINGS, split_lens=None):
+    """
+    Predict cells, frames and duration for each usable split length.
+
+    Args:
+        image_path: Path of the source image
+        resize_wd: Target video width
+        resize_ht: Target video height
+        frame_rate: Video frame rate
+        skip_rate: Object skip rate (cells per frame)
+        end_duration: Seconds the finished image is shown
+        settings: PreprocessSettings object
+        split_lens: Split lengths to evaluate, defaults to all common divisors
+
+    Returns:
+        List of dicts with 'split_len', 'cells', 'frames' and 'duration' (seconds)
+    """
+    if split_lens is None:
+        split_lens = common_divisors(resize_ht, resize_wd)
+    ink_mask = downsampled_ink_mask(image_path, resize_wd, resize_ht, settings)
+    advice = []
+    for split_len in split_lens:
+        cells = estimate_inked_cells(ink_mask, resize_wd, resize_ht, split_len)
+        frames = count_frames(cells, skip_rate, frame_rate, end_duration)
+        advice.append({
+            "split_len": split_len,
+            "cells": cells,
+            "frames": frames,
+            "duration": round(frames / frame_rate, 1),
+        })
+    return advice
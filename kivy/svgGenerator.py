@@ -2,11 +2,12 @@
 SVG Generator for converting image sketch to SVG paths
 This module creates SVG files from the sketch drawing process
 """
-import os
-import numpy as np
-import cv2
 import xml.etree.ElementTree as ET
 from xml.dom import minidom
+from svg.path.path import Move, Line
+from kivg.data_classes import SvgGeometry
+from sketchPlan import get_sketch_plan, threshold_image, plan_cells, rect_centers, DEFAULT_CELLS
+from sketchPreprocess import DEFAULT_SETTINGS
 
 
 def prettify_xml(elem):
@@ -16,13 +17,7 @@ def prettify_xml(elem):
     return reparsed.toprettyxml(indent="  ")
 
 
-def euc_dist(arr1, point):
-    """Calculate Euclidean distance from array of points to a single point"""
-    square_sub = (arr1 - point) ** 2
-    return np.sqrt(np.sum(square_sub, axis=1))
-
-
-def trace_image_to_svg_paths(img_thresh, resize_wd, resize_ht, split_len, object_mask=None, stroke_color="#000000", stroke_width=2):
+def trace_image_to_svg_paths(img_thresh, resize_wd, resize_ht, split_len, object_mask=None, stroke_color="#000000", stroke_width=2, cell_settings=None):
     """
     Convert the thresholded image to SVG paths by tracing the black pixels.
     Uses the same algorithm as sketchApi for consistency.
@@ -35,59 +30,17 @@ def trace_image_to_svg_paths(img_thresh, resize_wd, resize_ht, split_len, object
         object_mask: Optional mask for object-only drawing
         stroke_color: Color for the SVG strokes
         stroke_width: Width of the SVG strokes
+        cell_settings: Optional CellSettings (uniform grid by default)
         
     Returns:
         List of SVG path commands as (x, y) tuples
     """
-    img_thresh_copy = img_thresh.copy()
-    
-    if object_mask is not None:
-        # Make area other than object white
-        object_mask_black_ind = np.where(object_mask == 0)
-        img_thresh_copy[object_mask_black_ind] = 255
-    
-    # Cut the image into grids (same as sketchApi)
-    n_cuts_vertical = int(np.ceil(resize_ht / split_len))
-    n_cuts_horizontal = int(np.ceil(resize_wd / split_len))
-    
-    grid_of_cuts = np.array(np.split(img_thresh_copy, n_cuts_horizontal, axis=-1))
-    grid_of_cuts = np.array(np.split(grid_of_cuts, n_cuts_vertical, axis=-2))
-    
-    # Find grids where there is at least one black pixel
-    black_pixel_threshold = 10
-    cut_having_black = (grid_of_cuts < black_pixel_threshold) * 1
-    cut_having_black = np.sum(np.sum(cut_having_black, axis=-1), axis=-1)
-    cut_black_indices = np.array(np.where(cut_having_black > 0)).T
-    
-    # Create path points by following the nearest neighbor (same as sketchApi algorithm)
-    path_points = []
-    if len(cut_black_indices) > 0:
-        selected_ind = 0
-        
-        while len(cut_black_indices) > 1:
-            selected_ind_val = cut_black_indices[selected_ind].copy()
-            
-            # Convert grid coordinates to pixel coordinates (center of grid)
-            x = selected_ind_val[1] * split_len + split_len // 2
-            y = selected_ind_val[0] * split_len + split_len // 2
-            path_points.append((x, y))
-            
-            # Delete the selected index from the array
-            cut_black_indices[selected_ind] = cut_black_indices[-1]
-            cut_black_indices = cut_black_indices[:-1]
-            
-            # Select the next nearest index using Euclidean distance
-            if len(cut_black_indices) > 0:
-                euc_arr = euc_dist(cut_black_indices, selected_ind_val)
-                selected_ind = np.argmin(euc_arr)
-        
-        # Add the last point
-        if len(cut_black_indices) == 1:
-            x = cut_black_indices[0][1] * split_len + split_len // 2
-            y = cut_black_indices[0][0] * split_len + split_len // 2
-            path_points.append((x, y))
+    # Find grids where there is at least one black pixel and walk them
+    # nearest neighbour first (same algorithm as sketchApi)
+    cell_rects = plan_cells(img_thresh, split_len, cell_settings or DEFAULT_CELLS, object_mask=object_mask)
     
-    return path_points
+    # Convert cells to pixel coordinates (center of each cell)
+    return [(int(x), int(y)) for y, x in rect_centers(cell_rects)]
 
 
 def create_svg_from_paths(path_points, width, height, stroke_color="#000000", stroke_width=2, fill_color="none"):
@@ -143,7 +96,72 @@ def create_svg_from_paths(path_points, width, height, stroke_color="#000000", st
     return prettify_xml(svg)
 
 
-def generate_svg_from_image(image_bgr, split_len=10, stroke_color="#000000", stroke_width=2, resize_wd=640, resize_ht=480):
+def create_geometry_from_paths(path_points, width, height, name="sketch"):
+    """
+    Create a kivg SvgGeometry from path points, without any SVG text.
+    
+    The result matches what kivg would parse from create_svg_from_paths:
+    a single unfilled path made of one Move followed by line segments.
+    
+    Args:
+        path_points: List of (x, y) tuples representing the path
+        width: Drawing width (viewBox width)
+        height: Drawing height (viewBox height)
+        name: Name of the geometry (used in place of a file name)
+        
+    Returns:
+        SvgGeometry object
+    """
+    segments = []
+    if len(path_points) > 0:
+        points = [complex(int(x), int(y)) for x, y in path_points]
+        segments.append(Move(to=points[0]))
+        for start, end in zip(points[:-1], points[1:]):
+            segments.append(Line(start=start, end=end))
+    
+    # unfilled path: same transparent color kivg uses for fill="none"
+    shapes = [("path_0", [1, 1, 1, 0], segments)] if segments else []
+    return SvgGeometry(svg_size=[float(width), float(height)], shapes=shapes, name=name)
+
+
+def trace_image(image_bgr, split_len=10, resize_wd=640, resize_ht=480, image_path=None, preprocess_settings=None, cell_settings=None):
+    """
+    Preprocess an image and trace it into sketch path points.
+    
+    Args:
+        image_bgr: Input image in BGR format (may be None when image_path is set)
+        split_len: Grid size for tracing
+        resize_wd: Target width for processing
+        resize_ht: Target height for processing
+        image_path: Optional source file of the image. When given, the
+            preprocessing and cell walk come from the plan cache shared
+            with the video mode.
+        preprocess_settings: Optional PreprocessSettings (threshold method),
+            defaults to the adaptive threshold
+        cell_settings: Optional CellSettings (uniform grid by default)
+        
+    Returns:
+        List of (x, y) tuples representing the path
+    """
+    settings = preprocess_settings or DEFAULT_SETTINGS
+    cell_settings = cell_settings or DEFAULT_CELLS
+    if image_path is not None:
+        plan = get_sketch_plan(
+            image_path, resize_wd, resize_ht, split_len, image_bgr=image_bgr,
+            settings=settings, cell_settings=cell_settings
+        )
+        return plan.cell_centers()
+    
+    # Resize, grayscale and apply thresholding
+    _, _, img_thresh = threshold_image(image_bgr, resize_wd, resize_ht, settings=settings)
+    
+    # Trace the image to SVG paths
+    return trace_image_to_svg_paths(
+        img_thresh, resize_wd, resize_ht, split_len, object_mask=None, cell_settings=cell_settings
+    )
+
+
+def generate_svg_from_image(image_bgr, split_len=10, stroke_color="#000000", stroke_width=2, resize_wd=640, resize_ht=480, image_path=None, preprocess_settings=None, cell_settings=None):
     """
     Generate an SVG file from an image by converting it to a sketch-like path.
     
@@ -154,23 +172,17 @@ def generate_svg_from_image(image_bgr, split_len=10, stroke_color="#000000", str
         stroke_width: Width of the SVG strokes
         resize_wd: Target width for processing
         resize_ht: Target height for processing
+        image_path: Optional source file of the image, enables the plan cache
+        preprocess_settings: Optional PreprocessSettings (threshold method)
+        cell_settings: Optional CellSettings (uniform grid by default)
         
     Returns:
         SVG string
     """
-    # Resize image
-    img = cv2.resize(image_bgr, (resize_wd, resize_ht))
-    img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    
-    # Apply adaptive thresholding
-    img_thresh = cv2.adaptiveThreshold(
-        img_gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 15, 10
-    )
-    
-    # Trace the image to SVG paths
-    path_points = trace_image_to_svg_paths(
-        img_thresh, resize_wd, resize_ht, split_len, 
-        object_mask=None, stroke_color=stroke_color, stroke_width=stroke_width
+    path_points = trace_image(
+        image_bgr, split_len, resize_wd, resize_ht,
+        image_path=image_path, preprocess_settings=preprocess_settings,
+        cell_settings=cell_settings
     )
     
     # Create SVG
@@ -182,6 +194,31 @@ def generate_svg_from_image(image_bgr, split_len=10, stroke_color="#000000", str
     return svg_string
 
 
+def generate_geometry_from_image(image_bgr, split_len=10, resize_wd=640, resize_ht=480, image_path=None, preprocess_settings=None, cell_settings=None):
+    """
+    Generate kivg geometry from an image, skipping SVG serialization.
+    
+    Args:
+        image_bgr: Input image in BGR format
+        split_len: Grid size for tracing
+        resize_wd: Target width for processing
+        resize_ht: Target height for processing
+        image_path: Optional source file of the image, enables the plan cache
+        preprocess_settings: Optional PreprocessSettings (threshold method)
+        cell_settings: Optional CellSettings (uniform grid by default)
+        
+    Returns:
+        Tuple of (SvgGeometry, path_points)
+    """
+    path_points = trace_image(
+        image_bgr, split_len, resize_wd, resize_ht,
+        image_path=image_path, preprocess_settings=preprocess_settings,
+        cell_settings=cell_settings
+    )
+    geometry = create_geometry_from_paths(path_points, resize_wd, resize_ht)
+    return geometry, path_points
+
+
 def save_svg_file(svg_string, output_path):
     """
     Save SVG string to a file.
@@ -0,0 +1,40 @@
+"""
+Shared setup of the test suite: headless Kivy and the flat kivy/ modules on
+sys.path, as the benchmarks use them.
+
+Usage (from the kivy directory):
+    python -m pytest tests
+"""
+import os
+import sys
+
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+os.environ.setdefault("KIVY_NO_FILELOG", "1")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+import pytest
+
+
+def sketch_image(width=320, height=240):
+    """Synthetic drawing: separate shapes and strokes on white, so cells form several components."""
+    image = np.full((height, width, 3), 255, np.uint8)
+    cv2.circle(image, (80, 80), 40, (0, 0, 0), 3)
+    cv2.rectangle(image, (180, 40), (280, 120), (40, 40, 40), -1)
+    cv2.line(image, (30, 200), (290, 170), (0, 0, 0), 2)
+    cv2.putText(image, "ab", (140, 220), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 0), 3)
+    return image
+
+
+@pytest.fixture
+def image_bgr():
+    return sketch_image()
+
+
+@pytest.fixture
+def image_path(tmp_path, image_bgr):
+    path = tmp_path / "sketch.png"
+    cv2.imwrite(str(path), image_bgr)
+    return str(path)
@@ -0,0 +1,67 @@
+import os
+import shutil
+import threading
+
+from renderCache import RenderCache, render_key
+from sketchPlan import CellSettings
+
+PARAMS = {"split_len": 10, "frame_rate": 25, "resolution": [320, 240], "cells": CellSettings()}
+
+
+def test_render_key_is_deterministic(image_path):
+    assert render_key(image_path, PARAMS, "2") == render_key(image_path, dict(PARAMS), "2")
+
+
+def test_render_key_ignores_param_order(image_path):
+    reordered = dict(reversed(list(PARAMS.items())))
+    assert render_key(image_path, reordered, "2") == render_key(image_path, PARAMS, "2")
+
+
+def test_render_key_hashes_content_not_name(tmp_path, image_path):
+    copy = tmp_path / "renamed.png"
+    shutil.copy(image_path, copy)
+    assert render_key(str(copy), PARAMS, "2") == render_key(image_path, PARAMS, "2")
+    with open(copy, "ab") as f:
+        f.write(b"\0")
+    assert render_key(str(copy), PARAMS, "2") != render_key(image_path, PARAMS, "2")
+
+
+def test_render_key_changes_with_params_and_version(image_path):
+    key = render_key(image_path, PARAMS, "2")
+    assert render_key(image_path, dict(PARAMS, split_len=20), "2") != key
+    assert render_key(image_path, dict(PARAMS, cells=CellSettings(mode="quadtree")), "2") != key
+    assert render_key(image_path, PARAMS, "3") != key
+
+
+def test_cache_round_trip(tmp_path):
+    cache = RenderCache(str(tmp_path / "cache"))
+    video = tmp_path / "vid_h264.mp4"
+    video.write_bytes(b"video")
+    assert cache.lookup("k", str(tmp_path / "out")) is None
+    assert cache.store("k", str(video))
+    fetched = cache.lookup("k", str(tmp_path / "out"))
+    assert fetched == str(tmp_path / "out.mp4")
+    with open(fetched, "rb") as f:
+        assert f.read() == b"video"
+
+
+def test_concurrent_stores_keep_every_entry(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    videos = []
+    for k in range(20):
+        video = tmp_path / f"vid{k}.mp4"
+        video.write_bytes(b"x" * (k + 1))
+        videos.append(str(video))
+    # one RenderCache per thread, as concurrent renders build their own
+    threads = [
+        threading.Thread(target=RenderCache(cache_dir).store, args=(f"key{k}", path))
+        for k, path in enumerate(videos)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    cache = RenderCache(cache_dir)
+    for k in range(20):
+        assert cache.lookup(f"key{k}", str(tmp_path / f"out{k}")) is not None
+    assert not [name for name in os.listdir(cache_dir) if name.endswith(".tmp")]
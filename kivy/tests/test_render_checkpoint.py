@@ -0,0 +1,85 @@
+import os
+
+from renderCheckpoint import RenderCheckpoint, discard_render, pending_renders
+from sketchPlan import CellSettings
+from sketchPreprocess import PreprocessSettings
+
+RANGES = [(0, 50), (50, 100), (100, 130)]
+RENDER_ARGS = {
+    "image_path": "/images/photo.png",
+    "split_len": 10,
+    "frame_rate": 25,
+    "checkpoint_seconds": 2,
+    "preprocess_settings": PreprocessSettings(),
+    "cell_settings": CellSettings(mode="quadtree", order="components"),
+}
+
+
+def finish_segment(checkpoint, frame_range):
+    with open(checkpoint.segment_path(frame_range), "wb") as f:
+        f.write(b"segment")
+    checkpoint.mark_done(frame_range)
+
+
+def test_nothing_pending_before_the_first_segment(tmp_path):
+    checkpoint = RenderCheckpoint(str(tmp_path), "key")
+    assert checkpoint.begin(RENDER_ARGS, 130, RANGES) == 0
+    checkpoint.release()
+    assert pending_renders(str(tmp_path)) == []
+
+
+def test_manifest_round_trip(tmp_path):
+    checkpoint = RenderCheckpoint(str(tmp_path), "key")
+    checkpoint.begin(RENDER_ARGS, 130, RANGES)
+    finish_segment(checkpoint, RANGES[0])
+    finish_segment(checkpoint, RANGES[2])
+    checkpoint.release()
+
+    pending, = pending_renders(str(tmp_path))
+    assert pending["key"] == "key"
+    assert pending["frames_done"] == 80
+    assert pending["total_frames"] == 130
+    # settings objects are rebuilt from the JSON manifest
+    assert pending["render"] == RENDER_ARGS
+
+    resumed = RenderCheckpoint(str(tmp_path), "key")
+    assert resumed.begin(pending["render"], 130, RANGES) == 80
+    assert resumed.is_done(RANGES[0]) and not resumed.is_done(RANGES[1])
+    resumed.clear()
+    assert pending_renders(str(tmp_path)) == []
+
+
+def test_missing_segment_files_are_redone(tmp_path):
+    checkpoint = RenderCheckpoint(str(tmp_path), "key")
+    checkpoint.begin(RENDER_ARGS, 130, RANGES)
+    finish_segment(checkpoint, RANGES[0])
+    finish_segment(checkpoint, RANGES[1])
+    checkpoint.release()
+    os.remove(checkpoint.segment_path(RANGES[0]))
+
+    resumed = RenderCheckpoint(str(tmp_path), "key")
+    assert resumed.begin(RENDER_ARGS, 130, RANGES) == 50
+    assert not resumed.is_done(RANGES[0])
+    resumed.release()
+
+
+def test_other_timeline_starts_afresh(tmp_path):
+    checkpoint = RenderCheckpoint(str(tmp_path), "key")
+    checkpoint.begin(RENDER_ARGS, 130, RANGES)
+    finish_segment(checkpoint, RANGES[0])
+    checkpoint.release()
+
+    restarted = RenderCheckpoint(str(tmp_path), "key")
+    assert restarted.begin(RENDER_ARGS, 120, [(0, 60), (60, 120)]) == 0
+    assert not os.path.exists(checkpoint.segment_path(RANGES[0]))
+    restarted.release()
+
+
+def test_discard_render(tmp_path):
+    checkpoint = RenderCheckpoint(str(tmp_path), "key")
+    checkpoint.begin(RENDER_ARGS, 130, RANGES)
+    finish_segment(checkpoint, RANGES[0])
+    checkpoint.release()
+    discard_render(str(tmp_path), "key")
+    assert pending_renders(str(tmp_path)) == []
+    assert not os.path.exists(checkpoint.checkpoint_dir)
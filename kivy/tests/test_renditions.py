@@ -0,0 +1,26 @@
+from renditions import Rendition, plan_renditions, rendition_path
+
+
+def test_plan_renditions_below_render_height():
+    assert plan_renditions(1920, 1080, [480, 720]) == (
+        Rendition("720p", 1280, 720),
+        Rendition("480p", 854, 480),
+    )
+
+
+def test_plan_renditions_skips_heights_not_below_render():
+    assert plan_renditions(1280, 720, [1080, 720, 360]) == (Rendition("360p", 640, 360),)
+    assert plan_renditions(1280, 720, None) == ()
+
+
+def test_plan_renditions_even_sizes_and_duplicates():
+    renditions = plan_renditions(1000, 750, [241, 241.0, "241"])
+    assert len(renditions) == 1
+    rendition = renditions[0]
+    assert rendition.label == "241p"
+    assert rendition.width % 2 == 0 and rendition.height % 2 == 0
+    assert abs(rendition.width / rendition.height - 1000 / 750) < 0.02
+
+
+def test_rendition_path():
+    assert rendition_path("/videos/vid_h264.mp4", "720p") == "/videos/vid_h264_720p.mp4"
@@ -0,0 +1,89 @@
+import json
+
+import cv2
+import numpy as np
+import pytest
+
+import sketchApi
+from segmentEncoder import iter_frames, split_timeline, total_frames
+from sketchPlan import CellSettings
+
+END_FRAMES = 5
+
+
+@pytest.mark.parametrize("n_frames, segments", [(100, 1), (100, 3), (101, 4), (7, 7), (3, 8), (1, 2)])
+def test_split_timeline_covers_every_frame_once(n_frames, segments):
+    ranges = split_timeline(n_frames, segments)
+    assert ranges[0][0] == 0 and ranges[-1][1] == n_frames
+    assert all(stop == start for (_, stop), (start, _) in zip(ranges, ranges[1:]))
+    assert len(ranges) == min(segments, n_frames)
+    lengths = [stop - start for start, stop in ranges]
+    assert min(lengths) >= 1 and max(lengths) - min(lengths) <= 1
+
+
+def test_split_timeline_empty():
+    assert split_timeline(0, 4) == []
+
+
+class FrameRecorder:
+    """cv2.VideoWriter stand-in keeping the written frames."""
+    def __init__(self, *args):
+        self.frames = []
+
+    def write(self, frame):
+        self.frames.append(np.array(frame))
+
+    def release(self):
+        pass
+
+
+@pytest.fixture
+def mask_path(tmp_path):
+    # LabelMe style mask with the circle and the filled rectangle as objects
+    shapes = [
+        {"label": "circle", "points": [[30, 30], [130, 30], [130, 130], [30, 130]]},
+        {"label": "box", "points": [[170, 30], [290, 30], [290, 130], [170, 130]]},
+    ]
+    path = tmp_path / "mask.json"
+    path.write_text(json.dumps({"shapes": shapes}))
+    return str(path)
+
+
+def make_variables(cells, mask_planning="serial"):
+    return sketchApi.AllVariables(
+        frame_rate=END_FRAMES, resize_wd=320, resize_ht=240, split_len=10,
+        object_skip_rate=3, bg_object_skip_rate=5, end_gray_img_duration_in_sec=1,
+        mask_planning=mask_planning, cell_settings=cells,
+    )
+
+
+@pytest.mark.parametrize("use_mask, cells, mask_planning", [
+    (False, CellSettings(), "serial"),
+    (False, CellSettings(mode="quadtree", order="components"), "serial"),
+    (True, CellSettings(), "serial"),
+    (True, CellSettings(mode="quadtree"), "parallel"),
+])
+def test_segmented_frames_match_single_stream(monkeypatch, image_bgr, mask_path, use_mask, cells, mask_planning):
+    mask = mask_path if use_mask else None
+    recorder = FrameRecorder()
+    monkeypatch.setattr(cv2, "VideoWriter", lambda *args: recorder)
+    sketchApi.draw_whiteboard_animations(
+        image_bgr, mask, sketchApi.hand_path, sketchApi.hand_mask_path, "unused.mp4",
+        make_variables(cells, mask_planning),
+    )
+    monkeypatch.undo()
+
+    variables = make_variables(cells, mask_planning)
+    variables = sketchApi.preprocess_image(image_bgr, variables)
+    variables = sketchApi.preprocess_hand_image(sketchApi.hand_path, sketchApi.hand_mask_path, variables)
+    passes = sketchApi.plan_draw_passes(variables, mask)
+    hand = (variables.hand, variables.hand_mask_inv, variables.hand_ht, variables.hand_wd)
+    n_frames = total_frames(passes, END_FRAMES)
+    assert n_frames == len(recorder.frames)
+
+    segmented = []
+    for start, stop in split_timeline(n_frames, 4):
+        segmented.extend(iter_frames(passes, END_FRAMES, variables.img, variables.img_thresh, hand, start, stop))
+    assert len(segmented) == n_frames
+    for frame, expected in zip(segmented, recorder.frames):
+        np.testing.assert_array_equal(frame, expected)
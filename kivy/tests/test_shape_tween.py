@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from kivg.animation.animation_shapes import ShapeAnimator
+from kivg.animation.shape_tween import ShapeTween
+from kivg.svg_renderer import SvgRenderer
+
+SHAPE_ID = "s"
+
+
+def path_data(seed=0):
+    """Two paths of mixed lines and beziers, as ShapeAnimator._extract_path_data returns them."""
+    rng = np.random.default_rng(seed)
+    paths = []
+    for kinds in ((2, 4, 4, 2), (4, 2, 2, 4, 4)):
+        paths.append([[tuple(point) for point in rng.uniform(0, 500, (kind, 2))] for kind in kinds])
+    return paths
+
+
+def per_property_points(paths, direction, progress):
+    """
+    Shape points at progress through the unbatched animation: one Animation
+    per line/bezier, each property interpolated on its own.
+    """
+    widget = SimpleNamespace()
+    base_point = ShapeAnimator._calculate_base_point(paths, direction)
+    animations = []
+    line_count = bezier_count = 0
+    for path in paths:
+        for element in path:
+            if len(element) == 2:
+                animations.append(ShapeAnimator._setup_line_animation(
+                    widget, SHAPE_ID, line_count, element, base_point, direction, "linear", 1))
+                line_count += 1
+            else:
+                animations.append(ShapeAnimator._setup_bezier_animation(
+                    widget, SHAPE_ID, bezier_count, element, base_point, direction, "linear", 1))
+                bezier_count += 1
+    for animation in animations:
+        for name, target in animation.animated_properties.items():
+            start = getattr(widget, name)
+            setattr(widget, name, start + (target - start) * progress)
+    return SvgRenderer.collect_shape_points(paths, widget, SHAPE_ID)
+
+
+@pytest.mark.parametrize("direction", [None, "left", "right", "top", "bottom", "center_x", "center_y"])
+@pytest.mark.parametrize("progress", [0.0, 0.3, 0.75, 1.0])
+def test_points_at_matches_per_property_animation(direction, progress):
+    paths = path_data()
+    tween = ShapeTween.from_path_data(paths, direction)
+    np.testing.assert_allclose(
+        tween.points_at(progress), per_property_points(paths, direction, progress), rtol=0, atol=1e-9
+    )
+
+
+def test_points_at_end_is_the_shape():
+    paths = path_data(1)
+    points = ShapeTween.from_path_data(paths, "left").points_at(1.0)
+    assert points == pytest.approx(per_property_points(paths, None, 0.0), abs=1e-9)
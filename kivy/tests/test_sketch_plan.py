@@ -0,0 +1,92 @@
+import cv2
+import numpy as np
+import pytest
+
+from sketchPlan import (
+    BLACK_PIXEL_THRESHOLD, component_order, find_inked_cells, grid_rects, quadtree_rects,
+    rect_centers, threshold_image, walk_order,
+)
+
+SPLIT_LEN = 10
+
+
+@pytest.fixture
+def img_thresh(image_bgr):
+    height, width = image_bgr.shape[:2]
+    return threshold_image(image_bgr, width, height)[2]
+
+
+def coverage(rects, shape):
+    covered = np.zeros(shape, np.int32)
+    for y0, x0, y1, x1 in rects:
+        covered[y0:y1, x0:x1] += 1
+    return covered
+
+
+def test_walk_order_is_greedy_nearest_neighbour():
+    points = np.random.default_rng(1).integers(0, 50, (200, 2))
+    order = walk_order(points)
+    assert sorted(order) == list(range(len(points)))
+    assert order[0] == 0
+    for k in range(1, len(order)):
+        remaining = points[order[k:]]
+        nearest = np.min(np.hypot(*(remaining - points[order[k - 1]]).T))
+        assert np.hypot(*(points[order[k]] - points[order[k - 1]])) == nearest
+
+
+def test_quadtree_without_levels_is_the_grid(img_thresh):
+    expected = grid_rects(find_inked_cells(img_thresh, SPLIT_LEN), SPLIT_LEN)
+    np.testing.assert_array_equal(quadtree_rects(img_thresh, SPLIT_LEN, levels=0), expected)
+
+
+@pytest.mark.parametrize("levels, density", [(1, 0.12), (2, 0.12), (3, 0.5), (2, 0.0)])
+def test_quadtree_cells_cover_the_ink_once(img_thresh, levels, density):
+    rects = quadtree_rects(img_thresh, SPLIT_LEN, levels=levels, density=density)
+    ink = img_thresh < BLACK_PIXEL_THRESHOLD
+    covered = coverage(rects, img_thresh.shape)
+    assert covered.max() == 1
+    assert covered[ink].all()
+    for y0, x0, y1, x1 in rects:
+        assert ink[y0:y1, x0:x1].any()
+        assert y1 - y0 <= SPLIT_LEN * 2 ** levels and x1 - x0 <= SPLIT_LEN * 2 ** levels
+    assert list(map(tuple, rects[:, :2])) == sorted(map(tuple, rects[:, :2]))
+
+
+def test_quadtree_with_zero_density_splits_to_the_grid(img_thresh):
+    expected = grid_rects(find_inked_cells(img_thresh, SPLIT_LEN), SPLIT_LEN)
+    np.testing.assert_array_equal(quadtree_rects(img_thresh, SPLIT_LEN, levels=2, density=0.0), expected)
+
+
+@pytest.mark.parametrize("levels", [0, 1])
+def test_component_order_visits_components_one_at_a_time(img_thresh, levels):
+    height, width = img_thresh.shape
+    rects = quadtree_rects(img_thresh, SPLIT_LEN, levels=levels)
+    order = component_order(rects, SPLIT_LEN, height, width)
+    assert sorted(order) == list(range(len(rects)))
+    assert order[0] == 0
+
+    occupancy = (coverage(rects, img_thresh.shape)[::SPLIT_LEN, ::SPLIT_LEN] > 0).astype(np.uint8)
+    n_labels, labels = cv2.connectedComponents(occupancy, connectivity=8)
+    assert n_labels > 2  # the test image has several separate shapes
+    rect_labels = labels[rects[:, 0] // SPLIT_LEN, rects[:, 1] // SPLIT_LEN]
+    visited = [label for k, label in enumerate(rect_labels[order]) if k == 0 or label != rect_labels[order][k - 1]]
+    assert len(visited) == n_labels - 1  # each component is entered once
+
+
+def test_component_order_walks_each_component_greedily(img_thresh):
+    height, width = img_thresh.shape
+    rects = quadtree_rects(img_thresh, SPLIT_LEN, levels=0)
+    order = component_order(rects, SPLIT_LEN, height, width)
+    centers = rect_centers(rects)
+    occupancy = np.zeros((height // SPLIT_LEN, width // SPLIT_LEN), np.uint8)
+    occupancy[rects[:, 0] // SPLIT_LEN, rects[:, 1] // SPLIT_LEN] = 1
+    labels = cv2.connectedComponents(occupancy, connectivity=8)[1][rects[:, 0] // SPLIT_LEN, rects[:, 1] // SPLIT_LEN]
+    for label in np.unique(labels):
+        walk = centers[order[labels[order] == label]]
+        for k in range(1, len(walk)):
+            nearest = np.min(np.hypot(*(walk[k:] - walk[k - 1]).T))
+            assert np.hypot(*(walk[k] - walk[k - 1])) == nearest
+
+
+def test_component_order_empty():
+    assert len(component_order(np.empty((0, 4), np.intp), SPLIT_LEN, 100, 100)) == 0
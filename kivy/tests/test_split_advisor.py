@@ -0,0 +1,29 @@
+import pytest
+
+from splitAdvisor import common_divisors, count_frames, divisors
+
+
+@pytest.mark.parametrize("n", [1, 2, 12, 97, 360, 1080, 1920, 3840])
+def test_divisors_match_brute_force(n):
+    assert divisors(n) == [d for d in range(1, n + 1) if n % d == 0]
+
+
+def test_divisors_of_non_positive():
+    assert divisors(0) == []
+    assert divisors(-4) == []
+
+
+def test_common_divisors():
+    assert common_divisors(1920, 1080) == divisors(120)
+    assert common_divisors("1280", 720) == [1, 2, 4, 5, 8, 10, 16, 20, 40, 80]
+
+
+@pytest.mark.parametrize("n_cells, skip_rate", [(0, 8), (1, 8), (2, 1), (17, 8), (100, 3), (1000, 14)])
+def test_count_frames_matches_drawing_loop(n_cells, skip_rate):
+    # the loop of draw_masked_object: cells 1..n-1, a frame each skip_rate cells
+    written = sum(1 for counter in range(1, n_cells) if counter % skip_rate == 0)
+    assert count_frames(n_cells, skip_rate, 25, 2) == written + 50
+
+
+def test_count_frames_clamps_skip_rate():
+    assert count_frames(10, 0, 25, 0) == 9